@@ -0,0 +1,69 @@
+"""
+Visitante base para las pasadas sobre el AST
+Cada pasada declara sus manejadores por clase de nodo con @handles; el
+despacho es una sola búsqueda en un diccionario por clase de nodo, que se
+resuelve (recorriendo el MRO del nodo, así que cubre subclases) la primera
+vez que aparece cada clase y queda en caché para el resto del recorrido.
+
+    class Contador(Visitor):
+        @handles(BinaryOp, UnaryOp)
+        def visit_operacion(self, node):
+            ...
+
+    Contador().visit(nodo)
+
+Las pasadas con un bucle caliente pueden indexar self.dispatch directamente:
+    self.dispatch[type(node)](self, node, ...)
+"""
+
+from typing import Callable, Dict
+
+def handles(*node_classes: type) -> Callable:
+    """Marca un método como manejador de las clases de nodo indicadas"""
+    def mark(method: Callable) -> Callable:
+        method.node_classes = node_classes
+        return method
+    return mark
+
+class DispatchTable(dict):
+    """Clase de nodo → función manejadora de una clase de visitante; se completa bajo demanda"""
+    
+    def __init__(self, visitor_class: type):
+        super().__init__()
+        self.visitor_class = visitor_class
+    
+    def __missing__(self, node_class: type) -> Callable:
+        visitor_class = self.visitor_class
+        handlers = visitor_class.handlers
+        # El manejador de la clase más específica del MRO del nodo; si no hay, generic_visit
+        name = next((handlers[base] for base in node_class.__mro__ if base in handlers), 'generic_visit')
+        handler = self[node_class] = getattr(visitor_class, name)
+        return handler
+
+class Visitor:
+    """Base de las pasadas sobre el AST, con despacho por clase de nodo en caché"""
+    
+    handlers: Dict[type, str] = {}  # clase de nodo → nombre del método manejador
+    dispatch: DispatchTable
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Los manejadores de las clases base, más (o reemplazados por) los propios
+        handlers = {}
+        for base in reversed(cls.__mro__[1:]):
+            handlers.update(getattr(base, 'handlers', {}))
+        for name, member in vars(cls).items():
+            for node_class in getattr(member, 'node_classes', ()):
+                handlers[node_class] = name
+        cls.handlers = handlers
+        cls.dispatch = DispatchTable(cls)
+    
+    def visit(self, node, *args):
+        """Despacha node (y args) al manejador de su clase"""
+        return self.dispatch[type(node)](self, node, *args)
+    
+    def generic_visit(self, node, *args):
+        """Nodos sin manejador: no hace nada"""
+        return None
+
+Visitor.dispatch = DispatchTable(Visitor)
@@ -0,0 +1,363 @@
+"""
+Benchmarks del compilador
+Mide el rendimiento de las fases sobre los programas de ejemplos/ escalados
+
+Para ejecutar:
+  python benchmark.py              (todos los benchmarks)
+  python benchmark.py lexer [MB]   (solo uno, con el tamaño indicado)
+"""
+
+import contextlib
+import dataclasses
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lexer_simple import Lexer
+from parser_rd import Parser, IncrementalParser, ASTNode
+from main_compiler import compile_source
+from compile_cache import CompileCache
+from diagnostics import Diagnostics
+from semantic_analyzer import SemanticAnalyzer, TypeAnnotations
+
+EJEMPLOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ejemplos')
+
+# Programas válidos: se pueden repetir dentro de bloques sin errores semánticos
+PROGRAMAS_VALIDOS = ['programa_completo.txt', 'operadores_logicos.txt']
+
+def programa_escalado(megabytes: float, archivos=None) -> str:
+    """Repite los programas de ejemplos/ (cada copia en su propio bloque) hasta el tamaño pedido"""
+    archivos = archivos or PROGRAMAS_VALIDOS
+    partes = []
+    for nombre in archivos:
+        with open(os.path.join(EJEMPLOS, nombre), 'r', encoding='utf-8') as f:
+            partes.append(f.read())
+    base = "\n".join(partes)
+    
+    objetivo = int(megabytes * 1_000_000)
+    copias = []
+    total = 0
+    i = 0
+    while total < objetivo:
+        copia = f"/* copia {i} */\n{{\n{base}\n}}\n"
+        copias.append(copia)
+        total += len(copia)
+        i += 1
+    return "".join(copias)
+
+def medir(funcion, repeticiones: int = 3) -> float:
+    """Mejor tiempo (segundos) de varias ejecuciones"""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def imprimir_fila(nombre: str, segundos: float, megabytes: float, tokens: int):
+    """Imprime una fila de resultados"""
+    print(f"  {nombre:<32} {segundos:8.3f} s  {megabytes / segundos:7.2f} MB/s  "
+          f"{tokens / segundos / 1000:8.0f} ktok/s")
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def bench_lexer(megabytes: float = 2.0):
+    """Compara los motores léxicos (AFD y patrón maestro) sobre los ejemplos escalados"""
+    source = programa_escalado(megabytes, sorted(os.listdir(EJEMPLOS)))
+    tokens = len(Lexer(source).tokenize_buffer())
+    print(f"\nANALIZADOR LÉXICO: {len(source) / 1e6:.1f} MB, {tokens} tokens")
+    
+    for engine in Lexer.engines:
+        segundos = medir(lambda: Lexer(source, engine).tokenize())
+        imprimir_fila(f"{engine}: tokenize()", segundos, megabytes, tokens)
+        segundos = medir(lambda: Lexer(source, engine).tokenize_buffer())
+        imprimir_fila(f"{engine}: tokenize_buffer()", segundos, megabytes, tokens)
+    
+    # Construir un Lexer no recompila el AFD: sus tablas son del proceso
+    instancias = 10_000
+    segundos = medir(lambda: [Lexer("x") for _ in range(instancias)])
+    print(f"  {'Lexer() (construcción)':<32} {segundos / instancias * 1e6:8.2f} us")
+
+def programa_expresiones(megabytes: float) -> str:
+    """Código generado con expresiones largas (todas las precedencias) hasta el tamaño pedido"""
+    lineas = ["int a = 1;", "int b = 2;", "float c = 3.5;", "int r;"]
+    total = 0
+    i = 0
+    while total < megabytes * 1_000_000:
+        linea = (f"r = (a + {i}) * b - c / (a % 7 + 1) < -b + {i} * a "
+                 f"&& !(a == b) || a * b + c * {i} >= (b - a) * (c + {i});")
+        lineas.append(linea)
+        total += len(linea) + 1
+        i += 1
+    return "\n".join(lineas)
+
+def bench_parser(megabytes: float = 3.3):
+    """Mide cada motor del parser sobre ~1M tokens (ejemplos escalados y expresiones largas)"""
+    entradas = [
+        ("ejemplos", programa_escalado(megabytes)),
+        ("expresiones", programa_expresiones(megabytes)),
+    ]
+    
+    def parse(tokens, engine):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if Parser(tokens, engine).parse() is None:
+                raise RuntimeError("El programa de prueba tiene errores sintácticos")
+    
+    for nombre, source in entradas:
+        tokens = Lexer(source).tokenize()
+        buffer = Lexer(source).tokenize_buffer()
+        print(f"\nANALIZADOR SINTÁCTICO ({nombre}): {len(source) / 1e6:.1f} MB, {len(tokens)} tokens")
+        for engine in Parser.engines:
+            segundos = medir(lambda: parse(tokens, engine))
+            imprimir_fila(f"{engine}: parse(List[Token])", segundos, megabytes, len(tokens))
+            segundos = medir(lambda: parse(buffer, engine))
+            imprimir_fila(f"{engine}: parse(TokenBuffer)", segundos, megabytes, len(tokens))
+
+def contar_nodos(raiz: ASTNode) -> int:
+    """Cuenta los nodos del AST sin recursión"""
+    total = 0
+    pendientes = [raiz]
+    while pendientes:
+        nodo = pendientes.pop()
+        total += 1
+        for campo in dataclasses.fields(nodo):
+            valor = getattr(nodo, campo.name)
+            if isinstance(valor, ASTNode):
+                pendientes.append(valor)
+            elif isinstance(valor, list):
+                pendientes.extend(hijo for hijo in valor if isinstance(hijo, ASTNode))
+    return total
+
+def bench_ast_memoria(megabytes: float = 1.0):
+    """Memoria residente del AST (tracemalloc) por nodo, para cada motor del parser"""
+    source = programa_escalado(megabytes)
+    tokens = Lexer(source).tokenize()
+    print(f"\nMEMORIA DEL AST: {len(source) / 1e6:.1f} MB, {len(tokens)} tokens")
+    
+    for engine in Parser.engines:
+        for compartir in (False, True):
+            gc.collect()
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser = Parser(tokens, engine, share_exprs=compartir)
+                ast = parser.parse()
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            nodos = contar_nodos(ast)
+            if compartir:
+                # El AST (con la tabla de posiciones) es un DAG: se cuentan los nodos distintos
+                nodos -= parser.exprs.shared
+            nombre = f"{engine} + share_exprs" if compartir else engine
+            print(f"  {nombre:<20} {nodos:10d} nodos  {memoria / 1e6:8.1f} MB  {memoria / nodos:6.1f} B/nodo")
+            del ast, parser
+
+def bench_incremental(megabytes: float = 2.0):
+    """Re-parseo tras editar un literal (relex + IncrementalParser) frente a parsear todo de nuevo"""
+    source = programa_escalado(megabytes)
+    lexer = Lexer(source)
+    tokens = lexer.tokenize()
+    incremental = IncrementalParser("pratt")
+    print(f"\nPARSEO INCREMENTAL: {len(source) / 1e6:.1f} MB, {len(tokens)} tokens")
+    
+    def parse(parser_parse, tokens):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if parser_parse(tokens) is None:
+                raise RuntimeError("El programa de prueba tiene errores sintácticos")
+    
+    segundos = medir(lambda: parse(lambda tokens: Parser(tokens, "pratt").parse(), tokens))
+    print(f"  {'parse() completo':<32} {segundos:8.3f} s")
+    parse(incremental.parse, tokens)
+    
+    for donde in (0.1, 0.5, 0.9):
+        # Alterna "= 10;" → "= 100;" → "= 10;": cambia la longitud del fuente
+        offset = lexer.source.find("= 10;", int(len(lexer.source) * donde)) + 2
+        ediciones = iter([(2, "100"), (3, "10")] * 3)
+        
+        def editar():
+            removed, text = next(ediciones)
+            parse(incremental.parse, lexer.relex(tokens, offset, removed, text))
+        
+        segundos = medir(editar)
+        print(f"  {f'relex + parse al {donde:.0%} del archivo':<32} {segundos:8.3f} s  "
+              f"({incremental.reused} sentencias reutilizadas)")
+
+def bench_cache(megabytes: float = 2.0):
+    """compile_source sin caché, con un fallo de caché y con aciertos en memoria y en disco"""
+    source = programa_escalado(megabytes)
+    tokens = len(Lexer(source).tokenize_buffer())
+    print(f"\nCACHÉ DE COMPILACIÓN: {len(source) / 1e6:.1f} MB, {tokens} tokens")
+    
+    def compilar(cache):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not compile_source(source, "benchmark", cache):
+                raise RuntimeError("El programa de prueba tiene errores")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        filas = [
+            ("sin caché", lambda: compilar(None)),
+            ("fallo (compila y guarda)", lambda: compilar(CompileCache(cache_dir, max_bytes=0))),
+            ("acierto en disco", lambda: compilar(CompileCache(cache_dir, max_bytes=0))),
+        ]
+        memoria = CompileCache(None)
+        compilar(memoria)
+        filas.append(("acierto en memoria", lambda: compilar(memoria)))
+        for nombre, funcion in filas:
+            segundos = medir(funcion, 1 if nombre.startswith("fallo") else 3)
+            print(f"  {nombre:<32} {segundos:8.3f} s")
+
+def programa_con_errores(megabytes: float) -> str:
+    """Código generado con un error y varias advertencias por línea (variables sin inicializar y sin declarar)"""
+    lineas = ["int a;", "int b;", "float c;"]
+    total = 0
+    i = 0
+    while total < megabytes * 1_000_000:
+        linea = f"b = a + a * {i} - c; c = a / (b + q{i % 50});"
+        lineas.append(linea)
+        total += len(linea) + 1
+        i += 1
+    return "\n".join(lineas)
+
+def bench_diagnosticos(megabytes: float = 1.0):
+    """Análisis semántico de un programa con muchos diagnósticos, según el colector"""
+    source = programa_con_errores(megabytes)
+    tokens = Lexer(source).tokenize_buffer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast = Parser(tokens, "pratt").parse()
+    print(f"\nDIAGNÓSTICOS: {len(source) / 1e6:.1f} MB, {len(tokens)} tokens")
+    
+    colectores = [
+        ("consola (a /dev/null)", lambda: Diagnostics()),
+        ("sin consola", lambda: Diagnostics(console=False)),
+        ("sin consola + dedup", lambda: Diagnostics(console=False, dedup=True)),
+        ("consola + dedup", lambda: Diagnostics(dedup=True)),
+        ("consola + max_errors=100", lambda: Diagnostics(max_errors=100)),
+    ]
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        for nombre, colector in colectores:
+            def analizar():
+                with contextlib.redirect_stdout(nulo):
+                    SemanticAnalyzer(colector()).analyze(ast)
+            
+            diagnostics = colector()
+            with contextlib.redirect_stdout(nulo):
+                SemanticAnalyzer(diagnostics).analyze(ast)
+            segundos = medir(analizar)
+            print(f"  {nombre:<32} {segundos:8.3f} s  ({len(diagnostics.records)} diagnósticos)")
+
+def programa_anidado(megabytes: float, profundidad: int = 400) -> str:
+    """Bloques generados muy anidados que usan variables globales y locales en cada nivel"""
+    globales = [f"int g{j} = {j};" for j in range(10)]
+    partes = list(globales)
+    total = 0
+    while total < megabytes * 1_000_000:
+        niveles = []
+        for i in range(profundidad):
+            niveles.append(f"{{ int l{i} = g{i % 10}; l{i} = l{i} + g{(i + 3) % 10} * g{(i + 7) % 10};")
+        bloque = "\n".join(niveles) + "}" * profundidad
+        partes.append(bloque)
+        total += len(bloque) + 1
+    return "\n".join(partes)
+
+def bench_simbolos(megabytes: float = 1.0):
+    """Análisis semántico de bloques muy anidados (búsqueda de nombres en la tabla de símbolos)"""
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        for profundidad in (10, 100, 400):
+            source = programa_anidado(megabytes, profundidad)
+            tokens = Lexer(source).tokenize_buffer()
+            with contextlib.redirect_stdout(nulo):
+                ast = Parser(tokens, "stack").parse()
+            
+            def analizar():
+                with contextlib.redirect_stdout(nulo):
+                    if not SemanticAnalyzer(Diagnostics(console=False)).analyze(ast):
+                        raise RuntimeError("El programa de prueba tiene errores semánticos")
+            
+            segundos = medir(analizar)
+            imprimir_fila(f"profundidad {profundidad}", segundos, megabytes, len(tokens))
+
+def bench_tipos(megabytes: float = 1.0):
+    """Análisis semántico de programas con muchas expresiones (inferencia de tipos)"""
+    entradas = [
+        ("expresiones", programa_expresiones(megabytes)),
+        ("expresiones con errores", programa_con_errores(megabytes)),
+    ]
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        for nombre, source in entradas:
+            tokens = Lexer(source).tokenize_buffer()
+            with contextlib.redirect_stdout(nulo):
+                ast = Parser(tokens, "pratt").parse()
+            
+            def analizar():
+                with contextlib.redirect_stdout(nulo):
+                    SemanticAnalyzer(Diagnostics(console=False)).analyze(ast)
+            
+            segundos = medir(analizar)
+            imprimir_fila(nombre, segundos, megabytes, len(tokens))
+
+def bench_anotaciones(megabytes: float = 1.0):
+    """Análisis semántico con TypeAnnotations: costo de anotar y re-análisis (sin cambios y tras editar)"""
+    entradas = [
+        ("ejemplos", programa_escalado(megabytes), "= 10;"),
+        ("expresiones", programa_expresiones(megabytes), "7 + 1)"),
+    ]
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        for nombre, source, literal in entradas:
+            lexer = Lexer(source)
+            tokens = lexer.tokenize()
+            incremental = IncrementalParser("pratt")
+            with contextlib.redirect_stdout(nulo):
+                program = incremental.parse(tokens)
+            print(f"\nANOTACIONES DE TIPOS ({nombre}): {len(source) / 1e6:.1f} MB, {len(tokens)} tokens")
+            
+            def analizar(anotaciones=None):
+                with contextlib.redirect_stdout(nulo):
+                    SemanticAnalyzer(Diagnostics(console=False), annotations=anotaciones).analyze(program)
+            
+            print(f"  {'sin anotaciones':<32} {medir(analizar):8.3f} s")
+            print(f"  {'anotando (tabla nueva)':<32} {medir(lambda: analizar(TypeAnnotations())):8.3f} s")
+            anotaciones = TypeAnnotations()
+            analizar(anotaciones)
+            segundos = medir(lambda: analizar(anotaciones))
+            print(f"  {'re-análisis sin cambios':<32} {segundos:8.3f} s  "
+                  f"({anotaciones.reused} de {len(anotaciones)} nodos salteados)")
+            
+            # Editar un literal a mitad del archivo: solo se re-infiere la expresión cambiada
+            offset = lexer.source.find(literal, len(lexer.source) // 2) + literal.index("1")
+            with contextlib.redirect_stdout(nulo):
+                program = incremental.parse(lexer.relex(tokens, offset, 1, "7"))
+            segundos = medir(lambda: analizar(anotaciones))
+            print(f"  {'re-análisis tras la edición':<32} {segundos:8.3f} s  ({anotaciones.reused} salteados)")
+
+BENCHMARKS = {
+    "lexer": bench_lexer,
+    "parser": bench_parser,
+    "memoria": bench_ast_memoria,
+    "incremental": bench_incremental,
+    "cache": bench_cache,
+    "diagnosticos": bench_diagnosticos,
+    "simbolos": bench_simbolos,
+    "tipos": bench_tipos,
+    "anotaciones": bench_anotaciones,
+}
+
+def main():
+    """Ejecuta los benchmarks pedidos"""
+    nombres = [sys.argv[1]] if len(sys.argv) > 1 else list(BENCHMARKS)
+    for nombre in nombres:
+        if nombre not in BENCHMARKS:
+            print(f"❌ Benchmark desconocido: '{nombre}' (disponibles: {', '.join(BENCHMARKS)})")
+            return 1
+        if len(sys.argv) > 2:
+            BENCHMARKS[nombre](float(sys.argv[2]))
+        else:
+            BENCHMARKS[nombre]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Caché de compilación direccionada por contenido
+Guarda el resultado de cada fase (tokens, AST, diagnósticos y tabla de
+símbolos) bajo una huella del código fuente y de la versión del compilador;
+recompilar un fuente ya visto no vuelve a ejecutar ninguna fase.
+
+Dos niveles:
+  memoria  LRU acotada por tamaño (bytes codificados)
+  disco    cache_dir/<huella>.bin, en formato marshal (sin pickle)
+"""
+
+import contextlib
+import dataclasses
+import hashlib
+import io
+import marshal
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from lexer_simple import LineIndex, NameTable, TokenBuffer, Source
+from parser_rd import ASTNode, Program, CHILD_FIELDS
+
+# Sube al cambiar el formato de las entradas o el significado de un resultado
+COMPILER_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__', 'compile')
+
+# Módulos cuyo código determina el resultado de una compilación
+COMPILER_MODULES = ['lexer_simple.py', 'dfa_generator.py', 'parser_rd.py',
+                    'ast_visitor.py', 'semantic_analyzer.py', 'type_system.py', 'diagnostics.py', 'main_compiler.py', 'compile_cache.py']
+
+def compiler_version() -> str:
+    """
+    Versión efectiva del compilador: COMPILER_VERSION, la versión de Python
+    (el formato de marshal puede cambiar entre versiones) y una huella del
+    código de sus módulos, para que editar el compilador invalide la caché
+    """
+    digest = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in COMPILER_MODULES:
+        try:
+            with open(os.path.join(base, name), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(name.encode('utf-8'))
+    return f"{COMPILER_VERSION}-py{sys.version_info[0]}{sys.version_info[1]}-{digest.hexdigest()[:16]}"
+
+def source_key(source: Source, version: str) -> str:
+    """Huella de un código fuente para una versión del compilador"""
+    digest = hashlib.sha256(version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(source.encode('utf-8') if isinstance(source, str) else source)
+    return digest.hexdigest()
+
+# ============================================
+# CODIFICACIÓN DE TOKENS Y AST
+# ============================================
+
+def encode_tokens(tokens: TokenBuffer) -> tuple:
+    """Columnas del buffer como bytes, más la tabla de nombres"""
+    return (tokens.kinds.tobytes(), tokens.starts.tobytes(), tokens.lengths.tobytes(),
+            tokens.name_ids.tobytes(), list(tokens.names.names))
+
+def decode_tokens(data: tuple, source: Source, lines: Optional[LineIndex] = None) -> TokenBuffer:
+    """Reconstruye el TokenBuffer sobre el código fuente original"""
+    kinds, starts, lengths, name_ids, names = data
+    table = NameTable()
+    table.names = names
+    table.ids = {name: i for i, name in enumerate(names)}
+    tokens = TokenBuffer(source, lines, table)
+    tokens.kinds.frombytes(kinds)
+    tokens.starts.frombytes(starts)
+    tokens.lengths.frombytes(lengths)
+    tokens.name_ids.frombytes(name_ids)
+    return tokens
+
+# Etiqueta de cada clase de nodo en el AST codificado (-1: hijo ausente); se
+# guarda como etiqueta * 2 + 1 si el nodo tiene LineIndex (Program no lo lleva)
+NODE_CLASSES = tuple(CHILD_FIELDS)
+NODE_TAGS = {cls: tag for tag, cls in enumerate(NODE_CLASSES)}
+NO_NODE = -1
+
+def _layout(cls) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """(escalares, hijos en lista, hijos opcionales) de una clase de nodo"""
+    children = CHILD_FIELDS[cls]
+    scalars = tuple(f.name for f in dataclasses.fields(cls)
+                    if f.name not in ('offset', 'lines') and f.name not in children)
+    lists = tuple(f.name for f in dataclasses.fields(cls)
+                  if f.name in children and f.default_factory is list)
+    return scalars, lists, tuple(name for name in children if name not in lists)
+
+NODE_LAYOUTS = [_layout(cls) for cls in NODE_CLASSES]
+
+def encode_ast(root: ASTNode) -> list:
+    """
+    Serializa el AST en preorden como una lista plana de escalares (sin
+    anidamiento: marshal no admite estructuras muy profundas).
+    Por nodo: etiqueta (y si tiene LineIndex), offset, campos escalares,
+    largo de cada lista de hijos; luego los hijos en orden
+    """
+    out: List[Any] = []
+    pending: List[Optional[ASTNode]] = [root]
+    while pending:
+        node = pending.pop()
+        if node is None:
+            out.append(NO_NODE)
+            continue
+        tag = NODE_TAGS[type(node)]
+        scalars, lists, optionals = NODE_LAYOUTS[tag]
+        out.append(tag * 2 + (node.lines is not None))
+        out.append(node.offset)
+        children: List[Optional[ASTNode]] = []
+        for name in scalars:
+            out.append(getattr(node, name))
+        for name in lists:
+            items = getattr(node, name)
+            out.append(len(items))
+            children.extend(items)
+        for name in optionals:
+            children.append(getattr(node, name))
+        children.reverse()
+        pending.extend(children)
+    return out
+
+def decode_ast(data: list, lines: Optional[LineIndex] = None) -> ASTNode:
+    """Reconstruye el AST serializado por encode_ast (sin recursión)"""
+    root: List[Optional[ASTNode]] = [None]
+    # Huecos por llenar, en orden inverso: (objeto, índice o nombre de campo)
+    slots: List[Tuple[Any, Any]] = [(root, 0)]
+    pos = 0
+    while slots:
+        target, where = slots.pop()
+        tag = data[pos]
+        pos += 1
+        if tag == NO_NODE:
+            node = None
+        else:
+            scalars, lists, optionals = NODE_LAYOUTS[tag >> 1]
+            node = NODE_CLASSES[tag >> 1](offset=data[pos], lines=lines if tag & 1 else None)
+            pos += 1
+            for name in scalars:
+                setattr(node, name, data[pos])
+                pos += 1
+            children: List[Tuple[Any, Any]] = []
+            for name in lists:
+                items = [None] * data[pos]
+                pos += 1
+                setattr(node, name, items)
+                children.extend((items, i) for i in range(len(items)))
+            children.extend((node, name) for name in optionals)
+            children.reverse()
+            slots.extend(children)
+        if isinstance(where, int):
+            target[where] = node
+        else:
+            setattr(target, where, node)
+    return root[0]
+
+# ============================================
+# RESULTADO DE UNA COMPILACIÓN
+# ============================================
+
+# Fila de la tabla de símbolos: (ámbito, nombre, tipo, línea, columna, inicializada)
+SymbolRow = Tuple[int, str, str, int, int, bool]
+
+@dataclass
+class CompileResult:
+    """
+    Resultado de cada fase de una compilación (lo que guarda la caché).
+    report es la salida que imprimieron las fases; al leer una entrada, los
+    tokens y el AST se decodifican recién al pedirlos (token_buffer/program)
+    """
+    success: bool = False
+    report: str = ""
+    lexical_errors: List[str] = field(default_factory=list)
+    syntax_errors: List[str] = field(default_factory=list)
+    semantic_errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    symbols: List[SymbolRow] = field(default_factory=list)
+    tokens: Optional[TokenBuffer] = field(default=None, repr=False)
+    ast: Optional[Program] = field(default=None, repr=False)
+    # Tokens y AST codificados, pendientes de decodificar
+    encoded: Optional[Dict[str, Any]] = field(default=None, repr=False)
+    
+    def token_buffer(self, source: Source) -> Optional[TokenBuffer]:
+        """Tokens de la compilación (source debe ser el mismo código fuente)"""
+        if self.tokens is None and self.encoded and self.encoded['tokens'] is not None:
+            self.tokens = decode_tokens(self.encoded['tokens'], source)
+        return self.tokens
+    
+    def program(self, source: Source) -> Optional[Program]:
+        """AST de la compilación (None si no pasó el análisis sintáctico)"""
+        if self.ast is None and self.encoded and self.encoded['ast'] is not None:
+            tokens = self.token_buffer(source)
+            self.ast = decode_ast(self.encoded['ast'], tokens.lines if tokens else LineIndex(source))
+        return self.ast
+    
+    def to_bytes(self) -> bytes:
+        """Codifica la entrada con marshal"""
+        encoded = self.encoded or {}
+        return marshal.dumps({
+            'success': self.success,
+            'report': self.report,
+            'lexical_errors': self.lexical_errors,
+            'syntax_errors': self.syntax_errors,
+            'semantic_errors': self.semantic_errors,
+            'warnings': self.warnings,
+            'symbols': self.symbols,
+            'tokens': (encode_tokens(self.tokens) if self.tokens is not None
+                       else encoded.get('tokens')),
+            'ast': encode_ast(self.ast) if self.ast is not None else encoded.get('ast'),
+        })
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompileResult':
+        """Decodifica una entrada (ValueError/EOFError/KeyError si está corrupta)"""
+        entry = marshal.loads(data)
+        return cls(entry['success'], entry['report'], entry['lexical_errors'],
+                   entry['syntax_errors'], entry['semantic_errors'], entry['warnings'],
+                   [tuple(row) for row in entry['symbols']],
+                   encoded={'tokens': entry['tokens'], 'ast': entry['ast']})
+
+# ============================================
+# CACHÉ
+# ============================================
+
+class CompileCache:
+    """
+    Caché de resultados de compilación en dos niveles (memoria LRU y disco).
+    Con cache_dir=None solo se usa la memoria
+    """
+    
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR, max_bytes: int = 64 << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = compiler_version()
+        self.memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, source: Source) -> str:
+        """Clave del código fuente para esta versión del compilador"""
+        return source_key(source, self.version)
+    
+    def get(self, key: str) -> Optional[CompileResult]:
+        """Entrada de la clave, o None si no está en ningún nivel"""
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+        elif self.cache_dir is not None:
+            try:
+                with open(os.path.join(self.cache_dir, f"{key}.bin"), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                pass  # Ausente o ilegible
+        
+        if data is not None:
+            try:
+                result = CompileResult.from_bytes(data)
+            except (ValueError, EOFError, KeyError, TypeError):
+                result = None  # Corrupta: cuenta como fallo y se reescribe
+            if result is not None:
+                self._remember(key, data)
+                self.hits += 1
+                return result
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, result: CompileResult):
+        """Guarda el resultado en memoria y en disco"""
+        data = result.to_bytes()
+        self._remember(key, data)
+        if self.cache_dir is None:
+            return
+        
+        # Escritura atómica: otros procesos nunca ven un archivo a medias
+        path = os.path.join(self.cache_dir, f"{key}.bin")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # Directorio de solo lectura: solo queda la memoria
+    
+    def _remember(self, key: str, data: bytes):
+        """Agrega la entrada al nivel de memoria, descartando las menos usadas"""
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= len(old)
+        if len(data) > self.max_bytes:
+            return
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+class _Tee(io.TextIOBase):
+    """Escribe en dos flujos de texto a la vez"""
+    
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+    
+    def write(self, text: str) -> int:
+        self.first.write(text)
+        return self.second.write(text)
+    
+    def flush(self):
+        self.first.flush()
+        self.second.flush()
+
+@contextlib.contextmanager
+def capture_output() -> Iterator[io.StringIO]:
+    """Copia en un StringIO todo lo que se imprime, sin dejar de mostrarlo"""
+    report = io.StringIO()
+    with contextlib.redirect_stdout(_Tee(sys.stdout, report)):
+        yield report
@@ -0,0 +1,406 @@
+"""
+Generador de AFD a partir de una especificación declarativa de tokens
+Expresión regular por tipo de token -> AFN de Thompson -> construcción de
+subconjuntos -> minimización de Hopcroft, con caché de la tabla en disco
+
+La especificación es una lista ordenada de (token, regex), donde token es
+cualquier etiqueta (en el lexer, un TokenType); si dos patrones aceptan el
+mismo lexema gana el que aparece primero.
+
+Sintaxis de las expresiones (alfabeto ASCII):
+  a        literal          \\x    literal escapado
+  [a-z_]   clase            [^..]  clase negada
+  (r)      agrupación       r|s    alternativa
+  r* r+ r? repetición
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+# Sube al cambiar el algoritmo o el formato: invalida las tablas en caché
+GENERATOR_VERSION = 1
+
+ASCII = frozenset(chr(c) for c in range(128))
+
+TokenSpec = Sequence[Tuple[Any, str]]
+
+# ============================================
+# EXPRESIONES REGULARES
+# ============================================
+# Árbol sintáctico: ('chars', frozenset) | ('cat', a, b) | ('alt', a, b)
+#                   | ('star', a) | ('plus', a) | ('opt', a)
+
+class RegexParser:
+    """Parser descendente recursivo de la sintaxis de la especificación"""
+    
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.pos = 0
+    
+    def parse(self):
+        """Analiza el patrón completo"""
+        if not self.pattern:
+            raise ValueError("Expresión regular vacía")
+        node = self.alternation()
+        if self.pos < len(self.pattern):
+            self.error(f"'{self.pattern[self.pos]}' inesperado")
+        return node
+    
+    def error(self, message: str):
+        raise ValueError(f"{message} en la posición {self.pos} de /{self.pattern}/")
+    
+    def peek(self) -> Optional[str]:
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+    
+    def next(self) -> str:
+        if self.pos >= len(self.pattern):
+            self.error("Fin de patrón inesperado")
+        c = self.pattern[self.pos]
+        self.pos += 1
+        return c
+    
+    def alternation(self):
+        """alternativa -> concatenación ('|' concatenación)*"""
+        node = self.concatenation()
+        while self.peek() == '|':
+            self.pos += 1
+            node = ('alt', node, self.concatenation())
+        return node
+    
+    def concatenation(self):
+        """concatenación -> repetición+"""
+        node = None
+        while self.peek() not in (None, '|', ')'):
+            item = self.repetition()
+            node = item if node is None else ('cat', node, item)
+        if node is None:
+            self.error("Operando vacío")
+        return node
+    
+    def repetition(self):
+        """repetición -> átomo ('*' | '+' | '?')*"""
+        node = self.atom()
+        while self.peek() in ('*', '+', '?'):
+            node = ({'*': 'star', '+': 'plus', '?': 'opt'}[self.next()], node)
+        return node
+    
+    def atom(self):
+        """átomo -> '(' alternativa ')' | clase | literal"""
+        c = self.next()
+        if c == '(':
+            node = self.alternation()
+            if self.next() != ')':
+                self.error("Se esperaba ')'")
+            return node
+        if c == '[':
+            return ('chars', self.char_class())
+        if c == '\\':
+            return ('chars', frozenset(self.next()))
+        if c in '*+?)]':
+            self.error(f"'{c}' inesperado")
+        return ('chars', frozenset(c))
+    
+    def char_class(self) -> FrozenSet[str]:
+        """Contenido de [...] hasta el corchete de cierre"""
+        negated = self.peek() == '^'
+        if negated:
+            self.pos += 1
+        chars: Set[str] = set()
+        while self.peek() != ']':
+            low = self.next()
+            if low == '\\':
+                low = self.next()
+            if self.peek() == '-' and self.pattern[self.pos + 1:self.pos + 2] not in ('', ']'):
+                self.pos += 1
+                high = self.next()
+                if high == '\\':
+                    high = self.next()
+                if ord(high) < ord(low):
+                    self.error(f"Rango inválido {low}-{high}")
+                chars.update(chr(c) for c in range(ord(low), ord(high) + 1))
+            else:
+                chars.add(low)
+        self.pos += 1
+        if not chars:
+            self.error("Clase vacía")
+        return ASCII - chars if negated else frozenset(chars)
+
+# ============================================
+# AFN DE THOMPSON
+# ============================================
+
+class NFA:
+    """AFN con transiciones épsilon; los estados son índices enteros"""
+    
+    def __init__(self):
+        self.epsilon: List[List[int]] = []
+        self.edges: List[List[Tuple[FrozenSet[str], int]]] = []
+        self.accept: Dict[int, int] = {}  # estado -> prioridad (índice en la especificación)
+    
+    def new_state(self) -> int:
+        self.epsilon.append([])
+        self.edges.append([])
+        return len(self.epsilon) - 1
+    
+    def build(self, node) -> Tuple[int, int]:
+        """Fragmento de Thompson (inicio, fin) para un árbol de expresión"""
+        kind = node[0]
+        if kind == 'chars':
+            start, end = self.new_state(), self.new_state()
+            self.edges[start].append((node[1], end))
+            return start, end
+        if kind == 'cat':
+            start, middle = self.build(node[1])
+            middle2, end = self.build(node[2])
+            self.epsilon[middle].append(middle2)
+            return start, end
+        
+        start, end = self.new_state(), self.new_state()
+        if kind == 'alt':
+            for branch in node[1:]:
+                s, e = self.build(branch)
+                self.epsilon[start].append(s)
+                self.epsilon[e].append(end)
+            return start, end
+        
+        s, e = self.build(node[1])
+        self.epsilon[start].append(s)
+        self.epsilon[e].append(end)
+        if kind in ('star', 'opt'):
+            self.epsilon[start].append(end)
+        if kind in ('star', 'plus'):
+            self.epsilon[e].append(s)
+        return start, end
+    
+    def closure(self, states) -> FrozenSet[int]:
+        """Clausura épsilon de un conjunto de estados"""
+        result = set(states)
+        stack = list(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in result:
+                    result.add(target)
+                    stack.append(target)
+        return frozenset(result)
+
+def build_nfa(spec: TokenSpec) -> Tuple[NFA, int]:
+    """AFN combinado: un estado inicial con épsilon hacia cada patrón"""
+    nfa = NFA()
+    start = nfa.new_state()
+    for priority, (_, pattern) in enumerate(spec):
+        s, e = nfa.build(RegexParser(pattern).parse())
+        nfa.epsilon[start].append(s)
+        nfa.accept[e] = priority
+    return nfa, start
+
+# ============================================
+# CONSTRUCCIÓN DE SUBCONJUNTOS
+# ============================================
+
+def char_partition(nfa: NFA) -> List[FrozenSet[str]]:
+    """Particiona el alfabeto usado en clases que ninguna arista distingue"""
+    signature: Dict[str, List[int]] = {}
+    edge_sets = {chars for edges in nfa.edges for chars, _ in edges}
+    for i, chars in enumerate(edge_sets):
+        for c in chars:
+            signature.setdefault(c, []).append(i)
+    groups: Dict[Tuple[int, ...], Set[str]] = {}
+    for c, ids in signature.items():
+        groups.setdefault(tuple(ids), set()).add(c)
+    return sorted((frozenset(g) for g in groups.values()), key=min)
+
+def subset_construction(nfa: NFA, start: int, classes: List[FrozenSet[str]]):
+    """
+    AFD completo sobre las clases de caracteres.
+    Retorna (transiciones[estado][clase], aceptación[estado]); el estado 0 es
+    el muerto, el 1 el inicial, y la aceptación es la prioridad o -1.
+    """
+    representatives = [min(chars) for chars in classes]
+    dead: FrozenSet[int] = frozenset()
+    first = nfa.closure([start])
+    ids = {dead: 0, first: 1}
+    order = [dead, first]
+    table: List[List[int]] = []
+    
+    i = 0
+    while i < len(order):
+        current = order[i]
+        row = []
+        for c in representatives:
+            moved = [dst for s in current for chars, dst in nfa.edges[s] if c in chars]
+            target = nfa.closure(moved) if moved else dead
+            if target not in ids:
+                ids[target] = len(order)
+                order.append(target)
+            row.append(ids[target])
+        table.append(row)
+        i += 1
+    
+    accept = []
+    for states in order:
+        priorities = [nfa.accept[s] for s in states if s in nfa.accept]
+        accept.append(min(priorities) if priorities else -1)
+    return table, accept
+
+# ============================================
+# MINIMIZACIÓN DE HOPCROFT
+# ============================================
+
+def hopcroft(table: List[List[int]], accept: List[Any]) -> List[int]:
+    """
+    Particiona los estados en clases de equivalencia.
+    La partición inicial separa los estados por token aceptado (None si ninguno).
+    Retorna el bloque de cada estado.
+    """
+    num_states = len(table)
+    num_classes = len(table[0]) if table else 0
+    
+    # Transiciones inversas: inverse[clase][destino] = orígenes
+    inverse = [[[] for _ in range(num_states)] for _ in range(num_classes)]
+    for src, row in enumerate(table):
+        for c, dst in enumerate(row):
+            inverse[c][dst].append(src)
+    
+    initial: Dict[Any, Set[int]] = {}
+    for state, token in enumerate(accept):
+        initial.setdefault(token, set()).add(state)
+    blocks = list(initial.values())
+    block_of = [0] * num_states
+    for b, members in enumerate(blocks):
+        for state in members:
+            block_of[state] = b
+    
+    pending = list(range(len(blocks)))
+    while pending:
+        splitter = blocks[pending.pop()]
+        for c in range(num_classes):
+            predecessors = {src for dst in splitter for src in inverse[c][dst]}
+            touched: Dict[int, Set[int]] = {}
+            for state in predecessors:
+                touched.setdefault(block_of[state], set()).add(state)
+            for b, inside in touched.items():
+                block = blocks[b]
+                if len(inside) == len(block):
+                    continue
+                outside = block - inside
+                # El bloque existente conserva la mitad grande; la chica es nueva
+                small, large = (inside, outside) if len(inside) <= len(outside) else (outside, inside)
+                blocks[b] = large
+                blocks.append(small)
+                new = len(blocks) - 1
+                for state in small:
+                    block_of[state] = new
+                # Basta refinar con la mitad chica (si b seguía pendiente, ambas lo están)
+                pending.append(new)
+    return block_of
+
+# ============================================
+# GENERADOR
+# ============================================
+
+class GeneratedDFA:
+    """
+    AFD mínimo en el formato que consume CompiledDFA:
+    transiciones (estado, caracter) -> estado y estado final -> token.
+    """
+    
+    def __init__(self, transitions: Dict[Tuple[str, str], str],
+                 final_states: Dict[str, Any], start: str = "q0"):
+        self.transitions = transitions
+        self.final_states = final_states
+        self.start = start
+    
+    @property
+    def num_states(self) -> int:
+        """Estados vivos (sin contar el muerto)"""
+        names = {self.start} | set(self.final_states)
+        for (src, _), dst in self.transitions.items():
+            names.update((src, dst))
+        return len(names)
+    
+    def to_json(self, spec: TokenSpec) -> dict:
+        """Forma serializable; los tokens se guardan como índice en la especificación"""
+        index = {token: i for i, (token, _) in reversed(list(enumerate(spec)))}
+        return {
+            "start": self.start,
+            "transitions": [[src, c, dst] for (src, c), dst in sorted(self.transitions.items())],
+            "final_states": {name: index[t] for name, t in sorted(self.final_states.items())},
+        }
+    
+    @classmethod
+    def from_json(cls, data: dict, spec: TokenSpec) -> 'GeneratedDFA':
+        transitions = {(src, c): dst for src, c, dst in data["transitions"]}
+        final_states = {name: spec[i][0] for name, i in data["final_states"].items()}
+        return cls(transitions, final_states, data["start"])
+
+def generate(spec: TokenSpec) -> GeneratedDFA:
+    """Especificación -> AFN -> AFD -> AFD mínimo"""
+    nfa, start = build_nfa(spec)
+    classes = char_partition(nfa)
+    table, accept = subset_construction(nfa, start, classes)
+    block_of = hopcroft(table, [spec[p][0] if p >= 0 else None for p in accept])
+    
+    # Renombrar bloques: el del estado muerto se descarta, el inicial es q0
+    names: Dict[int, str] = {}
+    dead = block_of[0]
+    
+    def name(block: int) -> str:
+        if block not in names:
+            names[block] = f"q{len(names)}"
+        return names[block]
+    
+    name(block_of[1])
+    transitions: Dict[Tuple[str, str], str] = {}
+    final_states: Dict[str, Any] = {}
+    for state, row in enumerate(table):
+        block = block_of[state]
+        if block == dead:
+            continue
+        for c, dst in enumerate(row):
+            if block_of[dst] != dead:
+                for char in classes[c]:
+                    transitions[(name(block), char)] = name(block_of[dst])
+        if accept[state] >= 0:
+            final_states[name(block)] = spec[accept[state]][0]
+    return GeneratedDFA(transitions, final_states)
+
+# ============================================
+# CACHÉ EN DISCO
+# ============================================
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+def spec_hash(spec: TokenSpec) -> str:
+    """Huella de la especificación (y de la versión del generador)"""
+    data = json.dumps([GENERATOR_VERSION, [[str(t), p] for t, p in spec]])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+def load_or_generate(spec: TokenSpec, cache_dir: Optional[str] = CACHE_DIR) -> GeneratedDFA:
+    """
+    Retorna el AFD mínimo de la especificación, leyéndolo de la caché si existe.
+    La tabla se guarda en cache_dir/dfa-<huella>.json; con cache_dir=None no se usa disco.
+    """
+    if cache_dir is None:
+        return generate(spec)
+    
+    path = os.path.join(cache_dir, f"dfa-{spec_hash(spec)}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return GeneratedDFA.from_json(json.load(f), spec)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # Ausente o corrupta: se regenera
+    
+    dfa = generate(spec)
+    
+    # Escritura atómica: otros procesos nunca ven un archivo a medias
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dfa.to_json(spec), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # Directorio de solo lectura: se trabaja sin caché
+    return dfa
@@ -0,0 +1,195 @@
+"""
+Diagnósticos del compilador
+Las fases registran cada error o advertencia como un registro compacto
+(código, offset, LineIndex, argumentos); el texto se arma recién al
+mostrarlo. La salida por consola es un sumidero opcional.
+
+Diagnostics admite además:
+  dedup        una sola vez cada (código, símbolo)
+  max_errors   límite de errores: al alcanzarlo la fase se aborta (TooManyErrors)
+  min_severity descarta lo que esté por debajo (p. ej. solo errores)
+"""
+
+import re
+from collections.abc import Sequence
+from enum import IntEnum
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+from lexer_simple import LineIndex
+
+class Severity(IntEnum):
+    """Gravedad de un diagnóstico"""
+    WARNING = 1
+    ERROR = 2
+
+# Alias de módulo: leer Severity.ERROR en cada registro pasa por la metaclase
+ERROR = Severity.ERROR
+
+# ============================================
+# CÓDIGOS Y MENSAJES
+# ============================================
+
+# Categorías: fase y gravedad de cada código
+SYNTAX_ERROR, SEMANTIC_ERROR, SEMANTIC_WARNING = range(3)
+
+# Por categoría: (gravedad, formato con línea, columna y mensaje, marca en consola)
+CATEGORIES: List[Tuple[Severity, str, str]] = [
+    (Severity.ERROR, "Error sintáctico en línea {0}, columna {1}: {2}", ""),
+    (Severity.ERROR, "Error semántico [{0}:{1}]: {2}", "❌ "),
+    (Severity.WARNING, "Advertencia [{0}:{1}]: {2}", "⚠️  "),
+]
+
+# Código → (categoría, plantilla del mensaje con los argumentos del registro)
+MESSAGES: Dict[str, Tuple[int, str]] = {
+    # Análisis sintáctico
+    'S001': (SYNTAX_ERROR, "Se esperaba {0}, se encontró {1} ('{2}')"),
+    'S002': (SYNTAX_ERROR, "Se esperaba fin de archivo"),
+    'S003': (SYNTAX_ERROR, "Error inesperado: {0}"),
+    'S004': (SYNTAX_ERROR, "Inicio de sentencia inválido: {0}"),
+    'S005': (SYNTAX_ERROR, "Se esperaba identificador, número o '(', se encontró {0}"),
+    # Análisis semántico
+    'E001': (SEMANTIC_ERROR, "La variable '{0}' ya fue declarada en este ámbito"),
+    'E002': (SEMANTIC_ERROR, "Tipo incompatible en inicialización: se esperaba '{0}', se encontró '{1}'"),
+    'E003': (SEMANTIC_ERROR, "La variable '{0}' no ha sido declarada"),
+    'E004': (SEMANTIC_ERROR, "Tipo incompatible en asignación: se esperaba '{0}', se encontró '{1}'"),
+    'E005': (SEMANTIC_ERROR, "La condición del '{0}' debe ser de tipo booleano o numérico, se encontró '{1}'"),
+    'E006': (SEMANTIC_ERROR, "Tipos incompatibles en comparación: '{0}' y '{1}'"),
+    'E007': (SEMANTIC_ERROR, "Tipos incompatibles en operación aritmética: '{0}' {1} '{2}'"),
+    'E008': (SEMANTIC_ERROR, "El operador '{0}' requiere un operando numérico, se encontró '{1}'"),
+    'W001': (SEMANTIC_WARNING, "La variable '{0}' podría no estar inicializada"),
+}
+
+# Código → (categoría, gravedad), para registrar sin más búsquedas
+CODES: Dict[str, Tuple[int, Severity]] = {code: (category, CATEGORIES[category][0])
+                                          for code, (category, _) in MESSAGES.items()}
+
+def _full_format(category: int, template: str, mark: str = "") -> str:
+    """
+    Formato completo de un código para el operador %: línea, columna y los
+    argumentos (las plantillas usan sus argumentos en orden)
+    """
+    message = re.sub(r"\{\d+\}", "%s", template.replace("%", "%%"))
+    return (mark + CATEGORIES[category][1]).replace("%", "%%").format("%s", "%s", message)
+
+# Código → formato completo (y con la marca de consola): un solo % por diagnóstico
+FORMATS = {code: _full_format(category, template) for code, (category, template) in MESSAGES.items()}
+CONSOLE_FORMATS = {code: _full_format(category, template, CATEGORIES[category][2])
+                   for code, (category, template) in MESSAGES.items()}
+
+class Diagnostic(NamedTuple):
+    """Un diagnóstico sin formatear"""
+    code: str
+    offset: int
+    lines: Optional[LineIndex]
+    args: Tuple[Any, ...]
+    
+    @property
+    def category(self) -> int:
+        return MESSAGES[self.code][0]
+    
+    @property
+    def severity(self) -> Severity:
+        return CODES[self.code][1]
+    
+    @property
+    def position(self) -> Tuple[int, int]:
+        """(línea, columna), resueltas bajo demanda"""
+        return self.lines.position(self.offset) if self.lines else (0, 0)
+    
+    def message(self) -> str:
+        """Mensaje sin ubicación"""
+        return MESSAGES[self.code][1].format(*self.args)
+    
+    def __str__(self) -> str:
+        return FORMATS[self.code] % (self.position + self.args)
+
+# Construye un Diagnostic sin pasar por el __new__ generado de NamedTuple
+_new_record = tuple.__new__
+
+def console_sink(diagnostic: Diagnostic):
+    """Sumidero que imprime cada diagnóstico al registrarse"""
+    code, offset, lines, args = diagnostic
+    print(CONSOLE_FORMATS[code] % ((lines.position(offset) if lines else (0, 0)) + args))
+
+class TooManyErrors(Exception):
+    """Se alcanzó Diagnostics.max_errors: la fase en curso se aborta"""
+
+# ============================================
+# COLECTOR
+# ============================================
+
+class MessageView(Sequence):
+    """Lista de solo lectura con el texto de los diagnósticos de una categoría (formateado al leerlo)"""
+    
+    def __init__(self, records: List[Diagnostic]):
+        self.records = records
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [str(record) for record in self.records[i]]
+        return str(self.records[i])
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MessageView, list)):
+            return list(self) == list(other)
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+class Diagnostics:
+    """
+    Colector de diagnósticos compartido por las fases.
+    Con console=True (por defecto) cada diagnóstico se imprime al
+    registrarse, como hacían las fases; sinks agrega otros sumideros
+    """
+    
+    def __init__(self, console: bool = True, sinks: Optional[List[Callable[[Diagnostic], None]]] = None,
+                 max_errors: Optional[int] = None, min_severity: Severity = Severity.WARNING,
+                 dedup: bool = False):
+        self.sinks = ([console_sink] if console else []) + list(sinks or [])
+        self.max_errors = max_errors
+        self.min_severity = min_severity
+        self.dedup = dedup
+        self.records: List[Diagnostic] = []
+        self.by_category: List[List[Diagnostic]] = [[] for _ in CATEGORIES]
+        self.error_count = 0
+        self.seen: Set[Tuple[str, Hashable]] = set()
+        self.suppressed = 0  # descartados por dedup o por gravedad
+        self.aborted = False
+    
+    def report(self, code: str, offset: int, lines: Optional[LineIndex], *args, key: Hashable = None) -> bool:
+        """
+        Registra un diagnóstico; key identifica el símbolo para dedup.
+        Retorna False si se descartó. Lanza TooManyErrors al llegar a max_errors
+        """
+        category, severity = CODES[code]
+        if severity < self.min_severity or self.aborted:
+            self.suppressed += 1
+            return False
+        if key is not None and self.dedup:
+            if (code, key) in self.seen:
+                self.suppressed += 1
+                return False
+            self.seen.add((code, key))
+        
+        record = _new_record(Diagnostic, (code, offset, lines, args))
+        self.records.append(record)
+        self.by_category[category].append(record)
+        for sink in self.sinks:
+            sink(record)
+        
+        if severity is ERROR:
+            self.error_count += 1
+            if self.max_errors is not None and self.error_count >= self.max_errors:
+                # Lo que llegue después (p. ej. al desenrollar la pila) se descarta
+                self.aborted = True
+                raise TooManyErrors(f"Se alcanzó el límite de {self.max_errors} errores")
+        return True
+    
+    def messages(self, category: int) -> MessageView:
+        """Textos de una categoría (SYNTAX_ERROR, SEMANTIC_ERROR o SEMANTIC_WARNING)"""
+        return MessageView(self.by_category[category])
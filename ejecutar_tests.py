@@ -5,9 +5,23 @@ Ejecuta todos los casos de prueba y genera un reporte
 
 import sys
 import os
+import io
+import glob
+import contextlib
+import random
+import tempfile
 
 # Importar el módulo main_compiler
-from main_compiler import compile_source
+from main_compiler import compile_source, compile_file, compile_stream
+from lexer_simple import Lexer, TokenType
+from dfa_generator import generate, load_or_generate
+from parser_rd import (Parser, IncrementalParser, CHILD_FIELDS, STMT_EXPR_FIELDS, K_EOF,
+                       ASTNode, Literal, Identifier, BinaryOp, UnaryOp, PrintStmt)
+from semantic_analyzer import SemanticAnalyzer, SymbolTable, TypeAnnotations
+from diagnostics import Diagnostics, Severity
+from compile_cache import CompileCache
+import type_system
+from ast_visitor import Visitor, handles
 
 # Colores para la salida (compatible con Windows)
 try:
@@ -27,6 +41,767 @@ def print_header(text):
     print(f"{BLUE}{text}{RESET}")
     print('='*80)
 
+# Fragmentos con casos borde del analizador léxico
+LEXER_EDGE_CASES = [
+    "int x = 10; float pi = 3.14; int edad; string integer;",
+    "x = 1.; y = .5; z = 12.50; w = 007;",
+    "a||b && c | d & e",
+    "if (a<=b) { a = a >= b; } else { a = !a != b; }",
+    "x = a / b /* c */ / d // fin\n;",
+    "/*/ no cierra */ int edad; /**/ /***/ x;",
+    "/* comentario\n sin cerrar",
+    "// comentario sin salto",
+    "rpm = rpm @ 500; é ñ # $",
+    "\t\r\n\x0c\x1c int\u2003x;\n\n  ",
+    "",
+]
+
+def sample_sources():
+    """Retorna los códigos de ejemplo y los casos borde del léxico"""
+    sources = list(LEXER_EDGE_CASES)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(base_dir, 'ejemplos', '*.txt'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            sources.append(f.read())
+    return sources
+
+def token_key(tokens):
+    """Representación comparable de una secuencia de tokens"""
+    return [(t.type, t.value, t.offset, t.line, t.column) for t in tokens]
+
+def check_streaming():
+    """iter_tokens por bloques debe producir los mismos tokens que tokenize"""
+    failures = []
+    for source in sample_sources():
+        expected = token_key(Lexer(source).tokenize())
+        for chunk_size in (1, 2, 3, 7, 64):
+            tokens = Lexer.iter_tokens(io.StringIO(source), chunk_size=chunk_size)
+            if token_key(tokens) != expected:
+                failures.append(f"chunk_size={chunk_size}: {source[:40]!r}")
+    return failures
+
+def check_regex_engine():
+    """El motor "regex" debe producir los mismos tokens que el AFD (texto y bytes)"""
+    failures = []
+    for source in sample_sources():
+        for variant in (source, source.encode('utf-8')):
+            expected = token_key(Lexer(variant).tokenize())
+            if token_key(Lexer(variant, engine="regex").tokenize()) != expected:
+                failures.append(f"tokenize: {variant[:40]!r}")
+            if token_key(Lexer(variant, engine="regex").tokenize_buffer()) != expected:
+                failures.append(f"tokenize_buffer: {variant[:40]!r}")
+    return failures
+
+def check_dfa_generator():
+    """La tabla en caché debe coincidir con una generada de cero y reconocer cada token"""
+    failures = []
+    fresh = generate(Lexer.token_spec)
+    cached = load_or_generate(Lexer.token_spec)
+    if (fresh.transitions, fresh.final_states) != (cached.transitions, cached.final_states):
+        failures.append("la tabla en caché difiere de la generada")
+    samples = [(t, t.value) for t, _ in Lexer.token_spec if t not in (TokenType.ID, TokenType.NUM)]
+    samples += [(TokenType.NUM, "0"), (TokenType.NUM, "12.50"),
+                (TokenType.ID, "x"), (TokenType.ID, "_a1"), (TokenType.ID, "int")]
+    for token_type, text in samples:
+        state = fresh.start
+        for c in text:
+            state = fresh.transitions.get((state, c))
+        if fresh.final_states.get(state) != token_type:
+            failures.append(f"{text!r} no se reconoce como {token_type.name}")
+    return failures
+
+def check_name_interning():
+    """Cada ID lleva un id denso que identifica a su nombre (en todas las vías de tokenización)"""
+    failures = []
+    for source in sample_sources():
+        lexer = Lexer(source)
+        variants = {
+            "tokenize": lexer.tokenize(),
+            "tokenize_buffer": list(Lexer(source, names=lexer.names).tokenize_buffer()),
+            "tokenize_parallel": list(Lexer(source, names=lexer.names)
+                                      .tokenize_parallel(max_workers=2, shard_size=16)),
+            "iter_tokens": list(Lexer.iter_tokens(io.StringIO(source), chunk_size=7)),
+        }
+        for variant, tokens in variants.items():
+            ids = {}
+            for token in tokens:
+                if (token.type == TokenType.ID) != (token.name_id >= 0):
+                    failures.append(f"{variant}: id de nombre en {token}")
+                elif token.type == TokenType.ID and ids.setdefault(token.value, token.name_id) != token.name_id:
+                    failures.append(f"{variant}: '{token.value}' con dos ids")
+            if variant != "iter_tokens" and any(lexer.names.name(i) != name for name, i in ids.items()):
+                failures.append(f"{variant}: ids distintos de la tabla compartida")
+    return failures
+
+# Ediciones (posición relativa, caracteres eliminados, texto insertado) para relex
+RELEX_EDITS = [
+    (0.0, 0, "int a;\n"), (0.5, 1, ""), (0.5, 0, "/*"), (0.3, 0, "*/"),
+    (0.5, 2, "//"), (1.0, 0, "\n1."), (0.7, 3, "5"), (0.2, 0, "é"),
+]
+
+def check_relex():
+    """relex tras una serie de ediciones debe coincidir con re-tokenizar todo"""
+    failures = []
+    for source in sample_sources():
+        lexer = Lexer(source)
+        tokens = lexer.tokenize()
+        for where, removed, text in RELEX_EDITS:
+            offset = int(len(lexer.source) * where)
+            removed = min(removed, len(lexer.source) - offset)
+            expected = lexer.source[:offset] + text + lexer.source[offset + removed:]
+            tokens = lexer.relex(tokens, offset, removed, text)
+            if token_key(tokens) != token_key(Lexer(expected).tokenize()):
+                failures.append(f"edición {(where, removed, text)!r}: {source[:40]!r}")
+                break
+    return failures
+
+def check_parallel():
+    """tokenize_parallel debe producir los mismos tokens que tokenize"""
+    failures = []
+    sources = sample_sources()
+    # Un fuente con muchos saltos de línea dentro y fuera de comentarios
+    sources.append("\n".join(sources))
+    for source in sources:
+        expected = token_key(Lexer(source).tokenize())
+        for shard_size in (1, 16):
+            tokens = Lexer(source).tokenize_parallel(max_workers=2, shard_size=shard_size)
+            if token_key(tokens) != expected:
+                failures.append(f"shard_size={shard_size}: {source[:40]!r}")
+    return failures
+
+def check_mmap():
+    """compile_file(use_mmap=True) debe dar el resultado del texto y reportar un UTF-8 inválido sin fases"""
+    failures = []
+    cases = [("ascii", "int x = 1; print(x);".encode('utf-8')),
+             ("no ascii", "int x = 1; // é\nprint(x);".encode('utf-8')),
+             ("utf-8 inválido", b"int x = 1;\n// \xe9\nprint(x);")]
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in cases:
+            path = os.path.join(directory, name.replace(' ', '_') + '.txt')
+            with open(path, 'wb') as f:
+                f.write(data)
+            results = []
+            for use_mmap in (False, True):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    results.append((compile_file(path, use_mmap=use_mmap), "FASE" in output.getvalue(),
+                                    "Error al leer el archivo" in output.getvalue()))
+            if results[1] != results[0]:
+                failures.append(f"{name}: mmap {results[1]}, texto {results[0]}")
+            elif name == "utf-8 inválido" and results[1] != (False, False, True):
+                failures.append(f"{name}: {results[1]}")
+    return failures
+
+# Fragmentos con casos borde del analizador sintáctico
+PARSER_EDGE_CASES = [
+    "x = a || b && c || !d && -e;",
+    "x = a + b * c - d / e % f - -g;",
+    "x = a < b + c == d;",
+    "x = (a < b) < c; y = a < b && c >= d || e != f;",
+    "x = a < b < c; y = 1;",
+    "x = ((((a)))) * (b + (c - (d)));",
+    "x = a + ; y = * b; z = (a + b;",
+    "print(a, b + 1, !c); print();",
+    "if (a) if (b) x = 1; else x = 2; while (x < 3) { x = x + 1; }",
+    "int x = ; float y = 1.5 int z; { x = 1; ",
+    "x = - - ! a; y = a - - b;",
+]
+
+def parse_result(source, engine):
+    """Sentencias, errores y posición final del parser (sin su salida por consola)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser(Lexer(source).tokenize(), engine)
+        statements = parser.parse_stmt_list()
+    return statements, parser.errors, parser.pos
+
+def check_parser_engines():
+    """Cada motor del parser debe producir el mismo AST y los mismos errores que "rd" """
+    failures = []
+    for source in PARSER_EDGE_CASES + sample_sources():
+        expected = parse_result(source, "rd")
+        for engine in Parser.engines[1:]:
+            if parse_result(source, engine) != expected:
+                failures.append(f"{engine}: {source[:40]!r}")
+    return failures
+
+def check_pipeline():
+    """Parsear y analizar sentencia a sentencia sobre iter_tokens debe dar los mismos resultados"""
+    failures = []
+    for source in PARSER_EDGE_CASES + sample_sources():
+        for engine in Parser.engines:
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser = Parser(Lexer(source).tokenize(), engine)
+                statements = parser.parse_stmt_list()
+                if parser.kind != K_EOF:
+                    parser.error("S002")
+                batch = SemanticAnalyzer()
+                for stmt in statements:
+                    batch.visit_stmt(stmt)
+                
+                stream = Parser(Lexer.iter_tokens(io.StringIO(source), chunk_size=7), engine)
+                streamed = []
+                pipeline = SemanticAnalyzer()
+                pipeline.analyze_stream(stmt for stmt in stream.iter_statements() if not streamed.append(stmt))
+            if (streamed, stream.errors) != (statements, parser.errors):
+                failures.append(f"{engine} (parser): {source[:40]!r}")
+            elif (pipeline.errors, pipeline.warnings) != (batch.errors, batch.warnings):
+                failures.append(f"{engine} (semántico): {source[:40]!r}")
+    return failures
+
+def check_stream_read_error():
+    """compile_stream debe reportar un UTF-8 inválido de un bloque posterior como compile_file"""
+    failures = []
+    # El byte inválido queda más allá del primer bloque (y del búfer del archivo)
+    data = b"int x = 1;\n" + b"x = x + 1;\n" * 2000 + b"// \xe9\nprint(x);\n"
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "invalido.txt")
+        with open(path, 'wb') as f:
+            f.write(data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = compile_file(path)
+        for chunk_size in (64, 1 << 16):
+            output = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(output):
+                    result = compile_stream(path, chunk_size)
+            except UnicodeDecodeError as e:
+                failures.append(f"chunk_size={chunk_size}: UnicodeDecodeError sin manejar ({e.reason})")
+                continue
+            if result is not expected or "Error al leer el archivo" not in output.getvalue():
+                failures.append(f"chunk_size={chunk_size}: {result}, se esperaba {expected}")
+    return failures
+
+# Ediciones sucesivas (texto buscado → reemplazo) sobre INCREMENTAL_SOURCE
+INCREMENTAL_SOURCE = (
+    "int x = 1;\n"
+    "if (x > 0) { x = x + 1; while (x < 10) { x = x * 2; print(x); } }\n"
+    "{ int y = 2; if (y) y = 3; print(x, y); }\n"
+    "x = 4;\n"
+)
+INCREMENTAL_EDITS = [
+    ("x = 4;", "x = 44;"), ("x = 1;", "x = 1;\nint z;"), ("print(x);", "print(x); x = 5;"),
+    ("y = 3;", "y = 3; else y = 6;"), (" else y = 6;", ""), ("{ int y", "\n\n  { int y"),
+    ("x * 2;", "x * 2 /* c */;"), ("x = 44;", "x = ;"), ("x = ;", "x = 4;"),
+]
+
+def node_positions(node):
+    """(clase, línea, columna) de todos los nodos del árbol"""
+    positions = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        positions.append((type(node).__name__, node.line, node.column))
+        for name in CHILD_FIELDS[type(node)]:
+            child = getattr(node, name)
+            if isinstance(child, list):
+                pending.extend(child)
+            elif child is not None:
+                pending.append(child)
+    return positions
+
+def check_incremental_parse():
+    """IncrementalParser debe dar el mismo árbol que un parseo completo, reutilizando sentencias"""
+    failures = []
+    for engine in Parser.engines:
+        for use_relex in (True, False):
+            lexer = Lexer(INCREMENTAL_SOURCE)
+            tokens = lexer.tokenize()
+            incremental = IncrementalParser(engine)
+            reused = 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                incremental.parse(tokens)
+                for old, new in INCREMENTAL_EDITS:
+                    offset = lexer.source.find(old)
+                    if use_relex:
+                        tokens = lexer.relex(tokens, offset, len(old), new)
+                    else:
+                        lexer = Lexer(lexer.source[:offset] + new + lexer.source[offset + len(old):])
+                        tokens = lexer.tokenize()
+                    program = incremental.parse(tokens)
+                    expected = Parser(tokens, engine).parse()
+                    reused += incremental.reused
+                    if program != expected or (program and node_positions(program) != node_positions(expected)):
+                        failures.append(f"{engine}, relex={use_relex}: edición {(old, new)!r}")
+                        break
+            if not reused:
+                failures.append(f"{engine}, relex={use_relex}: no se reutilizó ninguna sentencia")
+    return failures
+
+def compile_output(source, cache=None):
+    """Resultado y salida por consola de compile_source"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = compile_source(source, "prueba", cache)
+    return result, output.getvalue()
+
+def check_compile_cache():
+    """Una compilación servida por la caché (memoria o disco) debe repetir resultado, salida y fases"""
+    failures = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CompileCache(cache_dir)
+        for source in PARSER_EDGE_CASES + LEXER_EDGE_CASES + sample_sources():
+            expected = compile_output(source)
+            if compile_output(source, cache) != expected:
+                failures.append(f"fallo de caché: {source[:40]!r}")
+                continue
+            
+            for level, level_cache in (("memoria", cache), ("disco", CompileCache(cache_dir))):
+                hits = level_cache.hits
+                if compile_output(source, level_cache) != expected or level_cache.hits != hits + 1:
+                    failures.append(f"acierto en {level}: {source[:40]!r}")
+            
+            # Fases guardadas: tokens y AST decodificados
+            entry = CompileCache(cache_dir).get(cache.key(source))
+            tokens = entry.token_buffer(source)
+            with contextlib.redirect_stdout(io.StringIO()):
+                program = Parser(tokens, "pratt").parse() if not entry.lexical_errors else None
+            if token_key(tokens) != token_key(Lexer(source).tokenize()):
+                failures.append(f"tokens: {source[:40]!r}")
+            elif entry.program(source) != program or (program and node_positions(entry.program(source)) != node_positions(program)):
+                failures.append(f"AST: {source[:40]!r}")
+    return failures
+
+# Usos repetidos sin inicializar, variables no declaradas y una redeclaración
+DIAGNOSTICS_SOURCE = "int x; int y; y = x + x; z = 1; y = x * 2; z = 2; w = z; int y; { int x; y = x; }"
+
+def analyze_with(diagnostics, source=DIAGNOSTICS_SOURCE):
+    """Analiza source con el colector dado; retorna (errores, advertencias, salida)"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        ast = Parser(Lexer(source).tokenize(), diagnostics=diagnostics).parse()
+        semantic = SemanticAnalyzer(diagnostics)
+        semantic.analyze(ast)
+    return list(semantic.errors), list(semantic.warnings), output.getvalue()
+
+def check_diagnostics():
+    """Sumidero opcional, dedup por símbolo, filtro por gravedad y límite de errores"""
+    failures = []
+    errors, warnings, output = analyze_with(Diagnostics())
+    if (len(errors), len(warnings)) != (4, 4) or any(message not in output for message in errors + warnings):
+        failures.append(f"por defecto: {len(errors)} errores, {len(warnings)} advertencias")
+    
+    if analyze_with(Diagnostics(console=False))[:2] != (errors, warnings):
+        failures.append("sin consola: mensajes distintos")
+    elif any(message in analyze_with(Diagnostics(console=False))[2] for message in errors + warnings):
+        failures.append("sin consola: se imprimieron diagnósticos")
+    
+    # dedup: una advertencia por declaración de x y un error por nombre no declarado
+    deduped = analyze_with(Diagnostics(dedup=True))
+    if deduped[:2] != ([errors[0], errors[2], errors[3]], [warnings[0], warnings[3]]):
+        failures.append(f"dedup: {deduped[:2]}")
+    
+    if analyze_with(Diagnostics(min_severity=Severity.ERROR))[:2] != (errors, []):
+        failures.append("min_severity=ERROR: no coincide")
+    
+    capped = analyze_with(Diagnostics(max_errors=2))
+    if capped[0] != errors[:2] or "análisis abortado" not in capped[2]:
+        failures.append(f"max_errors=2 (semántico): {capped[0]}")
+    
+    # Límite en el parser: se aborta en el primer error de la sentencia rota
+    for engine in Parser.engines:
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = Parser(Lexer("int = 1; x = ; y = (;").tokenize(), engine,
+                            diagnostics=Diagnostics(max_errors=1))
+            program = parser.parse()
+        if program is not None or len(parser.errors) != 1:
+            failures.append(f"max_errors=1 ({engine}): {list(parser.errors)}")
+    return failures
+
+# Subexpresiones repetidas (y anidadas) para el hash-consing
+SHARED_EXPR_SOURCE = (
+    "int rpm = 1; int contador; float t = 2.5; string nombre;\n"
+    "if (contador % 2 == 0) rpm = rpm + 500; else { int q; rpm = (rpm + 500) * (rpm + 500); }\n"
+    "while (contador % 2 == 0 && rpm + 500 > t) { print(rpm + 500, -rpm, -rpm); contador = contador + 1; }\n"
+    "rpm = s + 500; rpm = s + 500; t = rpm    +    500 - nombre; t = -nombre + -nombre;\n"
+)
+
+def expr_signature(program, exprs=None):
+    """(clase, operador/valor/nombre, offset) de cada expresión, en preorden por sentencia"""
+    signature = []
+    pending = list(reversed(program.statements))
+    number = 0
+    while pending:
+        stmt = pending.pop()
+        index = exprs.starts[number] if exprs is not None else 0
+        number += 1
+        for name in STMT_EXPR_FIELDS.get(type(stmt), ()):
+            value = getattr(stmt, name)
+            nodes = list(reversed(value)) if isinstance(value, list) else [value]
+            while nodes:
+                node = nodes.pop()
+                label = None if node is None else getattr(node, 'operator', None) or getattr(node, 'value', None) or node.name
+                offset = 0 if node is None else node.offset
+                signature.append((type(node).__name__, label, exprs.offsets[index] if exprs is not None else offset))
+                index += 1
+                if node is not None:
+                    nodes.extend(reversed([getattr(node, field) for field in CHILD_FIELDS[type(node)]]))
+        for name in ('statements', 'else_stmt', 'then_stmt', 'body'):
+            child = getattr(stmt, name, None)
+            if isinstance(child, list):
+                pending.extend(reversed(child))
+            elif child is not None:
+                pending.append(child)
+    return signature
+
+def check_shared_exprs():
+    """Con share_exprs: mismas expresiones y posiciones, mismos diagnósticos, y nodos compartidos"""
+    failures = []
+    for source in PARSER_EDGE_CASES + sample_sources() + [SHARED_EXPR_SOURCE]:
+        for engine in Parser.engines:
+            tokens = Lexer(source).tokenize()
+            with contextlib.redirect_stdout(io.StringIO()):
+                tree = Parser(tokens, engine).parse()
+                shared = Parser(tokens, engine, share_exprs=True)
+                dag = shared.parse()
+                if tree is None:
+                    continue
+                expected = SemanticAnalyzer(Diagnostics(console=False))
+                expected.analyze(tree)
+                semantic = SemanticAnalyzer(Diagnostics(console=False), shared.exprs)
+                semantic.analyze(dag)
+            if expr_signature(dag, shared.exprs) != expr_signature(tree):
+                failures.append(f"{engine} (expresiones): {source[:40]!r}")
+            elif (semantic.errors, semantic.warnings) != (expected.errors, expected.warnings):
+                failures.append(f"{engine} (diagnósticos): {source[:40]!r}")
+            elif source is SHARED_EXPR_SOURCE and shared.exprs.shared * 2 < shared.exprs.occurrences:
+                failures.append(f"{engine}: {shared.exprs.shared} de {shared.exprs.occurrences} apariciones compartidas")
+    return failures
+
+def check_deep_nesting():
+    """El motor "stack" debe aceptar anidamientos muy por encima del límite de recursión"""
+    failures = []
+    depth = 20 * sys.getrecursionlimit()
+    sources = {
+        "bloques": "int x;" + "{" * depth + "x = 1;" + "}" * depth,
+        "paréntesis": "int x; x = " + "(" * depth + "x" + ")" * depth + ";",
+        "if/while": "int x;" + "if (x) while (x) " * (depth // 2) + "x = 1;",
+        "unarios": "int x; x = " + "-" * depth + "x;",
+    }
+    for name, source in sources.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = Parser(Lexer(source).tokenize(), "stack")
+            program = parser.parse()
+        if program is None:
+            failures.append(f"{name}: {parser.errors[0]}")
+    return failures
+
+def check_symbol_table():
+    """Pilas de declaraciones frente a la búsqueda ámbito por ámbito, y ámbitos cerrados en el reporte"""
+    failures = []
+    rng = random.Random(21)
+    table = SymbolTable()
+    reference = [{}]  # la tabla anterior: un dict por ámbito, buscado de adentro hacia afuera
+    opened = 1
+    for step in range(20000):
+        action = rng.random()
+        name = f"v{rng.randrange(8)}"
+        if action < 0.2:
+            table.enter_scope()
+            reference.append({})
+            opened += 1
+        elif action < 0.35:
+            table.exit_scope()
+            if len(reference) > 1:
+                reference.pop()
+        elif action < 0.6:
+            declared = table.declare(name, "int", step, 1)
+            if declared != (name not in reference[-1]):
+                failures.append(f"paso {step}: declare('{name}') = {declared}")
+            reference[-1].setdefault(name, step)
+        else:
+            symbol = table.lookup(name)
+            expected = next((scope[name] for scope in reversed(reference) if name in scope), None)
+            if (symbol.line if symbol else None) != expected:
+                failures.append(f"paso {step}: lookup('{name}') = {symbol}, se esperaba línea {expected}")
+        if table.current_scope != len(reference) - 1:
+            failures.append(f"paso {step}: ámbito {table.current_scope}, se esperaba {len(reference) - 1}")
+        if failures:
+            return failures
+    
+    alive = sum(1 for _, _, is_alive in table.history if is_alive)
+    if len(table.history) != opened or alive != len(reference):
+        failures.append(f"history: {len(table.history)} ámbitos ({alive} vivos), se esperaban {opened} ({len(reference)})")
+    
+    # Sombreado en bloques anidados: cada nivel redeclara x con otro tipo
+    depth = 200
+    types = ["int", "string"]
+    source = "int x = 0;" + "".join(f"{{ {types[(i + 1) % 2]} x; x = 1;" for i in range(depth)) + "}" * depth + "x = 2;"
+    semantic = SemanticAnalyzer(Diagnostics(console=False))
+    with contextlib.redirect_stdout(io.StringIO()):
+        semantic.analyze(Parser(Lexer(source).tokenize()).parse())
+    if len(semantic.errors) != depth // 2:
+        failures.append(f"sombreado: {len(semantic.errors)} errores, se esperaban {depth // 2}")
+    if len(semantic.symbol_table.history) != depth + 1 or len(semantic.symbol_table.scopes) != 1:
+        failures.append(f"sombreado: {len(semantic.symbol_table.history)} ámbitos en history")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        semantic.symbol_table.print_table(include_exited=True)
+    if output.getvalue().count("(cerrado)") != depth:
+        failures.append("print_table(include_exited=True) no muestra los ámbitos cerrados")
+    return failures
+
+def reference_binary_type(operator, left, right):
+    """Reglas de las operaciones binarias por nombre de tipo: (resultado, código de error)"""
+    if operator in ['||', '&&']:
+        return 'bool', None
+    if operator in ['==', '!=', '<', '<=', '>', '>=']:
+        if (left in ['int', 'float'] and right in ['int', 'float']) or left == right:
+            return 'bool', None
+        return 'bool', 'E006'
+    if left == 'float' or right == 'float':
+        return 'float', None
+    if left == 'int' and right == 'int':
+        return 'int', None
+    return 'unknown', 'E007'
+
+def check_type_tables():
+    """Las tablas de type_system deben coincidir con las reglas por nombre de tipo"""
+    failures = []
+    names = type_system.TYPE_NAMES
+    for operator, op in type_system.BINARY_OPS.items():
+        for left in names:
+            for right in names:
+                entry = type_system.BINARY_RESULT[op][type_system.type_id(left)][type_system.type_id(right)]
+                result = (names[entry & type_system.TYPE_MASK], bool(entry & type_system.INVALID))
+                expected, code = reference_binary_type(operator, left, right)
+                if result != (expected, code is not None):
+                    failures.append(f"'{left}' {operator} '{right}': {result}, se esperaba {(expected, code)}")
+    for operand in names:
+        entry = type_system.UNARY_RESULT[type_system.NEG][type_system.type_id(operand)]
+        expected = operand if operand in ['int', 'float'] else 'unknown'
+        if names[entry & type_system.TYPE_MASK] != expected or bool(entry & type_system.INVALID) != (expected == 'unknown'):
+            failures.append(f"-'{operand}': {entry}")
+        for target in names:
+            expected = target == operand or (target, operand) == ('float', 'int') or operand == 'unknown'
+            if type_system.is_compatible(type_system.type_id(target), type_system.type_id(operand)) != expected:
+                failures.append(f"'{target}' = '{operand}': se esperaba {expected}")
+        condition = bool(type_system.CONDITION_TYPES >> type_system.type_id(operand) & 1)
+        if condition != (operand in ['bool', 'int', 'float', 'unknown']):
+            failures.append(f"condición de tipo '{operand}'")
+    return failures
+
+def check_visitor_dispatch():
+    """Despacho de Visitor: por clase, subclases por MRO, herencia de visitantes y caché"""
+    failures = []
+    
+    class Base(Visitor):
+        @handles(Literal, Identifier)
+        def visit_leaf(self, node):
+            return "hoja"
+        
+        @handles(ASTNode)
+        def visit_other(self, node):
+            return "nodo"
+    
+    class Derived(Base):
+        def visit_leaf(self, node):  # redefinido sin @handles: sigue manejando las hojas
+            return "hoja derivada"
+        
+        @handles(BinaryOp)
+        def visit_binary(self, node):
+            return "binaria"
+    
+    class SpecialLiteral(Literal):
+        pass
+    
+    literal = Literal(value="1")
+    binary = BinaryOp(left=literal, operator="+", right=literal)
+    cases = [
+        (Base(), literal, "hoja"), (Base(), SpecialLiteral(value="2"), "hoja"),
+        (Base(), binary, "nodo"), (Base(), None, None),
+        (Derived(), literal, "hoja derivada"), (Derived(), binary, "binaria"),
+        (Derived(), PrintStmt(arguments=[]), "nodo"),
+    ]
+    for visitor, node, expected in cases:
+        result = visitor.visit(node)
+        if result != expected:
+            failures.append(f"{type(visitor).__name__}.visit({type(node).__name__}) = {result!r}, se esperaba {expected!r}")
+    if SpecialLiteral not in Base.dispatch or Base.dispatch is Derived.dispatch:
+        failures.append("la tabla de despacho no se cachea por clase de visitante")
+    return failures
+
+class RecursiveAnalyzer(SemanticAnalyzer):
+    """Inferencia de tipos recursiva, como referencia del recorrido con pila explícita"""
+    
+    def get_expr_type(self, node):
+        index = self.expr_index
+        self.expr_index = index + 1
+        operand_types = [self.get_expr_type(getattr(node, name)) for name in CHILD_FIELDS.get(type(node), ())]
+        return self.dispatch[type(node)](self, node, index, *operand_types)
+
+def random_expression(rng, depth):
+    """Expresión aleatoria con variables de varios tipos, sin declarar y sin inicializar"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["i", "f", "s", "u", "q", "1", "2.5"])
+    if rng.random() < 0.15:
+        return rng.choice(["-", "!"]) + random_expression(rng, depth - 1)
+    operator = rng.choice(["+", "-", "*", "/", "%", "<", "==", "!=", "&&", "||"])
+    return f"({random_expression(rng, depth - 1)} {operator} {random_expression(rng, depth - 1)})"
+
+def check_iterative_analysis():
+    """Análisis con pila explícita: mismos diagnósticos (y orden) que la recursión, y sin límite de profundidad"""
+    failures = []
+    rng = random.Random(24)
+    header = "int i = 1; float f = 2.0; string s; int u; "
+    sources = [header + "".join(f"{rng.choice(['i', 'f', 's'])} = {random_expression(rng, 6)}; "
+                                f"if ({random_expression(rng, 3)}) {{ int i; print({random_expression(rng, 4)}); }}"
+                                for _ in range(20))
+               for _ in range(10)]
+    for source in sample_sources() + sources:
+        for share in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser = Parser(Lexer(source).tokenize(), "pratt", share_exprs=share)
+                ast = parser.parse()
+                if ast is None:
+                    continue
+                expected = RecursiveAnalyzer(Diagnostics(console=False), parser.exprs)
+                expected.analyze(ast)
+                semantic = SemanticAnalyzer(Diagnostics(console=False), parser.exprs)
+                semantic.analyze(ast)
+            if list(semantic.diagnostics.records) != list(expected.diagnostics.records):
+                failures.append(f"share_exprs={share}: diagnósticos distintos en {source[:40]!r}")
+    
+    depth = 20 * sys.getrecursionlimit()
+    deep = {
+        "a + a + ...": ("int a = 1; int r; r = " + " + ".join(["a"] * depth) + ";", 0),
+        "-(-(...))": ("int a = 1; int r; r = " + "-(" * depth + "a" + ")" * depth + ";", 0),
+        "bloques": ("int x;" + "{" * depth + "x = y;" + "}" * depth, 1),
+        "if/while": ("int x = 1;" + "if (x) while (x) " * (depth // 2) + "x = 1.5;", 1),
+    }
+    for name, (source, errors) in deep.items():
+        semantic = SemanticAnalyzer(Diagnostics(console=False))
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                semantic.analyze(Parser(Lexer(source).tokenize(), "stack").parse())
+            except RecursionError:
+                failures.append(f"{name}: RecursionError")
+                continue
+        if len(semantic.errors) != errors:
+            failures.append(f"{name}: {len(semantic.errors)} errores, se esperaban {errors}")
+    return failures
+
+# Una misma expresión compartida con distinto tipo según el ámbito
+ANNOTATION_SOURCE = """
+int x = 1; int y; int z;
+y = x + 1;
+{ float x = 2.5; y = x + 1; }
+{ int x; y = x + 1; }
+y = x + 1 + z;
+z = 2;
+y = x + 1 + z;
+"""
+
+def check_type_annotations():
+    """Anotaciones: mismos diagnósticos, tipos anotados, y reutilización tras una edición"""
+    failures = []
+    rng = random.Random(25)
+    header = "int i = 1; float f = 2.0; string s; int u; "
+    sources = [header + "".join(f"i = {random_expression(rng, 5)}; {{ float i = 1.5; f = {random_expression(rng, 3)}; }} "
+                                for _ in range(20))
+               for _ in range(5)]
+    for source in sample_sources() + sources + [ANNOTATION_SOURCE]:
+        for share in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                parser = Parser(Lexer(source).tokenize(), "pratt", share_exprs=share)
+                ast = parser.parse()
+                if ast is None:
+                    continue
+                expected = SemanticAnalyzer(Diagnostics(console=False), parser.exprs)
+                expected.analyze(ast)
+                annotations = TypeAnnotations()
+                runs = []
+                for _ in range(2):
+                    semantic = SemanticAnalyzer(Diagnostics(console=False), parser.exprs, annotations)
+                    semantic.analyze(ast)
+                    runs.append(semantic.diagnostics.records)
+            if any(records != expected.diagnostics.records for records in runs):
+                failures.append(f"share_exprs={share}: diagnósticos distintos en {source[:40]!r}")
+            elif len(ast.statements) > 3 and not annotations.reused:
+                failures.append(f"share_exprs={share}: ninguna expresión reutilizada en {source[:40]!r}")
+    
+    # Tipos y símbolos anotados
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast = Parser(Lexer("int a = 1; float b; b = a * 2.5 + -a;").tokenize(), "pratt").parse()
+        annotations = TypeAnnotations()
+        SemanticAnalyzer(Diagnostics(console=False), annotations=annotations).analyze(ast)
+    value = ast.statements[2].value
+    found = (annotations.type_of(value), annotations.type_of(value.left), annotations.type_of(value.right),
+             annotations.type_of(value.right.operand), annotations.symbol_of(value.right.operand).name)
+    if found != ('float', 'float', 'int', 'int', 'a'):
+        failures.append(f"anotaciones de b = a * 2.5 + -a: {found}")
+    
+    # Tras editar un literal, las sentencias que IncrementalParser reutiliza no se vuelven a inferir
+    lexer = Lexer(ANNOTATION_SOURCE * 20)
+    tokens = lexer.tokenize()
+    incremental = IncrementalParser("pratt")
+    annotations = TypeAnnotations()
+    with contextlib.redirect_stdout(io.StringIO()):
+        SemanticAnalyzer(Diagnostics(console=False), annotations=annotations).analyze(incremental.parse(tokens))
+        offset = lexer.source.rfind("z = 2") + 4
+        program = incremental.parse(lexer.relex(tokens, offset, 1, "3"))
+        expected = SemanticAnalyzer(Diagnostics(console=False))
+        expected.analyze(program)
+        semantic = SemanticAnalyzer(Diagnostics(console=False), annotations=annotations)
+        semantic.analyze(program)
+    if semantic.diagnostics.records != expected.diagnostics.records:
+        failures.append("tras la edición: diagnósticos distintos")
+    elif annotations.reused < 100:
+        failures.append(f"tras la edición: solo {annotations.reused} expresiones reutilizadas")
+    
+    # Tras una edición que corre las declaraciones, symbol_of da las declaraciones vigentes
+    lexer = Lexer("int x = 1;\nprint(x + 1);\n{ float y = 2.5; print(-y * x); }")
+    tokens = lexer.tokenize()
+    shifted = IncrementalParser("pratt")
+    moved = TypeAnnotations()
+    with contextlib.redirect_stdout(io.StringIO()):
+        SemanticAnalyzer(Diagnostics(console=False), annotations=moved).analyze(shifted.parse(tokens))
+        edited = shifted.parse(lexer.relex(tokens, 0, 0, "  "))
+        semantic = SemanticAnalyzer(Diagnostics(console=False), annotations=moved)
+        semantic.analyze(edited)
+        fresh = TypeAnnotations()
+        SemanticAnalyzer(Diagnostics(console=False), annotations=fresh).analyze(edited)
+    variables = [edited.statements[1].arguments[0].left, edited.statements[2].statements[1].arguments[0].left.operand,
+                 edited.statements[2].statements[1].arguments[0].right]
+    for variable in variables:
+        found, expected = moved.symbol_of(variable), fresh.symbol_of(variable)
+        if not moved.reused or found is None or expected is None or \
+                (found.name, found.line, found.column) != (expected.name, expected.line, expected.column):
+            failures.append(f"tras correr las declaraciones: symbol_of({variable.name}) = {found}, se esperaba {expected}")
+    
+    # prune: quedan solo las anotaciones de los nodos de expresión del árbol actual
+    annotations.prune(program)
+    expression_nodes = 0
+    pending = [program]
+    while pending:
+        node = pending.pop()
+        expression_nodes += isinstance(node, (BinaryOp, UnaryOp, Literal, Identifier))
+        for name in CHILD_FIELDS[type(node)]:
+            child = getattr(node, name)
+            pending.extend(child if isinstance(child, list) else [child] if child is not None else [])
+    if len(annotations) != expression_nodes:
+        failures.append(f"prune: {len(annotations)} anotaciones para {expression_nodes} nodos de expresión")
+    return failures
+
+def run_check(check_name, check):
+    """
+    Ejecuta una verificación diferencial entre implementaciones
+    Returns: True si no se encontraron diferencias
+    """
+    print(f"\n{'─'*80}")
+    print(f"🔍 Verificación: {check_name}")
+    print('─'*80)
+    
+    failures = check()
+    
+    if not failures:
+        print(f"{GREEN}✅ VERIFICACIÓN PASÓ{RESET}")
+        return True
+    
+    print(f"{RED}❌ VERIFICACIÓN FALLÓ ({len(failures)} diferencias){RESET}")
+    for failure in failures[:5]:
+        print(f"   {failure}")
+    return False
+
 def run_test(test_name, code, should_pass=True):
     """
     Ejecuta un caso de prueba
@@ -234,6 +1009,56 @@ int y = x @ 10;
         else:
             failed_tests += 1
     
+    # ========================================
+    # VERIFICACIONES DEL ANALIZADOR LÉXICO
+    # ========================================
+    print_header("🔤 ANALIZADOR LÉXICO (Deben producir los mismos tokens)")
+    
+    lexer_checks = [
+        ("AFD generado desde la especificación", check_dfa_generator),
+        ("Motor de expresión regular (engine=\"regex\")", check_regex_engine),
+        ("Lectura por bloques (iter_tokens)", check_streaming),
+        ("Tokenización en paralelo (tokenize_parallel)", check_parallel),
+        ("Archivo mapeado en memoria (use_mmap=True)", check_mmap),
+        ("Identificadores internados (NameTable)", check_name_interning),
+        ("Re-tokenización incremental (relex)", check_relex),
+    ]
+    
+    for name, check in lexer_checks:
+        total_tests += 1
+        if run_check(name, check):
+            passed_tests += 1
+        else:
+            failed_tests += 1
+    
+    # ========================================
+    # VERIFICACIONES DEL ANALIZADOR SINTÁCTICO
+    # ========================================
+    print_header("🌳 ANALIZADOR SINTÁCTICO (Deben producir el mismo AST)")
+    
+    parser_checks = [
+        ("Motores del parser (" + ", ".join(Parser.engines[1:]) + ")", check_parser_engines),
+        ("Anidamiento profundo (engine=\"stack\")", check_deep_nesting),
+        ("Sentencia a sentencia (iter_statements + analyze_stream)", check_pipeline),
+        ("UTF-8 inválido en la tubería (compile_stream)", check_stream_read_error),
+        ("Parseo incremental (IncrementalParser)", check_incremental_parse),
+        ("Caché de compilación (CompileCache)", check_compile_cache),
+        ("Diagnósticos (Diagnostics)", check_diagnostics),
+        ("Expresiones compartidas (share_exprs)", check_shared_exprs),
+        ("Tabla de símbolos (pilas por nombre)", check_symbol_table),
+        ("Tablas del sistema de tipos", check_type_tables),
+        ("Despacho de Visitor por clase de nodo", check_visitor_dispatch),
+        ("Análisis semántico sin recursión", check_iterative_analysis),
+        ("Anotaciones de tipos (TypeAnnotations)", check_type_annotations),
+    ]
+    
+    for name, check in parser_checks:
+        total_tests += 1
+        if run_check(name, check):
+            passed_tests += 1
+        else:
+            failed_tests += 1
+    
     # ========================================
     # RESUMEN FINAL
     # ========================================
@@ -1,7 +1,14 @@
 
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Tuple
+from bisect import bisect_right
+from dataclasses import dataclass, field
+import os
+import re
+from mmap import mmap
+from typing import List, Optional, Dict, Tuple, Iterator, TextIO, Union
+from dfa_generator import load_or_generate
 
 class TokenType(Enum):
     # Palabras reservadas
@@ -52,215 +59,463 @@ class TokenType(Enum):
     EOF = "$"
     ERROR = "ERROR"
 
+# Tipos de token como enteros compactos: índice en TOKEN_TYPES
+TOKEN_TYPES: Tuple[TokenType, ...] = tuple(TokenType)
+KIND: Dict[TokenType, int] = {token_type: i for i, token_type in enumerate(TOKEN_TYPES)}
+
+_KIND_ID = KIND[TokenType.ID]
+_KIND_EOF = KIND[TokenType.EOF]
+_KIND_ERROR = KIND[TokenType.ERROR]
+
+class LineIndex:
+    """
+    Índice de inicios de línea de un código fuente.
+    
+    Los tokens y nodos solo guardan su offset; la línea y la columna se
+    resuelven bajo demanda (al emitir un diagnóstico) con búsqueda binaria.
+    El índice se construye en una sola pasada la primera vez que se usa.
+    """
+    
+    def __init__(self, source: 'Source', base: int = 0, first_line: int = 1,
+                 line_start: Optional[int] = None):
+        # base: offset absoluto de source[0] (distinto de 0 al leer por bloques)
+        # line_start: offset absoluto donde empieza la línea first_line
+        self.source = source
+        self.base = base
+        self.first_line = first_line
+        self.line_start = base if line_start is None else line_start
+        self._starts: Optional[List[int]] = None
+    
+    @property
+    def starts(self) -> List[int]:
+        """Offsets absolutos donde empieza cada línea"""
+        if self._starts is None:
+            starts = [self.line_start]
+            base = self.base + 1
+            newline = '\n' if isinstance(self.source, str) else b'\n'
+            find = self.source.find
+            pos = find(newline)
+            while pos >= 0:
+                starts.append(base + pos)
+                pos = find(newline, pos + 1)
+            self._starts = starts
+        return self._starts
+    
+    def apply_edit(self, source: 'Source', offset: int, removed_len: int, inserted_len: int):
+        """
+        Actualiza el índice tras reemplazar removed_len caracteres en offset
+        (absoluto) por inserted_len caracteres; source es el texto ya editado.
+        Solo se recalculan las líneas del tramo editado; las siguientes se desplazan.
+        """
+        self.source = source
+        if self._starts is None:
+            return
+        
+        starts = self._starts
+        delta = inserted_len - removed_len
+        # Se conservan las líneas que empiezan hasta offset y se desplazan
+        # las que empiezan después del tramo eliminado
+        keep = bisect_right(starts, offset)
+        shift = bisect_right(starts, offset + removed_len)
+        
+        inserted = []
+        newline = '\n' if isinstance(source, str) else b'\n'
+        begin = offset - self.base
+        pos = source.find(newline, begin, begin + inserted_len)
+        while pos >= 0:
+            inserted.append(self.base + pos + 1)
+            pos = source.find(newline, pos + 1, begin + inserted_len)
+        
+        self._starts = starts[:keep] + inserted + [start + delta for start in starts[shift:]]
+    
+    def position(self, offset: int) -> Tuple[int, int]:
+        """Retorna (línea, columna) del offset, ambas desde 1"""
+        starts = self.starts
+        i = bisect_right(starts, offset) - 1
+        return self.first_line + i, offset - starts[i] + 1
+
+class NameTable:
+    """
+    Tabla de nombres de una compilación.
+    
+    Cada identificador distinto se guarda una sola vez y recibe un id entero
+    denso (0, 1, 2...); los tokens ID, los nodos del AST y la tabla de
+    símbolos usan ese id en lugar de volver a hashear el texto.
+    """
+    
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[Union[str, bytes], int] = {}
+    
+    def intern(self, text: Union[str, bytes]) -> int:
+        """Retorna el id del nombre, registrándolo si es nuevo"""
+        name_id = self.ids.get(text)
+        if name_id is None:
+            # Los lexemas de fuentes en bytes se registran decodificados
+            name = text if isinstance(text, str) else text.decode('ascii')
+            name_id = self.ids.get(name)
+            if name_id is None:
+                name_id = len(self.names)
+                self.names.append(name)
+                self.ids[name] = name_id
+            self.ids[text] = name_id
+        return name_id
+    
+    def name(self, name_id: int) -> str:
+        """Texto del nombre con ese id"""
+        return self.names[name_id]
+    
+    def __len__(self) -> int:
+        return len(self.names)
+
 @dataclass
 class Token:
     type: TokenType
     value: str
-    line: int
-    column: int
+    offset: int = 0
+    lines: Optional[LineIndex] = field(default=None, repr=False, compare=False)
+    name_id: int = field(default=-1, repr=False, compare=False)  # id en la NameTable (solo ID)
+    
+    @property
+    def line(self) -> int:
+        return self.lines.position(self.offset)[0] if self.lines else 1
+    
+    @property
+    def column(self) -> int:
+        return self.lines.position(self.offset)[1] if self.lines else self.offset + 1
     
     def __repr__(self):
         return f"Token({self.type.name}, '{self.value}', {self.line}:{self.column})"
 
+class TokenBuffer:
+    """
+    Secuencia de tokens en columnas compactas (struct-of-arrays).
+    
+    Guarda por token solo su tipo (entero de 1 byte), su offset y su
+    longitud sobre el código fuente original, más el id de nombre de los
+    identificadores (-1 en el resto). Los objetos Token se materializan
+    únicamente cuando se indexa el buffer.
+    """
+    
+    def __init__(self, source: 'Source', lines: Optional[LineIndex] = None,
+                 names: Optional[NameTable] = None):
+        self.source = source
+        self.lines = lines if lines is not None else LineIndex(source)
+        self.names = names if names is not None else NameTable()
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.lengths = array('I')
+        self.name_ids = array('i')
+    
+    def append(self, kind: int, start: int, length: int, name_id: int = -1):
+        """Agrega un token"""
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.name_ids.append(name_id)
+    
+    def __len__(self) -> int:
+        return len(self.kinds)
+    
+    def __getitem__(self, i: int) -> Token:
+        """Materializa el token i como objeto Token"""
+        name_id = self.name_ids[i]
+        if name_id >= 0:
+            return Token(TokenType.ID, self.names.names[name_id], self.starts[i],
+                         self.lines, name_id)
+        return Token(TOKEN_TYPES[self.kinds[i]], self.text(i), self.starts[i], self.lines)
+    
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self[i]
+    
+    def type(self, i: int) -> TokenType:
+        """Tipo del token i"""
+        return TOKEN_TYPES[self.kinds[i]]
+    
+    def text(self, i: int) -> str:
+        """Lexema del token i"""
+        name_id = self.name_ids[i]
+        if name_id >= 0:
+            return self.names.names[name_id]
+        start = self.starts[i]
+        return _lexeme(self.source, self.kinds[i], start, start + self.lengths[i])
+    
+    def offset(self, i: int) -> int:
+        """Offset del token i en el código fuente"""
+        return self.starts[i]
+
+class CompiledDFA:
+    """
+    AFD compilado a tablas enteras.
+    
+    Los estados se numeran con enteros (0 = estado muerto) y los caracteres
+    se agrupan en clases con columnas de transición idénticas. La tabla de
+    transiciones es un arreglo plano donde cada estado se representa por el
+    desplazamiento de su fila (id * num_clases), de modo que el paso del
+    autómata es un único acceso: trans[estado + clase].
+    
+    Compilarlo una vez por proceso abarata construir un Lexer; la velocidad
+    de tokenize no depende de esta tabla sino del bucle que la recorre
+    (lexemas por rebanada y saltos en bloque de espacios y comentarios).
+    """
+    
+    def __init__(self, transitions: Dict[Tuple[str, str], str],
+                 final_states: Dict[str, TokenType], start: str = "q0"):
+        # Numerar estados: 0 = muerto, 1 = inicial
+        names = [start]
+        for (src, _), dst in transitions.items():
+            for name in (src, dst):
+                if name not in names:
+                    names.append(name)
+        state_id = {name: i + 1 for i, name in enumerate(names)}
+        num_states = len(names) + 1
+        
+        # Agrupar caracteres con la misma columna de transiciones
+        alphabet = sorted({c for (_, c) in transitions})
+        columns: Dict[Tuple, int] = {}
+        char_class: Dict[str, int] = {}
+        for c in alphabet:
+            column = tuple(transitions.get((name, c)) for name in names)
+            if column not in columns:
+                columns[column] = len(columns) + 1  # 0 = clase "otro"
+            char_class[c] = columns[column]
+        num_classes = len(columns) + 1
+        
+        # Tabla plana de transiciones (destinos ya multiplicados por num_classes)
+        table = array('H', bytes(2 * num_states * num_classes))
+        for (src, c), dst in transitions.items():
+            table[state_id[src] * num_classes + char_class[c]] = state_id[dst] * num_classes
+        
+        # Tipo de token (entero) aceptado por fila (-1 si el estado no es final)
+        accept: List[int] = [-1] * (num_states * num_classes)
+        for name, token_type in final_states.items():
+            if name in state_id:
+                accept[state_id[name] * num_classes] = KIND[token_type]
+        
+        self.num_states = num_states
+        self.num_classes = num_classes
+        self.start = num_classes  # fila del estado 1
+        self.table = table
+        self.accept = accept
+        self.char_class = _CharClassMap(char_class)
+
+
+class _CharClassMap(dict):
+    """Mapa caracter -> clase; los caracteres fuera del alfabeto van a la clase 0"""
+    
+    def __missing__(self, key):
+        return 0
+
+
+# Racha de espacios en blanco (mismo criterio que str.isspace)
+_WHITESPACE = re.compile(r'\s+')
+_WHITESPACE_BYTES = re.compile(rb'[\t\n\x0b\x0c\r\x1c-\x1f ]+')
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+# Comentarios tal como los reconoce el lexer (para el pre-escaneo de fronteras)
+_COMMENT = re.compile(r'//[^\n]*|/\*.*?(?:\*/|\Z)', re.S)
+_COMMENT_BYTES = re.compile(rb'//[^\n]*|/\*.*?(?:\*/|\Z)', re.S)
+
+# Código fuente aceptado por el lexer: texto o bytes ASCII (bytes, mmap)
+Source = Union[str, bytes, bytearray, mmap]
+
+def decode_source(source_code: Source) -> Source:
+    """
+    El fuente tal como lo recorre el lexer: el alfabeto del lenguaje es
+    ASCII, así que bytes con otros caracteres se decodifican completos
+    (UTF-8; UnicodeDecodeError si no son válidos)
+    """
+    if not isinstance(source_code, str) and _NON_ASCII.search(source_code):
+        return str(source_code, 'utf-8')
+    return source_code
+
+
+class _SkipStartMap(dict):
+    """Mapa caracter -> ¿puede iniciar espacio o comentario? (memorizado)"""
+    
+    def __missing__(self, key):
+        value = self[key] = key.isspace() or key == '/'
+        return value
+
+
+class SourceAlphabet:
+    """
+    Constantes del alfabeto según el tipo de código fuente.
+    
+    El mismo núcleo del lexer recorre texto (los elementos son caracteres)
+    o bytes ASCII sin decodificar, por ejemplo un mmap (los elementos son
+    enteros); solo cambian estas tablas.
+    """
+    
+    def __init__(self, char_class, skip_start, whitespace, newline, slash, star, block_end):
+        self.char_class = char_class
+        self.skip_start = skip_start
+        self.whitespace = whitespace
+        self.newline = newline
+        self.slash = slash
+        self.star = star
+        self.block_end = block_end
+    
+    @classmethod
+    def for_text(cls, char_class: '_CharClassMap') -> 'SourceAlphabet':
+        return cls(char_class, _SkipStartMap(), _WHITESPACE, '\n', '/', '*', '*/')
+    
+    @classmethod
+    def for_bytes(cls, char_class: '_CharClassMap') -> 'SourceAlphabet':
+        byte_class = [char_class[chr(b)] if b < 128 else 0 for b in range(256)]
+        skip_start = [b < 128 and (chr(b).isspace() or b == ord('/')) for b in range(256)]
+        return cls(byte_class, skip_start, _WHITESPACE_BYTES, b'\n', ord('/'), ord('*'), b'*/')
+
+
+# Lexema fijo por tipo de token (None si depende del código fuente)
+_FIXED_TEXT: List[Optional[str]] = [
+    None if token_type in (TokenType.ID, TokenType.NUM, TokenType.ERROR) else token_type.value
+    for token_type in TOKEN_TYPES
+]
+
+def _lexeme(source: Source, kind: int, start: int, end: int) -> str:
+    """Lexema de un token; solo ID, NUM y ERROR se copian (y decodifican) del fuente"""
+    text = _FIXED_TEXT[kind]
+    if text is None:
+        text = source[start:end]
+        if not isinstance(text, str):
+            text = text.decode('ascii')
+    return text
+
+
+class MasterPattern:
+    """
+    Motor alternativo basado en expresiones regulares.
+    
+    Compila una sola alternancia con un grupo con nombre por tipo de token
+    (los operadores más largos primero), precedida por los espacios y
+    comentarios a saltar. Cada coincidencia es exactamente un token, así que
+    la tokenización corre en el motor de re (C); un '.' final produce los
+    mismos tokens ERROR que el AFD.
+    """
+    
+    def __init__(self, keyword_types, text: bool = True):
+        fixed = [t for t in TokenType
+                 if t not in keyword_types
+                 and t not in (TokenType.ID, TokenType.NUM, TokenType.EOF, TokenType.ERROR)]
+        operators = sorted(fixed, key=lambda t: len(t.value), reverse=True)
+        
+        whitespace = r'\s' if text else r'[\t\n\x0b\x0c\r\x1c-\x1f ]'
+        skip = r'(?:' + whitespace + r'+|//[^\n]*\n?|/\*.*?(?:\*/|\Z))*'
+        groups = [r'(?P<ID>[A-Za-z_][A-Za-z0-9_]*)', r'(?P<NUM>[0-9]+(?:\.[0-9]+)?)']
+        groups += [f'(?P<{t.name}>{re.escape(t.value)})' for t in operators]
+        groups += [r'(?P<EOF>\Z)', r'(?P<ERROR>.)']
+        pattern = skip + '(?:' + '|'.join(groups) + ')'
+        
+        self.regex = re.compile(pattern if text else pattern.encode('ascii'), re.S)
+        
+        # Tipo de token (entero) por número de grupo
+        self.group_kinds: List[int] = [-1] * (self.regex.groups + 1)
+        for name, index in self.regex.groupindex.items():
+            self.group_kinds[index] = KIND[TokenType[name]]
+
+
 class Lexer:
-    def __init__(self, source_code: str):
+    # Especificación declarativa de los tokens: de ella se genera el AFD mínimo.
+    # Las palabras reservadas se reconocen como ID y luego se resuelven con
+    # la tabla de palabras reservadas (ejemplo: "integer" y "edad" son ID,
+    # "int" es INT)
+    token_spec = [
+        # Operadores
+        (TokenType.OR, r'\|\|'),
+        (TokenType.AND, r'&&'),
+        (TokenType.NOT, r'!'),
+        (TokenType.EQ, r'=='),
+        (TokenType.NEQ, r'!='),
+        (TokenType.LT, r'<'),
+        (TokenType.LTE, r'<='),
+        (TokenType.GT, r'>'),
+        (TokenType.GTE, r'>='),
+        (TokenType.PLUS, r'\+'),
+        (TokenType.MINUS, r'-'),
+        (TokenType.MULT, r'\*'),
+        (TokenType.DIV, r'/'),
+        (TokenType.MOD, r'%'),
+        (TokenType.ASSIGN, r'='),
+        
+        # Delimitadores
+        (TokenType.LPAREN, r'\('),
+        (TokenType.RPAREN, r'\)'),
+        (TokenType.LBRACE, r'{'),
+        (TokenType.RBRACE, r'}'),
+        (TokenType.SEMICOLON, r';'),
+        (TokenType.COMMA, r','),
+        
+        # Números e identificadores
+        (TokenType.NUM, r'[0-9]+(\.[0-9]+)?'),
+        (TokenType.ID, r'[A-Za-z_][A-Za-z0-9_]*'),
+    ]
+    
+    # Palabras reservadas: se resuelven con una sola búsqueda al aceptar un ID
+    keywords = {
+        'int': TokenType.INT,
+        'float': TokenType.FLOAT,
+        'string': TokenType.STRING,
+        'if': TokenType.IF,
+        'else': TokenType.ELSE,
+        'while': TokenType.WHILE,
+        'print': TokenType.PRINT,
+    }
+    
+    _keyword_kinds = {word: KIND[token_type] for word, token_type in keywords.items()}
+    _keyword_kinds.update({word.encode('ascii'): kind for word, kind in _keyword_kinds.items()})
+    
+    # Tamaño a partir del cual tokenize_parallel reparte el trabajo
+    parallel_threshold = 8 * 1024 * 1024
+    
+    # AFD compilado, alfabetos y patrones maestros (str / bytes),
+    # compartidos por todas las instancias
+    _dfa: Optional[CompiledDFA] = None
+    _alphabets: Dict[bool, 'SourceAlphabet'] = {}
+    _masters: Dict[bool, MasterPattern] = {}
+    
+    engines = ("dfa", "regex")
+    
+    def __init__(self, source_code: Source, engine: str = "dfa",
+                 names: Optional[NameTable] = None):
+        source_code = decode_source(source_code)
         self.source = source_code
         self.pos = 0
-        self.line = 1
-        self.column = 1
+        self.lines = LineIndex(source_code)
         self.tokens: List[Token] = []
+        self.names = names if names is not None else NameTable()
+        self.dfa = self.compiled_dfa()
+        self.alphabet = self._alphabets[isinstance(source_code, str)]
         
-        # Construir tabla de transiciones
-        self.transitions = self._build_transitions()
-        
-        # Estados finales y sus tokens correspondientes
-        self.final_states = {
-            # Palabras reservadas
-            "q_int": TokenType.INT,
-            "q_if": TokenType.IF,
-            "q_float": TokenType.FLOAT,
-            "q_string": TokenType.STRING,
-            "q_else": TokenType.ELSE,
-            "q_while": TokenType.WHILE,
-            "q_print": TokenType.PRINT,
-            
-            # Operadores
-            "q_or": TokenType.OR,
-            "q_and": TokenType.AND,
-            "q_not": TokenType.NOT,
-            "q_eq": TokenType.EQ,
-            "q_neq": TokenType.NEQ,
-            "q_lt": TokenType.LT,
-            "q_lte": TokenType.LTE,
-            "q_gt": TokenType.GT,
-            "q_gte": TokenType.GTE,
-            "q_plus": TokenType.PLUS,
-            "q_minus": TokenType.MINUS,
-            "q_mult": TokenType.MULT,
-            "q_div": TokenType.DIV,
-            "q_mod": TokenType.MOD,
-            "q_assign": TokenType.ASSIGN,
-            
-            # Delimitadores
-            "q_lparen": TokenType.LPAREN,
-            "q_rparen": TokenType.RPAREN,
-            "q_lbrace": TokenType.LBRACE,
-            "q_rbrace": TokenType.RBRACE,
-            "q_semicolon": TokenType.SEMICOLON,
-            "q_comma": TokenType.COMMA,
-            
-            # Números e identificadores
-            "q_num": TokenType.NUM,
-            "q_num_decimal": TokenType.NUM,
-            "q_id": TokenType.ID,
-        }
-        
-        # Palabras reservadas
-        self.keywords = {
-            'int': TokenType.INT,
-            'float': TokenType.FLOAT,
-            'string': TokenType.STRING,
-            'if': TokenType.IF,
-            'else': TokenType.ELSE,
-            'while': TokenType.WHILE,
-            'print': TokenType.PRINT,
-        }
-    
-    def _build_transitions(self) -> Dict[Tuple[str, str], str]:
-        """Construye la tabla de transiciones del AFD"""
-        trans = {}
-        
-        # ========================================
-        # PALABRAS RESERVADAS
-        # ========================================
-        
-        # INT: i->n->t
-        trans[("q0", 'i')] = "q_i"
-        trans[("q_i", 'n')] = "q_in"
-        trans[("q_in", 't')] = "q_int"
-        
-        # IF: i->f
-        trans[("q_i", 'f')] = "q_if"
-        
-        # FLOAT: f->l->o->a->t
-        trans[("q0", 'f')] = "q_f"
-        trans[("q_f", 'l')] = "q_fl"
-        trans[("q_fl", 'o')] = "q_flo"
-        trans[("q_flo", 'a')] = "q_floa"
-        trans[("q_floa", 't')] = "q_float"
-        
-        # STRING: s->t->r->i->n->g
-        trans[("q0", 's')] = "q_s"
-        trans[("q_s", 't')] = "q_st"
-        trans[("q_st", 'r')] = "q_str"
-        trans[("q_str", 'i')] = "q_stri"
-        trans[("q_stri", 'n')] = "q_strin"
-        trans[("q_strin", 'g')] = "q_string"
-        
-        # ELSE: e->l->s->e
-        trans[("q0", 'e')] = "q_e"
-        trans[("q_e", 'l')] = "q_el"
-        trans[("q_el", 's')] = "q_els"
-        trans[("q_els", 'e')] = "q_else"
-        
-        # WHILE: w->h->i->l->e
-        trans[("q0", 'w')] = "q_w"
-        trans[("q_w", 'h')] = "q_wh"
-        trans[("q_wh", 'i')] = "q_whi"
-        trans[("q_whi", 'l')] = "q_whil"
-        trans[("q_whil", 'e')] = "q_while"
-        
-        # PRINT: p->r->i->n->t
-        trans[("q0", 'p')] = "q_p"
-        trans[("q_p", 'r')] = "q_pr"
-        trans[("q_pr", 'i')] = "q_pri"
-        trans[("q_pri", 'n')] = "q_prin"
-        trans[("q_prin", 't')] = "q_print"
-        
-        # ========================================
-        # OPERADORES DE DOS CARACTERES
-        # ========================================
-        
-        # || (OR)
-        trans[("q0", '|')] = "q_pipe"
-        trans[("q_pipe", '|')] = "q_or"
-        
-        # && (AND)
-        trans[("q0", '&')] = "q_amp"
-        trans[("q_amp", '&')] = "q_and"
-        
-        # == (EQ)
-        trans[("q0", '=')] = "q_assign"
-        trans[("q_assign", '=')] = "q_eq"
-        
-        # != (NEQ)
-        trans[("q0", '!')] = "q_not"
-        trans[("q_not", '=')] = "q_neq"
-        
-        # < y <= (LT, LTE)
-        trans[("q0", '<')] = "q_lt"
-        trans[("q_lt", '=')] = "q_lte"
-        
-        # > y >= (GT, GTE)
-        trans[("q0", '>')] = "q_gt"
-        trans[("q_gt", '=')] = "q_gte"
-        
-        # ========================================
-        # OPERADORES DE UN CARACTER
-        # ========================================
-        
-        trans[("q0", '+')] = "q_plus"
-        trans[("q0", '-')] = "q_minus"
-        trans[("q0", '*')] = "q_mult"
-        trans[("q0", '/')] = "q_div"
-        trans[("q0", '%')] = "q_mod"
-        
-        # ========================================
-        # DELIMITADORES
-        # ========================================
-        
-        trans[("q0", '(')] = "q_lparen"
-        trans[("q0", ')')] = "q_rparen"
-        trans[("q0", '{')] = "q_lbrace"
-        trans[("q0", '}')] = "q_rbrace"
-        trans[("q0", ';')] = "q_semicolon"
-        trans[("q0", ',')] = "q_comma"
-        
-        # ========================================
-        # NÚMEROS
-        # ========================================
-        
-        # Dígitos iniciales
-        for d in "0123456789":
-            trans[("q0", d)] = "q_num"
-            trans[("q_num", d)] = "q_num"
-        
-        # Punto decimal
-        trans[("q_num", '.')] = "q_num_dot"
-        for d in "0123456789":
-            trans[("q_num_dot", d)] = "q_num_decimal"
-            trans[("q_num_decimal", d)] = "q_num_decimal"
-        
-        # ========================================
-        # IDENTIFICADORES
-        # ========================================
-        
-        # Permitir que palabras reservadas continúen como IDs
-        # Ejemplo: "integer" debe ser ID, no INT
-        for state in ["q_int", "q_if", "q_float", "q_string", "q_else", "q_while", "q_print"]:
-            for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
-                trans[(state, c)] = "q_id"
-        
-        # ID desde q0 con cualquier letra o _
-        for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_":
-            if (("q0", c) not in trans):  # Si no es inicio de palabra reservada
-                trans[("q0", c)] = "q_id"
-        
-        # Continuación de ID
-        for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
-            trans[("q_id", c)] = "q_id"
-        
-        return trans
+        # Motor: "dfa" (tabla de transiciones) o "regex" (patrón maestro)
+        if engine not in self.engines:
+            raise ValueError(f"Motor léxico desconocido: '{engine}'")
+        self.engine = engine
+        if engine == "regex":
+            self.master = self.master_pattern(isinstance(source_code, str))
+            self._scan = self._scan_regex
+    
+    @classmethod
+    def master_pattern(cls, text: bool = True) -> MasterPattern:
+        """Compila el patrón maestro una sola vez por proceso"""
+        if text not in cls._masters:
+            cls._masters[text] = MasterPattern(set(cls.keywords.values()), text)
+        return cls._masters[text]
+    
+    @classmethod
+    def compiled_dfa(cls) -> CompiledDFA:
+        """Compila la tabla de transiciones una sola vez por proceso"""
+        if cls._dfa is None:
+            # AFD mínimo generado desde la especificación (en caché en disco)
+            generated = load_or_generate(cls.token_spec)
+            dfa = CompiledDFA(generated.transitions, generated.final_states, generated.start)
+            cls._alphabets = {
+                True: SourceAlphabet.for_text(dfa.char_class),
+                False: SourceAlphabet.for_bytes(dfa.char_class),
+            }
+            cls._dfa = dfa
+        return cls._dfa
     
     def current_char(self) -> Optional[str]:
         """Retorna el caracter actual"""
@@ -268,124 +523,473 @@ class Lexer:
             return None
         return self.source[self.pos]
     
+    @property
+    def line(self) -> int:
+        """Línea de la posición actual (resuelta bajo demanda)"""
+        return self.lines.position(self.pos)[0]
+    
+    @property
+    def column(self) -> int:
+        """Columna de la posición actual (resuelta bajo demanda)"""
+        return self.lines.position(self.pos)[1]
+    
     def advance(self):
         """Avanza una posición"""
         if self.pos < len(self.source):
-            if self.source[self.pos] == '\n':
-                self.line += 1
-                self.column = 1
-            else:
-                self.column += 1
             self.pos += 1
     
     def skip_whitespace(self):
         """Salta espacios en blanco"""
-        while self.current_char() and self.current_char().isspace():
-            self.advance()
+        self.pos = self._skip_whitespace(self.pos)
     
     def skip_comment(self) -> bool:
         """Salta comentarios // y /* */"""
-        if self.current_char() == '/' and self.pos + 1 < len(self.source):
-            next_char = self.source[self.pos + 1]
+        end = self._skip_comment(self.pos)
+        if end == self.pos:
+            return False
+        self.pos = end
+        return True
+    
+    def _skip_whitespace(self, pos: int) -> int:
+        """Retorna el fin de la racha de espacios que empieza en pos"""
+        match = self.alphabet.whitespace.match(self.source, pos)
+        return match.end() if match else pos
+    
+    def _skip_comment(self, pos: int) -> int:
+        """Retorna el fin del comentario que empieza en pos (o pos si no hay)"""
+        source = self.source
+        alphabet = self.alphabet
+        
+        if pos + 1 < len(source) and source[pos] == alphabet.slash:
+            following = source[pos + 1]
             
-            # Comentario de línea //
-            if next_char == '/':
-                while self.current_char() and self.current_char() != '\n':
-                    self.advance()
-                if self.current_char() == '\n':
-                    self.advance()
-                return True
+            # Comentario de línea //: hasta el salto de línea inclusive
+            if following == alphabet.slash:
+                end = source.find(alphabet.newline, pos + 2)
+                return len(source) if end < 0 else end + 1
             
-            # Comentario de bloque /* */
-            elif next_char == '*':
-                self.advance()  # /
-                self.advance()  # *
-                while self.current_char():
-                    if self.current_char() == '*' and self.pos + 1 < len(self.source) and self.source[self.pos + 1] == '/':
-                        self.advance()  # *
-                        self.advance()  # /
-                        return True
-                    self.advance()
-                return True
-        
-        return False
+            # Comentario de bloque /* */: hasta el cierre o el fin del archivo
+            if following == alphabet.star:
+                end = source.find(alphabet.block_end, pos + 2)
+                return len(source) if end < 0 else end + 2
+        
+        return pos
     
-    def get_next_token(self) -> Optional[Token]:
-        """Obtiene el siguiente token usando la tabla de transiciones"""
-        # Saltar whitespace y comentarios
-        while self.current_char() and (self.current_char().isspace() or self.skip_comment()):
-            if self.current_char() and self.current_char().isspace():
-                self.skip_whitespace()
-        
-        if not self.current_char():
-            return Token(TokenType.EOF, '$', self.line, self.column)
-        
-        # Guardar posición inicial
-        start_line = self.line
-        start_col = self.column
-        lexeme = ""
-        state = "q0"
-        last_final_state = None
-        last_final_pos = self.pos
-        last_final_lexeme = ""
-        
-        # Simular el AFD
-        while self.current_char():
-            c = self.current_char()
-            key = (state, c)
-            
-            if key in self.transitions:
-                state = self.transitions[key]
-                lexeme += c
-                self.advance()
-                
-                # Si es un estado final, guardarlo
-                if state in self.final_states:
-                    last_final_state = state
-                    last_final_pos = self.pos
-                    last_final_lexeme = lexeme
+    def _skip_ignored(self, pos: int) -> int:
+        """Salta en bloque espacios y comentarios a partir de pos"""
+        source = self.source
+        alphabet = self.alphabet
+        n = len(source)
+        while pos < n:
+            c = source[pos]
+            if c == alphabet.slash:
+                end = self._skip_comment(pos)
+                if end == pos:
+                    break
+                pos = end
+            elif alphabet.skip_start[c]:
+                pos = alphabet.whitespace.match(source, pos).end()
             else:
-                # No hay transición, intentar cerrar token
                 break
+        return pos
+    
+    def _scan(self) -> Tuple[int, int, int]:
+        """
+        Reconoce el siguiente token a partir de self.pos.
+        Retorna (tipo como entero, inicio, fin) y deja self.pos en el fin.
+        """
+        source = self.source
+        n = len(source)
+        alphabet = self.alphabet
+        
+        # Saltar whitespace y comentarios
+        start = self.pos
+        if start < n and alphabet.skip_start[source[start]]:
+            start = self._skip_ignored(start)
+        
+        if start >= n:
+            self.pos = n
+            return _KIND_EOF, n, n
+        
+        # Simular el AFD recordando solo la última posición de aceptación
+        dfa = self.dfa
+        table = dfa.table
+        accept = dfa.accept
+        char_class = alphabet.char_class
+        state = dfa.start
+        last_final_kind = -1
+        last_final_pos = start
+        pos = start
         
-        # Si encontramos un estado final, crear el token
-        if last_final_state:
-            # Retroceder a la última posición válida
-            while self.pos > last_final_pos:
-                self.pos -= 1
-                if self.pos < len(self.source) and self.source[self.pos] == '\n':
-                    self.line -= 1
-                self.column -= 1
+        while pos < n:
+            next_state = table[state + char_class[source[pos]]]
+            if not next_state:
+                # No hay transición, intentar cerrar token
+                break
+            state = next_state
+            pos += 1
             
-            token_type = self.final_states[last_final_state]
+            # Si es un estado final, guardarlo
+            if accept[state] >= 0:
+                last_final_kind = accept[state]
+                last_final_pos = pos
+        
+        # Si encontramos un estado final, volver a la última aceptación en O(1)
+        if last_final_kind >= 0:
+            kind = last_final_kind
+            end = last_final_pos
             
             # Verificar si es palabra reservada o identificador
-            if token_type == TokenType.ID and last_final_lexeme in self.keywords:
-                token_type = self.keywords[last_final_lexeme]
-            
-            return Token(token_type, last_final_lexeme, start_line, start_col)
+            if kind == _KIND_ID:
+                kind = self._keyword_kinds.get(source[start:end], _KIND_ID)
         
         # Si no se encontró transición válida, es un error
-        if lexeme:
-            return Token(TokenType.ERROR, lexeme, start_line, start_col)
+        elif pos > start:
+            kind = _KIND_ERROR
+            end = pos
         else:
             # Consumir el caracter inválido
-            error_char = self.current_char()
-            self.advance()
-            return Token(TokenType.ERROR, error_char, start_line, start_col)
+            kind = _KIND_ERROR
+            end = start + 1
+        
+        self.pos = end
+        return kind, start, end
+    
+    def _scan_regex(self) -> Tuple[int, int, int]:
+        """Igual que _scan, pero con el patrón maestro (motor "regex")"""
+        match = self.master.regex.match(self.source, self.pos)
+        index = match.lastindex
+        kind = self.master.group_kinds[index]
+        start, end = match.span(index)
+        
+        if kind == _KIND_ID:
+            kind = self._keyword_kinds.get(match.group(index), _KIND_ID)
+        
+        self.pos = end
+        return kind, start, end
+    
+    def _spans(self) -> Iterator[Tuple[int, int, int]]:
+        """Genera (tipo, inicio, fin) de cada token hasta el EOF inclusive"""
+        if self.engine == "regex":
+            # Cada coincidencia de finditer es un token, sin huecos entre ellas
+            group_kinds = self.master.group_kinds
+            keyword_kinds = self._keyword_kinds
+            for match in self.master.regex.finditer(self.source, self.pos):
+                index = match.lastindex
+                kind = group_kinds[index]
+                start, end = match.span(index)
+                if kind == _KIND_ID:
+                    kind = keyword_kinds.get(match.group(index), _KIND_ID)
+                self.pos = end
+                yield kind, start, end
+                if kind == _KIND_EOF:
+                    return
+        else:
+            scan = self._scan
+            while True:
+                kind, start, end = scan()
+                yield kind, start, end
+                if kind == _KIND_EOF:
+                    return
+    
+    def get_next_token(self) -> Optional[Token]:
+        """Obtiene el siguiente token usando la tabla de transiciones"""
+        kind, start, end = self._scan()
+        return self._token(kind, start, end)
+    
+    def _token(self, kind: int, start: int, end: int, base: int = 0) -> Token:
+        """Materializa un token del fuente actual; los ID se internan en la tabla de nombres"""
+        if kind == _KIND_ID:
+            name_id = self.names.intern(self.source[start:end])
+            return Token(TokenType.ID, self.names.names[name_id], base + start, self.lines, name_id)
+        return Token(TOKEN_TYPES[kind], _lexeme(self.source, kind, start, end),
+                     base + start, self.lines)
     
     def tokenize(self) -> List[Token]:
         """Tokeniza todo el código fuente"""
-        self.tokens = []
+        source = self.source
+        lines = self.lines
+        intern = self.names.intern
+        names = self.names.names
+        tokens = []
+        append = tokens.append
+        
+        for kind, start, end in self._spans():
+            if kind == _KIND_ID:
+                name_id = intern(source[start:end])
+                append(Token(TokenType.ID, names[name_id], start, lines, name_id))
+            else:
+                append(Token(TOKEN_TYPES[kind], _lexeme(source, kind, start, end), start, lines))
+        
+        self.tokens = tokens
+        return tokens
+    
+    def tokenize_buffer(self) -> TokenBuffer:
+        """Tokeniza todo el código fuente en un TokenBuffer compacto"""
+        source = self.source
+        buffer = TokenBuffer(source, self.lines, self.names)
+        add_kind = buffer.kinds.append
+        add_start = buffer.starts.append
+        add_length = buffer.lengths.append
+        add_name = buffer.name_ids.append
+        intern = self.names.intern
+        
+        for kind, start, end in self._spans():
+            add_kind(kind)
+            add_start(start)
+            add_length(end - start)
+            add_name(intern(source[start:end]) if kind == _KIND_ID else -1)
+        
+        return buffer
+    
+    def tokenize_parallel(self, max_workers: Optional[int] = None,
+                          shard_size: Optional[int] = None) -> TokenBuffer:
+        """
+        Tokeniza un código fuente grande en paralelo (un proceso por fragmento).
+        
+        El fuente se corta en saltos de línea que no están dentro de un
+        comentario /* */; como ningún token contiene saltos de línea, cada
+        fragmento se tokeniza de forma independiente y el resultado es
+        idéntico al de tokenize_buffer(). Por debajo de parallel_threshold
+        (o con un solo proceso) se tokeniza en serie.
+        """
+        n = len(self.source)
+        max_workers = max_workers or os.cpu_count() or 1
+        if shard_size is None and (n < self.parallel_threshold or max_workers == 1):
+            return self.tokenize_buffer()
+        
+        if shard_size is None:
+            shard_size = max(n // (max_workers * 4), self.parallel_threshold // 4)
+        
+        bounds = self._shard_bounds(shard_size)
+        if len(bounds) <= 2:
+            return self.tokenize_buffer()
+        
+        shards = [(self.source[start:end], start, self.engine)
+                  for start, end in zip(bounds, bounds[1:])]
+        buffer = TokenBuffer(self.source, self.lines, self.names)
+        intern = self.names.intern
+        with ProcessPoolExecutor(max_workers) as pool:
+            for kinds, starts, lengths, name_ids, names in pool.map(_tokenize_shard, shards):
+                buffer.kinds.extend(kinds)
+                buffer.starts.extend(starts)
+                buffer.lengths.extend(lengths)
+                # Traducir los ids locales del fragmento a la tabla de nombres común
+                remap = [intern(name) for name in names]
+                buffer.name_ids.extend(array('i', [remap[i] if i >= 0 else -1 for i in name_ids]))
+        
+        buffer.append(_KIND_EOF, n, 0)
+        self.pos = n
+        return buffer
+    
+    def _shard_bounds(self, shard_size: int) -> List[int]:
+        """
+        Pre-escaneo: offsets de corte cada ~shard_size caracteres, justo
+        después de un salto de línea que no esté dentro de un comentario.
+        """
+        source = self.source
+        n = len(source)
+        newline = self.alphabet.newline
+        comment = _COMMENT if isinstance(source, str) else _COMMENT_BYTES
+        bounds = [0]
+        scan = 0      # posición fuera de comentarios hasta donde se revisó
+        match = None  # próximo comentario a partir de scan
+        
+        while bounds[-1] + shard_size < n:
+            cut = source.find(newline, bounds[-1] + shard_size)
+            while cut >= 0:
+                if match is None or match.end() <= scan:
+                    match = comment.search(source, scan)
+                if match is None or match.start() > cut:
+                    break
+                if match.end() <= cut:
+                    # El comentario termina antes del corte: seguir buscando
+                    scan = match.end()
+                    continue
+                # El corte cae dentro de un comentario de bloque: moverlo después
+                scan = match.end()
+                cut = source.find(newline, scan)
+            if cut < 0:
+                break
+            bounds.append(cut + 1)
+        
+        bounds.append(n)
+        return bounds
+    
+    def relex(self, old_tokens: List[Token], edit_offset: int, removed_len: int,
+              inserted_text: str) -> List[Token]:
+        """
+        Re-tokeniza incrementalmente tras una edición del código fuente.
+        
+        old_tokens es la tokenización de self.source; la edición reemplaza
+        removed_len caracteres en edit_offset por inserted_text. Se vuelve a
+        escanear desde el último token que la edición no puede afectar (el
+        AFD mira hasta 2 caracteres más allá del fin de un token) hasta que
+        un token nuevo empieza, después de la edición, en la misma posición
+        desplazada que un token viejo. Ahí los dos flujos coinciden: un token
+        nunca empieza dentro de un comentario, y desde un inicio de token el
+        resto depende solo del texto siguiente, que no cambió. Los tokens
+        restantes se reutilizan desplazando su offset.
+        
+        old_tokens se actualiza en el lugar y se retorna; el LineIndex
+        compartido por los tokens pasa a describir el fuente editado.
+        """
+        source = self.source
+        n = len(source)
+        if not 0 <= edit_offset <= edit_offset + removed_len <= n:
+            raise ValueError(f"Edición fuera del código fuente: offset {edit_offset}, "
+                             f"longitud {removed_len} (tamaño {n})")
+        
+        # El fuente editado es texto; los bytes ASCII conservan sus offsets
+        if not isinstance(source, str):
+            source = str(source, 'ascii')
+            self.alphabet = self._alphabets[True]
+            if self.engine == "regex":
+                self.master = self.master_pattern(True)
+        self.source = source[:edit_offset] + inserted_text + source[edit_offset + removed_len:]
+        delta = len(inserted_text) - removed_len
+        edit_end = edit_offset + len(inserted_text)
+        self.lines.apply_edit(self.source, edit_offset, removed_len, len(inserted_text))
+        
+        # Búsqueda binaria del primer token que termina a menos de 2
+        # caracteres de la edición (o después); el EOF siempre lo cumple
+        low, high = 0, len(old_tokens) - 1
+        while low < high:
+            middle = (low + high) // 2
+            token = old_tokens[middle]
+            if token.offset + len(token.value) + 2 <= edit_offset:
+                low = middle + 1
+            else:
+                high = middle
+        first = low
+        pos = old_tokens[first - 1].offset + len(old_tokens[first - 1].value) if first else 0
+        
+        # Escanear hasta alinear con un inicio de token viejo
+        self.pos = pos
+        new_tokens = []
+        old = first
+        while True:
+            kind, start, end = self._scan()
+            if start >= edit_end:
+                while old < len(old_tokens) and old_tokens[old].offset < start - delta:
+                    old += 1
+                if old < len(old_tokens) and old_tokens[old].offset == start - delta:
+                    break
+            new_tokens.append(self._token(kind, start, end))
+        
+        # Reutilizar la cola desplazada
+        if delta:
+            for i in range(old, len(old_tokens)):
+                old_tokens[i].offset += delta
+        old_tokens[first:old] = new_tokens
+        self.pos = len(self.source)
+        self.tokens = old_tokens
+        return old_tokens
+    
+    @classmethod
+    def iter_tokens(cls, fileobj: TextIO, chunk_size: int = 1 << 16,
+                    engine: str = "dfa") -> Iterator[Token]:
+        """
+        Tokeniza un archivo leyendo bloques de tamaño fijo.
+        
+        Genera los mismos tokens que tokenize() (con offsets absolutos) sin
+        cargar el archivo completo: solo se conserva el bloque actual más el
+        lexema incompleto del final. Un comentario /* */ sin cerrar al final
+        del bloque se descarta y se sigue buscando su cierre en el siguiente,
+        por lo que la memoria no depende del tamaño de la entrada.
+        """
+        lexer = cls("", engine)
+        window = ""
+        base = 0            # offset absoluto de window[0]
+        line = 1            # línea de window[0]
+        line_start = 0      # offset absoluto donde empieza esa línea
+        open_comment = None  # '/*' o '//' si el bloque anterior terminó dentro de uno
         
         while True:
-            token = self.get_next_token()
-            self.tokens.append(token)
+            chunk = fileobj.read(chunk_size)
+            final = not chunk
+            window += chunk
+            
+            # Continuar un comentario abierto en el bloque anterior
+            drop = 0
+            if open_comment == '/*':
+                end = window.find('*/')
+                if end >= 0:
+                    drop, open_comment = end + 2, None
+                elif not final:
+                    # Conservar el último caracter: puede ser el '*' del cierre
+                    drop = max(len(window) - 1, 0)
+                else:
+                    drop = len(window)
+            elif open_comment == '//':
+                end = window.find('\n')
+                if end >= 0:
+                    drop, open_comment = end + 1, None
+                else:
+                    drop = len(window)
+            
+            lexer.source = window
+            lexer.pos = drop
+            lexer.lines = LineIndex(window, base, line, line_start)
+            n = len(window)
             
-            if token.type == TokenType.EOF:
+            if open_comment is None:
+                while True:
+                    resume = lexer.pos
+                    kind, start, end = lexer._scan()
+                    
+                    if kind == _KIND_EOF:
+                        if final:
+                            yield Token(TokenType.EOF, '$', base + n, lexer.lines)
+                            return
+                        # Solo quedan espacios/comentarios: ver si alguno quedó abierto
+                        drop, open_comment = cls._trailing_ignored(window, resume)
+                        break
+                    
+                    # El AFD puede mirar hasta 2 caracteres más allá del token
+                    # ("1." seguido de dígito): esperar al siguiente bloque
+                    if not final and end + 2 > n:
+                        drop = start
+                        break
+                    
+                    yield lexer._token(kind, start, end, base)
+            elif final:
+                yield Token(TokenType.EOF, '$', base + n, lexer.lines)
+                return
+            
+            # Descartar lo ya procesado actualizando la línea de window[0]
+            newlines = window.count('\n', 0, drop)
+            if newlines:
+                line += newlines
+                line_start = base + window.rfind('\n', 0, drop) + 1
+            base += drop
+            window = window[drop:]
+    
+    @staticmethod
+    def _trailing_ignored(window: str, pos: int) -> Tuple[int, Optional[str]]:
+        """
+        Recorre espacios y comentarios desde pos hasta el final del bloque.
+        Retorna (cuánto se puede descartar, comentario que quedó abierto).
+        """
+        n = len(window)
+        while pos < n:
+            if window[pos].isspace():
+                pos = _WHITESPACE.match(window, pos).end()
+            elif window.startswith('//', pos):
+                end = window.find('\n', pos + 2)
+                if end < 0:
+                    return n, '//'
+                pos = end + 1
+            elif window.startswith('/*', pos):
+                end = window.find('*/', pos + 2)
+                if end < 0:
+                    # El '*' de la apertura no puede cerrar el comentario
+                    return max(n - 1, pos + 2), '/*'
+                pos = end + 2
+            else:
+                # Un '/' final puede iniciar un comentario en el siguiente bloque
                 break
-        
-        return self.tokens
+        return pos, None
     
     def print_tokens(self):
         """Imprime los tokens de forma legible"""
@@ -410,6 +1014,18 @@ class Lexer:
         for token in self.tokens:
             print(f"{token.value:10} {token.type.name:15} [{token.line}:{token.column}]")
 
+def _tokenize_shard(shard: Tuple[Source, int, str]) -> Tuple[array, array, array, array, List[str]]:
+    """
+    Tokeniza un fragmento en un proceso de trabajo (sin el EOF final).
+    Los ids de nombre son locales al fragmento: se retorna también su tabla.
+    """
+    source, base, engine = shard
+    buffer = Lexer(source, engine).tokenize_buffer()
+    del buffer.kinds[-1], buffer.starts[-1], buffer.lengths[-1], buffer.name_ids[-1]
+    if base:
+        buffer.starts = array('I', [start + base for start in buffer.starts])
+    return buffer.kinds, buffer.starts, buffer.lengths, buffer.name_ids, buffer.names.names
+
 # ============================================
 # EJEMPLO DE USO
 # ============================================
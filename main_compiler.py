@@ -8,12 +8,22 @@ Para ejecutar:
 """
 
 import sys
-from lexer_simple import Lexer, TokenType
+import mmap
+from typing import Optional
+from lexer_simple import Lexer, TokenType, KIND, Source, decode_source
 from parser_rd import Parser
-from semantic_analyzer import SemanticAnalyzer
+from semantic_analyzer import SemanticAnalyzer, SymbolTable
+from diagnostics import Diagnostics
+from compile_cache import CompileCache, CompileResult, capture_output
 
-def compile_file(filename: str):
+# Marca que reemplaza la línea "Fuente: <nombre>" en la salida guardada en caché
+CACHED_NAME = "\0Fuente\0"
+
+def compile_file(filename: str, use_mmap: bool = False, cache: Optional[CompileCache] = None):
     """Compila un archivo de código fuente"""
+    if use_mmap:
+        return compile_file_mmap(filename, cache)
+    
     try:
         with open(filename, 'r', encoding='utf-8') as f:
             source_code = f.read()
@@ -24,19 +34,153 @@ def compile_file(filename: str):
         print(f"❌ Error al leer el archivo: {str(e)}")
         return False
     
-    return compile_source(source_code, filename)
+    return compile_source(source_code, filename, cache)
 
-def compile_source(source_code: str, source_name: str = "<input>"):
-    """Compila código fuente desde un string"""
+def compile_file_mmap(filename: str, cache: Optional[CompileCache] = None):
+    """
+    Compila un archivo mapeándolo en memoria
+    El lexer recorre los bytes ASCII directamente, sin leer ni decodificar
+    el archivo completo; la caché de páginas del sistema hace la lectura.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            try:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # No se puede mapear un archivo vacío
+                return compile_source("", filename, cache)
+            
+            with source:
+                # Un archivo no ASCII se decodifica aquí, antes de imprimir nada
+                try:
+                    source_code = decode_source(source)
+                except UnicodeDecodeError as e:
+                    print(f"❌ Error al leer el archivo: {str(e)}")
+                    return False
+                return compile_source(source_code, filename, cache)
+    except FileNotFoundError:
+        print(f"❌ Error: No se encontró el archivo '{filename}'")
+        return False
+    except OSError as e:
+        print(f"❌ Error al leer el archivo: {str(e)}")
+        return False
+
+def compile_stream(filename: str, chunk_size: int = 1 << 16):
+    """
+    Compila un archivo como una tubería léxico → sintáctico → semántico
+    El archivo se lee por bloques y cada sentencia del nivel superior se
+    analiza (y se libera) en cuanto el parser la completa: la memoria no
+    depende del tamaño del archivo y los diagnósticos aparecen mientras
+    se lee.
+    """
+    try:
+        source_file = open(filename, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        print(f"❌ Error: No se encontró el archivo '{filename}'")
+        return False
+    except OSError as e:
+        print(f"❌ Error al leer el archivo: {str(e)}")
+        return False
+    
+    print("=" * 80)
+    print(f"COMPILADOR (EN FLUJO) - {filename}")
+    print("=" * 80)
+    
+    counts = {"tokens": 0, "lexical": 0, "statements": 0}
+    
+    def tokens_with_report(tokens):
+        """Cuenta los tokens y reporta los errores léxicos al pasar"""
+        for token in tokens:
+            counts["tokens"] += 1
+            if token.type == TokenType.ERROR:
+                counts["lexical"] += 1
+                print(f"❌ Error léxico en línea {token.line}, columna {token.column}: "
+                      f"Caracter no reconocido '{token.value}'")
+            yield token
+    
+    def statements_to_analyze(statements):
+        """Cuenta las sentencias; tras un error léxico o sintáctico deja de analizarlas"""
+        for stmt in statements:
+            counts["statements"] += 1
+            if not parser.errors and not counts["lexical"]:
+                yield stmt
+    
+    with source_file:
+        # El archivo se decodifica a medida que se lee: un UTF-8 inválido
+        # aparece a mitad de la tubería y detiene la compilación
+        try:
+            tokens = tokens_with_report(Lexer.iter_tokens(source_file, chunk_size, engine="regex"))
+            diagnostics = Diagnostics()
+            parser = Parser(tokens, engine="stack", diagnostics=diagnostics)
+            semantic = SemanticAnalyzer(diagnostics)
+            # Los ámbitos cerrados no se guardan: la memoria no crece con los bloques del archivo
+            semantic.symbol_table = SymbolTable(keep_exited=False)
+            semantic_ok = semantic.analyze_stream(statements_to_analyze(parser.iter_statements()))
+            # El parser se detiene en el primer error irrecuperable: el resto del
+            # archivo se sigue leyendo para reportar sus errores léxicos
+            for _ in tokens:
+                pass
+        except UnicodeDecodeError as e:
+            print(f"❌ Error al leer el archivo: {str(e)}")
+            return False
+    
+    # ========================================
+    # RESUMEN FINAL
+    # ========================================
+    success = semantic_ok and not parser.errors and not counts["lexical"]
+    print("\n" + "=" * 80)
+    print("✅ COMPILACIÓN EXITOSA" if success else "❌ COMPILACIÓN FALLIDA")
+    print("=" * 80)
+    print(f"Fuente: {filename}")
+    print(f"Tokens: {counts['tokens'] - 1}")
+    print(f"Sentencias: {counts['statements']}")
+    print(f"Errores léxicos: {counts['lexical']}")
+    print(f"Errores sintácticos: {len(parser.errors)}")
+    print(f"Errores semánticos: {len(semantic.errors)}")
+    print(f"Advertencias: {len(semantic.warnings)}")
+    print("=" * 80)
+    
+    return success
+
+def compile_source(source_code: Source, source_name: str = "<input>",
+                   cache: Optional[CompileCache] = None):
+    """
+    Compila código fuente desde un string (o bytes ASCII, p. ej. un mmap)
+    Con cache, un fuente ya compilado no vuelve a pasar por ninguna fase:
+    se repite la salida y el resultado guardados
+    """
     
     print("=" * 80)
     print(f"COMPILADOR - {source_name}")
     print("=" * 80)
     print("\n📄 CÓDIGO FUENTE:")
     print("-" * 80)
-    print(source_code)
+    if isinstance(source_code, str):
+        print(source_code)
+    else:
+        print(f"({len(source_code)} bytes mapeados en memoria)")
     print("-" * 80)
     
+    if cache is None:
+        return run_phases(source_code, source_name).success
+    
+    key = cache.key(source_code)
+    result = cache.get(key)
+    if result is not None:
+        # El resumen nombra al fuente: la entrada sirve para cualquier nombre
+        sys.stdout.write(result.report.replace(CACHED_NAME, f"Fuente: {source_name}\n"))
+        return result.success
+    
+    with capture_output() as report:
+        result = run_phases(source_code, source_name)
+    result.report = report.getvalue().replace(f"Fuente: {source_name}\n", CACHED_NAME)
+    cache.put(key, result)
+    return result.success
+
+def run_phases(source_code: Source, source_name: str) -> CompileResult:
+    """Ejecuta las fases léxica, sintáctica y semántica, reportando cada una"""
+    result = CompileResult()
+    
     # ========================================
     # FASE 1: ANÁLISIS LÉXICO
     # ========================================
@@ -44,24 +188,29 @@ def compile_source(source_code: str, source_name: str = "<input>"):
     print("-- FASE 1: ANÁLISIS LÉXICO")
     print("=" * 80)
     
-    lexer = Lexer(source_code)
-    tokens = lexer.tokenize()
+    lexer = Lexer(source_code, engine="regex")
+    tokens = lexer.tokenize_parallel()
     
     # Verificar errores léxicos
-    lex_errors = [t for t in tokens if t.type == TokenType.ERROR]
+    error_kind = KIND[TokenType.ERROR]
+    lex_errors = [tokens[i] for i, kind in enumerate(tokens.kinds) if kind == error_kind]
+    result.tokens = tokens
+    result.lexical_errors = [f"Línea {error.line}, Columna {error.column}: Caracter no reconocido '{error.value}'"
+                             for error in lex_errors]
     
     if lex_errors:
         print(f"\n❌ Se encontraron {len(lex_errors)} errores léxicos:")
-        for error in lex_errors:
-            print(f"  Línea {error.line}, Columna {error.column}: Caracter no reconocido '{error.value}'")
-        return False
+        for error in result.lexical_errors:
+            print(f"  {error}")
+        return result
     
     print(f"✅ Análisis léxico exitoso: {len(tokens)-1} tokens generados")
     
     # Mostrar tokens si hay pocos
     if len(tokens) <= 50:
         print("\nTokens generados:")
-        for i, token in enumerate(tokens[:20]):  # Mostrar solo los primeros 20
+        for i in range(min(len(tokens), 20)):  # Mostrar solo los primeros 20
+            token = tokens[i]
             print(f"  {i+1:3}. {token.type.name:12} = '{token.value}'")
         if len(tokens) > 20:
             print(f"  ... y {len(tokens)-20} tokens más")
@@ -73,15 +222,19 @@ def compile_source(source_code: str, source_name: str = "<input>"):
     print("-- FASE 2: ANÁLISIS SINTÁCTICO")
     print("=" * 80)
     
-    parser = Parser(tokens)
+    # Un solo colector de diagnósticos para el parser y el analizador
+    diagnostics = Diagnostics()
+    parser = Parser(tokens, engine="pratt", diagnostics=diagnostics)
     ast = parser.parse()
+    result.ast = ast
+    result.syntax_errors = list(parser.errors)
     
     if not ast:
         print(f"\n❌ Análisis sintáctico falló con {len(parser.errors)} errores")
         print("\nErrores encontrados:")
         for error in parser.errors:
             print(f"  • {error}")
-        return False
+        return result
     
     print(f"✅ Análisis sintáctico exitoso")
     print(f"Número de sentencias: {len(ast.statements)}")
@@ -93,12 +246,17 @@ def compile_source(source_code: str, source_name: str = "<input>"):
     print("-- FASE 3: ANÁLISIS SEMÁNTICO")
     print("=" * 80)
     
-    semantic = SemanticAnalyzer()
+    semantic = SemanticAnalyzer(diagnostics)
     success = semantic.analyze(ast)
+    result.semantic_errors = list(semantic.errors)
+    result.warnings = list(semantic.warnings)
+    result.symbols = [(scope, symbol.name, symbol.type, symbol.line, symbol.column, symbol.initialized)
+                      for scope, symbols in enumerate(semantic.symbol_table.scopes)
+                      for symbol in symbols.values()]
     
     if not success:
         print(f"\n❌ Análisis semántico falló con {len(semantic.errors)} errores")
-        return False
+        return result
     
     # ========================================
     # RESUMEN FINAL
@@ -120,7 +278,8 @@ def compile_source(source_code: str, source_name: str = "<input>"):
     print("\n El programa es sintáctica y semánticamente correcto")
     print("=" * 80)
     
-    return True
+    result.success = True
+    return result
 
 def interactive_mode():
     """Modo interactivo: permite ingresar código línea por línea"""
@@ -267,12 +426,18 @@ Opciones:
   <archivo>       Compila el archivo especificado
   -i, --interactive    Modo interactivo
   -t, --test      Ejecuta casos de prueba
+  -m, --mmap <archivo>  Compila el archivo mapeándolo en memoria
+  -s, --stream <archivo>  Compila el archivo en flujo (memoria acotada)
+  -c, --cache <archivo>   Compila el archivo usando la caché de compilación
   -h, --help      Muestra esta ayuda
 
 Ejemplos:
   python main.py programa.txt
   python main.py -i
   python main.py --test
+  python main.py --mmap programa_grande.txt
+  python main.py --stream programa_grande.txt
+  python main.py --cache programa.txt
 
 Gramática soportada:
   - Tipos: int, float, string
@@ -308,6 +473,15 @@ def main():
     elif sys.argv[1] in ['-t', '--test']:
         run_tests()
     
+    elif sys.argv[1] in ['-m', '--mmap'] and len(sys.argv) > 2:
+        compile_file(sys.argv[2], use_mmap=True)
+    
+    elif sys.argv[1] in ['-s', '--stream'] and len(sys.argv) > 2:
+        compile_stream(sys.argv[2])
+    
+    elif sys.argv[1] in ['-c', '--cache'] and len(sys.argv) > 2:
+        compile_file(sys.argv[2], cache=CompileCache())
+    
     else:
         # Compilar archivo
         filename = sys.argv[1]
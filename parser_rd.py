@@ -3,70 +3,92 @@ Parser Recursivo Descendente LL(1)
 Implementa la gramática definida para el lenguaje
 """
 
-from lexer_simple import Token, TokenType, Lexer
-from typing import List, Optional
+from lexer_simple import Token, TokenType, Lexer, LineIndex, TokenBuffer, TOKEN_TYPES, KIND
+from diagnostics import Diagnostics, TooManyErrors, SYNTAX_ERROR
+from array import array
+from itertools import compress, count
+from operator import is_not, ne
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass, field
+import sys
 
 # ============================================
 # NODOS DEL ÁRBOL SINTÁCTICO ABSTRACTO (AST)
 # ============================================
 
-@dataclass
+# Nodos con __slots__ (sin __dict__ por instancia) desde Python 3.10;
+# en versiones anteriores son dataclasses comunes
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class ASTNode:
     """Clase base para nodos del AST"""
-    line: int = 0
-    column: int = 0
+    offset: int = 0
+    lines: Optional[LineIndex] = field(default=None, repr=False, compare=False)
+    
+    @property
+    def line(self) -> int:
+        """Línea del nodo (resuelta bajo demanda)"""
+        return self.lines.position(self.offset)[0] if self.lines else 0
+    
+    @property
+    def column(self) -> int:
+        """Columna del nodo (resuelta bajo demanda)"""
+        return self.lines.position(self.offset)[1] if self.lines else 0
 
-@dataclass
+@dataclass(**_SLOTS)
 class Program(ASTNode):
     statements: List[ASTNode] = field(default_factory=list)
 
-@dataclass
+@dataclass(**_SLOTS)
 class DeclStmt(ASTNode):
     type_name: str = ""  # 'int', 'float', 'string'
     var_name: str = ""
     init_value: Optional[ASTNode] = None
+    var_id: int = -1  # id del nombre en la NameTable del lexer (-1 si no hay)
 
-@dataclass
+@dataclass(**_SLOTS)
 class AssignStmt(ASTNode):
     var_name: str = ""
     value: Optional[ASTNode] = None
+    var_id: int = -1
 
-@dataclass
+@dataclass(**_SLOTS)
 class IfStmt(ASTNode):
     condition: Optional[ASTNode] = None
     then_stmt: Optional[ASTNode] = None
     else_stmt: Optional[ASTNode] = None
 
-@dataclass
+@dataclass(**_SLOTS)
 class WhileStmt(ASTNode):
     condition: Optional[ASTNode] = None
     body: Optional[ASTNode] = None
 
-@dataclass
+@dataclass(**_SLOTS)
 class PrintStmt(ASTNode):
     arguments: List[ASTNode] = field(default_factory=list)
 
-@dataclass
+@dataclass(**_SLOTS)
 class Block(ASTNode):
     statements: List[ASTNode] = field(default_factory=list)
 
-@dataclass
+@dataclass(**_SLOTS)
 class BinaryOp(ASTNode):
     operator: str = ""
     left: Optional[ASTNode] = None
     right: Optional[ASTNode] = None
 
-@dataclass
+@dataclass(**_SLOTS)
 class UnaryOp(ASTNode):
     operator: str = ""
     operand: Optional[ASTNode] = None
 
-@dataclass
+@dataclass(**_SLOTS)
 class Identifier(ASTNode):
     name: str = ""
+    name_id: int = -1
 
-@dataclass
+@dataclass(**_SLOTS)
 class Literal(ASTNode):
     value: str = ""
 
@@ -74,58 +96,227 @@ class Literal(ASTNode):
 # PARSER
 # ============================================
 
+# Tipos de token como enteros (columna kinds del TokenBuffer)
+K_INT = KIND[TokenType.INT]
+K_FLOAT = KIND[TokenType.FLOAT]
+K_STRING = KIND[TokenType.STRING]
+K_IF = KIND[TokenType.IF]
+K_ELSE = KIND[TokenType.ELSE]
+K_WHILE = KIND[TokenType.WHILE]
+K_PRINT = KIND[TokenType.PRINT]
+K_ID = KIND[TokenType.ID]
+K_NUM = KIND[TokenType.NUM]
+K_OR = KIND[TokenType.OR]
+K_AND = KIND[TokenType.AND]
+K_NOT = KIND[TokenType.NOT]
+K_EQ = KIND[TokenType.EQ]
+K_NEQ = KIND[TokenType.NEQ]
+K_LT = KIND[TokenType.LT]
+K_LTE = KIND[TokenType.LTE]
+K_GT = KIND[TokenType.GT]
+K_GTE = KIND[TokenType.GTE]
+K_PLUS = KIND[TokenType.PLUS]
+K_MINUS = KIND[TokenType.MINUS]
+K_MULT = KIND[TokenType.MULT]
+K_DIV = KIND[TokenType.DIV]
+K_MOD = KIND[TokenType.MOD]
+K_ASSIGN = KIND[TokenType.ASSIGN]
+K_LPAREN = KIND[TokenType.LPAREN]
+K_RPAREN = KIND[TokenType.RPAREN]
+K_LBRACE = KIND[TokenType.LBRACE]
+K_RBRACE = KIND[TokenType.RBRACE]
+K_SEMICOLON = KIND[TokenType.SEMICOLON]
+K_COMMA = KIND[TokenType.COMMA]
+K_EOF = KIND[TokenType.EOF]
+
+# Conjuntos de tipos precalculados (una sola vez por proceso)
+DECL_TYPES = frozenset({K_INT, K_FLOAT, K_STRING})
+FIRST_STMT = frozenset({K_INT, K_FLOAT, K_STRING, K_ID, K_IF, K_WHILE, K_PRINT, K_LBRACE})
+REL_OPS = frozenset({K_EQ, K_NEQ, K_LT, K_LTE, K_GT, K_GTE})
+ADD_OPS = frozenset({K_PLUS, K_MINUS})
+MUL_OPS = frozenset({K_MULT, K_DIV, K_MOD})
+UNARY_OPS = frozenset({K_NOT, K_MINUS})
+SYNC_TOKENS = frozenset({K_SEMICOLON, K_RBRACE, K_INT, K_FLOAT, K_STRING,
+                         K_IF, K_WHILE, K_PRINT, K_EOF})
+
+# Niveles de precedencia de los operadores binarios (motor "pratt"),
+# indexados por tipo de token; 0 = no es operador binario
+OR_LEVEL, AND_LEVEL, REL_LEVEL, ADD_LEVEL, MUL_LEVEL = 1, 2, 3, 4, 5
+BINARY_LEVEL = [0] * len(TOKEN_TYPES)
+BINARY_LEVEL[K_OR] = OR_LEVEL
+BINARY_LEVEL[K_AND] = AND_LEVEL
+for _kind in REL_OPS:
+    BINARY_LEVEL[_kind] = REL_LEVEL
+for _kind in ADD_OPS:
+    BINARY_LEVEL[_kind] = ADD_LEVEL
+for _kind in MUL_OPS:
+    BINARY_LEVEL[_kind] = MUL_LEVEL
+
+# Marcos de la pila de sentencias (motor "stack")
+_LIST, _THEN, _ELSE, _BODY, _ROOT = range(5)
+
+class TokenStream:
+    """
+    Ventana deslizante sobre un iterador de tokens (p. ej. Lexer.iter_tokens).
+    
+    Se indexa con posiciones absolutas, como una lista: los tokens se leen
+    del iterador a demanda y discard() libera los ya consumidos, así que la
+    memoria depende de la sentencia más larga y no del archivo. Las
+    posiciones después del EOF devuelven el EOF.
+    """
+    
+    def __init__(self, tokens: Iterable[Token]):
+        self.source = iter(tokens)
+        self.base = 0  # posición absoluta de window[0]
+        self.window: List[Token] = []
+        self.window_kinds: List[int] = []
+        self.kinds = _StreamKinds(self)
+    
+    def _fill(self, pos: int) -> int:
+        """Lee del iterador hasta tener la posición pos; retorna su índice en la ventana"""
+        i = pos - self.base
+        while i >= len(self.window):
+            if self.window_kinds and self.window_kinds[-1] == K_EOF:
+                return len(self.window) - 1
+            token = next(self.source)
+            self.window.append(token)
+            self.window_kinds.append(KIND[token.type])
+        return i
+    
+    def __getitem__(self, pos: int) -> Token:
+        return self.window[self._fill(pos)]
+    
+    def kind(self, pos: int) -> int:
+        """Tipo (entero) del token en la posición pos"""
+        return self.window_kinds[self._fill(pos)]
+    
+    def discard(self, pos: int):
+        """Libera los tokens anteriores a la posición pos"""
+        drop = pos - self.base
+        if drop > 0:
+            del self.window[:drop], self.window_kinds[:drop]
+            self.base = pos
+
+class _StreamKinds:
+    """Vista de los tipos de un TokenStream con la interfaz de la columna kinds"""
+    
+    def __init__(self, stream: TokenStream):
+        self.kind = stream.kind
+    
+    def __getitem__(self, pos: int) -> int:
+        return self.kind(pos)
+
 class Parser:
-    def __init__(self, tokens: List[Token]):
+    # Motores: "rd" (descenso recursivo), "pratt" (expresiones por tabla de
+    # precedencias) o "stack" (pila explícita: sin límite de anidamiento)
+    engines = ("rd", "pratt", "stack")
+    
+    def __init__(self, tokens: Union[List[Token], TokenBuffer, Iterable[Token]], engine: str = "rd",
+                 kinds: Optional[array] = None, diagnostics: Optional[Diagnostics] = None,
+                 share_exprs: bool = False):
+        # Con un iterador (no una lista) los tokens se leen a demanda
+        if not isinstance(tokens, (list, TokenBuffer)):
+            tokens = TokenStream(tokens)
+        
         self.tokens = tokens
         self.pos = 0
-        self.errors: List[str] = []
+        # Errores en el colector (compartido con otras fases si se pasa uno);
+        # errors es la vista de los sintácticos, formateados al leerlos
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        self.errors = self.diagnostics.messages(SYNTAX_ERROR)
+        # Con share_exprs, las expresiones iguales se comparten (hash-consing)
+        # y sus posiciones quedan en la tabla self.exprs
+        self.exprs: Optional[ExprTable] = ExprTable() if share_exprs else None
+        # Parseo incremental: posición → (sentencia ya parseada, posición tras ella)
+        self.reuse: Optional[Callable[[int], Optional[Tuple[ASTNode, int]]]] = None
+        
+        if engine not in self.engines:
+            raise ValueError(f"Motor sintáctico desconocido: '{engine}'")
+        self.engine = engine
+        if engine == "pratt":
+            self.parse_expr = self.parse_expr_pratt
+        elif engine == "stack":
+            self.parse_expr = self.parse_expr_stack
+            self.parse_stmt = self.parse_stmt_stack
+            self.parse_stmt_list = self.parse_stmt_list_stack
+        
+        # Tipos de token como enteros: el parser decide solo con esta columna
+        # (kinds: la columna ya calculada, p. ej. por IncrementalParser)
+        if kinds is not None:
+            self.kinds = kinds
+        elif isinstance(tokens, (TokenBuffer, TokenStream)):
+            self.kinds = tokens.kinds
+        else:
+            self.kinds = array('B', [KIND[token.type] for token in tokens])
+        
+        # Tipo del token actual, actualizado solo al avanzar
+        self.kind = self.kinds[0] if tokens else K_EOF
+    
+    def advance(self):
+        """Consume el token actual; nunca se llama sobre el EOF final"""
+        self.pos += 1
+        self.kind = self.kinds[self.pos]
     
     def current_token(self) -> Token:
-        """Retorna el token actual"""
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        return self.tokens[-1]  # EOF
+        """Retorna el token actual (la posición nunca pasa del EOF)"""
+        return self.tokens[self.pos]
+    
+    def current_kind(self) -> int:
+        """Retorna el tipo (entero) del token actual"""
+        return self.kind
     
     def peek_token(self, offset=1) -> Token:
-        """Mira el siguiente token sin consumir"""
-        pos = self.pos + offset
-        if pos < len(self.tokens):
-            return self.tokens[pos]
-        return self.tokens[-1]
+        """Mira el siguiente token sin consumir (sin pasar del EOF)"""
+        pos = self.pos
+        for _ in range(offset):
+            if self.kinds[pos] == K_EOF:
+                break
+            pos += 1
+        return self.tokens[pos]
     
-    def consume(self, expected_type: TokenType) -> Optional[Token]:
+    def consume(self, expected_kind: int) -> Optional[Token]:
         """Consume un token del tipo esperado"""
         token = self.current_token()
         
-        if token.type == expected_type:
-            self.pos += 1
+        if self.kind == expected_kind:
+            self.advance()
             return token
         else:
-            self.error(f"Se esperaba {expected_type.name}, se encontró {token.type.name} ('{token.value}')")
+            self.error('S001', TOKEN_TYPES[expected_kind].name, token.type.name, token.value)
             return None
     
-    def match(self, *token_types: TokenType) -> bool:
+    def match(self, *kinds: int) -> bool:
         """Verifica si el token actual es de alguno de los tipos dados"""
-        return self.current_token().type in token_types
+        return self.kind in kinds
     
-    def error(self, message: str):
-        """Registra un error sintáctico"""
+    def error(self, code: str, *args):
+        """Registra un error sintáctico (código de diagnostics.MESSAGES) en el token actual"""
         token = self.current_token()
-        error_msg = f"Error sintáctico en línea {token.line}, columna {token.column}: {message}"
-        self.errors.append(error_msg)
-        print(error_msg)
+        self.diagnostics.report(code, token.offset, token.lines, *args)
+    
+    def unexpected_error(self, exception: Exception):
+        """Registra una excepción interna del parser como error sintáctico"""
+        try:
+            self.error('S003', str(exception))
+        except TooManyErrors:
+            pass
+    
+    def reuse_stmt(self) -> Optional[ASTNode]:
+        """Toma la sentencia del parseo anterior que empieza en la posición actual, si la hay"""
+        found = self.reuse(self.pos)
+        if found is None:
+            return None
+        stmt, self.pos = found
+        self.kind = self.kinds[self.pos]
+        return stmt
     
     def synchronize(self):
         """Recuperación de errores: avanza hasta encontrar un punto de sincronización"""
-        sync_tokens = {TokenType.SEMICOLON, TokenType.RBRACE, TokenType.INT, 
-                       TokenType.FLOAT, TokenType.STRING, TokenType.IF, 
-                       TokenType.WHILE, TokenType.PRINT, TokenType.EOF}
-        
-        while not self.match(*sync_tokens):
-            self.pos += 1
+        while self.kind not in SYNC_TOKENS:
+            self.advance()
         
-        if self.match(TokenType.SEMICOLON):
-            self.pos += 1
+        if self.kind == K_SEMICOLON:
+            self.advance()
     
     # ============================================
     # REGLAS DE LA GRAMÁTICA
@@ -136,28 +327,68 @@ class Parser:
         try:
             statements = self.parse_stmt_list()
             
-            if not self.match(TokenType.EOF):
-                self.error("Se esperaba fin de archivo")
+            if self.kind != K_EOF:
+                self.error('S002')
             
             if self.errors:
                 print(f"\n❌ Se encontraron {len(self.errors)} errores sintácticos")
                 return None
             
             print("✅ Análisis sintáctico completado sin errores")
+            if self.exprs is not None:
+                for stmt in statements:
+                    self.exprs.share_stmt(stmt)
+                self.exprs.release()
             return Program(statements=statements)
         
+        except TooManyErrors:
+            print(f"\n❌ Se encontraron {len(self.errors)} errores sintácticos (límite alcanzado, análisis abortado)")
+            return None
+        
         except Exception as e:
-            self.error(f"Error inesperado: {str(e)}")
+            self.unexpected_error(e)
             return None
     
+    def iter_statements(self) -> Iterator[ASTNode]:
+        """
+        Program → StmtList, entregando cada sentencia del nivel superior en
+        cuanto está completa. Los errores se registran en self.errors a
+        medida que aparecen; con un iterador de tokens, los ya consumidos
+        se liberan antes de entregar cada sentencia.
+        """
+        try:
+            while self.kind in FIRST_STMT:
+                stmt = self.parse_stmt()
+                if stmt:
+                    if isinstance(self.tokens, TokenStream):
+                        self.tokens.discard(self.pos)
+                    if self.exprs is not None:
+                        self.exprs.share_stmt(stmt)
+                    yield stmt
+                else:
+                    # Error recovery
+                    self.synchronize()
+            
+            if self.kind != K_EOF:
+                self.error('S002')
+            if self.exprs is not None:
+                self.exprs.release()
+        
+        except TooManyErrors:
+            pass  # Límite de errores: no se entregan más sentencias
+        
+        except UnicodeDecodeError:
+            raise  # El iterador de tokens no pudo leer su archivo: no es un error sintáctico
+        
+        except Exception as e:
+            self.unexpected_error(e)
+    
     def parse_stmt_list(self) -> List[ASTNode]:
         """StmtList → Stmt StmtList | ε"""
         statements = []
         
         # FIRST(Stmt) = {int, float, string, id, if, while, print, '{'}
-        while self.match(TokenType.INT, TokenType.FLOAT, TokenType.STRING,
-                         TokenType.ID, TokenType.IF, TokenType.WHILE,
-                         TokenType.PRINT, TokenType.LBRACE):
+        while self.kind in FIRST_STMT:
             stmt = self.parse_stmt()
             if stmt:
                 statements.append(stmt)
@@ -171,43 +402,46 @@ class Parser:
         """
         Stmt → Decl ';' | Assign ';' | IfStmt | WhileStmt | PrintStmt ';' | Block
         """
-        token = self.current_token()
+        if self.reuse is not None:
+            stmt = self.reuse_stmt()
+            if stmt is not None:
+                return stmt
         
         # Decl → Type id DeclInit
-        if self.match(TokenType.INT, TokenType.FLOAT, TokenType.STRING):
+        if self.kind in DECL_TYPES:
             return self.parse_decl()
         
         # Assign → id '=' Expr
-        elif self.match(TokenType.ID):
+        elif self.kind == K_ID:
             return self.parse_assign()
         
         # IfStmt
-        elif self.match(TokenType.IF):
+        elif self.kind == K_IF:
             return self.parse_if_stmt()
         
         # WhileStmt
-        elif self.match(TokenType.WHILE):
+        elif self.kind == K_WHILE:
             return self.parse_while_stmt()
         
         # PrintStmt
-        elif self.match(TokenType.PRINT):
+        elif self.kind == K_PRINT:
             return self.parse_print_stmt()
         
         # Block
-        elif self.match(TokenType.LBRACE):
+        elif self.kind == K_LBRACE:
             return self.parse_block()
         
         else:
-            self.error(f"Inicio de sentencia inválido: {token.value}")
+            self.error('S004', self.current_token().value)
             return None
     
     def parse_decl(self) -> Optional[DeclStmt]:
         """Decl → Type id DeclInit ';'"""
         type_token = self.current_token()
         type_name = type_token.value
-        self.pos += 1  # Consumir tipo
+        self.advance()  # Consumir tipo
         
-        id_token = self.consume(TokenType.ID)
+        id_token = self.consume(K_ID)
         if not id_token:
             return None
         
@@ -215,89 +449,89 @@ class Parser:
         init_value = None
         
         # DeclInit → '=' Expr | ε
-        if self.match(TokenType.ASSIGN):
-            self.pos += 1  # Consumir '='
+        if self.kind == K_ASSIGN:
+            self.advance()  # Consumir '='
             init_value = self.parse_expr()
         
-        self.consume(TokenType.SEMICOLON)
+        self.consume(K_SEMICOLON)
         
         return DeclStmt(type_name=type_name, var_name=var_name, 
-                       init_value=init_value, line=type_token.line, 
-                       column=type_token.column)
+                       init_value=init_value, var_id=id_token.name_id, 
+                       offset=type_token.offset, lines=type_token.lines)
     
     def parse_assign(self) -> Optional[AssignStmt]:
         """Assign → id '=' Expr ';'"""
         id_token = self.current_token()
         var_name = id_token.value
-        self.pos += 1  # Consumir id
+        self.advance()  # Consumir id
         
-        self.consume(TokenType.ASSIGN)
+        self.consume(K_ASSIGN)
         value = self.parse_expr()
-        self.consume(TokenType.SEMICOLON)
+        self.consume(K_SEMICOLON)
         
-        return AssignStmt(var_name=var_name, value=value, 
-                         line=id_token.line, column=id_token.column)
+        return AssignStmt(var_name=var_name, value=value, var_id=id_token.name_id, 
+                         offset=id_token.offset, lines=id_token.lines)
     
     def parse_if_stmt(self) -> Optional[IfStmt]:
         """IfStmt → if '(' Expr ')' Stmt ElseOpt"""
         if_token = self.current_token()
-        self.pos += 1  # Consumir 'if'
+        self.advance()  # Consumir 'if'
         
-        self.consume(TokenType.LPAREN)
+        self.consume(K_LPAREN)
         condition = self.parse_expr()
-        self.consume(TokenType.RPAREN)
+        self.consume(K_RPAREN)
         
         then_stmt = self.parse_stmt()
         
         # ElseOpt → else Stmt | ε
         else_stmt = None
-        if self.match(TokenType.ELSE):
-            self.pos += 1  # Consumir 'else'
+        if self.kind == K_ELSE:
+            self.advance()  # Consumir 'else'
             else_stmt = self.parse_stmt()
         
         return IfStmt(condition=condition, then_stmt=then_stmt, 
-                     else_stmt=else_stmt, line=if_token.line, 
-                     column=if_token.column)
+                     else_stmt=else_stmt, offset=if_token.offset, 
+                     lines=if_token.lines)
     
     def parse_while_stmt(self) -> Optional[WhileStmt]:
         """WhileStmt → while '(' Expr ')' Stmt"""
         while_token = self.current_token()
-        self.pos += 1  # Consumir 'while'
+        self.advance()  # Consumir 'while'
         
-        self.consume(TokenType.LPAREN)
+        self.consume(K_LPAREN)
         condition = self.parse_expr()
-        self.consume(TokenType.RPAREN)
+        self.consume(K_RPAREN)
         
         body = self.parse_stmt()
         
         return WhileStmt(condition=condition, body=body, 
-                        line=while_token.line, column=while_token.column)
+                        offset=while_token.offset, lines=while_token.lines)
     
     def parse_print_stmt(self) -> Optional[PrintStmt]:
         """PrintStmt → print '(' ArgListOpt ')' ';'"""
         print_token = self.current_token()
-        self.pos += 1  # Consumir 'print'
+        self.advance()  # Consumir 'print'
         
-        self.consume(TokenType.LPAREN)
+        self.consume(K_LPAREN)
         
         # ArgListOpt → ArgList | ε
         arguments = []
-        if not self.match(TokenType.RPAREN):  # Si no es ')', hay argumentos
+        if self.kind != K_RPAREN:  # Si no es ')', hay argumentos
             arguments = self.parse_arg_list()
         
-        self.consume(TokenType.RPAREN)
-        self.consume(TokenType.SEMICOLON)
+        self.consume(K_RPAREN)
+        self.consume(K_SEMICOLON)
         
-        return PrintStmt(arguments=arguments, line=print_token.line, 
-                        column=print_token.column)
+        return PrintStmt(arguments=arguments, offset=print_token.offset, 
+                        lines=print_token.lines)
     
     def parse_arg_list(self) -> List[ASTNode]:
         """ArgList → Expr ArgList'"""
         args = [self.parse_expr()]
         
         # ArgList' → ',' Expr ArgList' | ε
-        while self.match(TokenType.COMMA):
-            self.pos += 1  # Consumir ','
+        while self.kind == K_COMMA:
+            self.advance()  # Consumir ','
             args.append(self.parse_expr())
         
         return args
@@ -305,14 +539,14 @@ class Parser:
     def parse_block(self) -> Optional[Block]:
         """Block → '{' StmtList '}'"""
         lbrace_token = self.current_token()
-        self.pos += 1  # Consumir '{'
+        self.advance()  # Consumir '{'
         
         statements = self.parse_stmt_list()
         
-        self.consume(TokenType.RBRACE)
+        self.consume(K_RBRACE)
         
-        return Block(statements=statements, line=lbrace_token.line, 
-                    column=lbrace_token.column)
+        return Block(statements=statements, offset=lbrace_token.offset, 
+                    lines=lbrace_token.lines)
     
     # ============================================
     # EXPRESIONES
@@ -329,12 +563,12 @@ class Parser:
     
     def parse_or_tail(self, left: ASTNode) -> ASTNode:
         """OrTail → '||' AndExpr OrTail | ε"""
-        while self.match(TokenType.OR):
+        while self.kind == K_OR:
             op_token = self.current_token()
-            self.pos += 1  # Consumir '||'
+            self.advance()  # Consumir '||'
             right = self.parse_and_expr()
             left = BinaryOp(operator='||', left=left, right=right, 
-                           line=op_token.line, column=op_token.column)
+                           offset=op_token.offset, lines=op_token.lines)
         return left
     
     def parse_and_expr(self) -> Optional[ASTNode]:
@@ -344,12 +578,12 @@ class Parser:
     
     def parse_and_tail(self, left: ASTNode) -> ASTNode:
         """AndTail → '&&' RelExpr AndTail | ε"""
-        while self.match(TokenType.AND):
+        while self.kind == K_AND:
             op_token = self.current_token()
-            self.pos += 1  # Consumir '&&'
+            self.advance()  # Consumir '&&'
             right = self.parse_rel_expr()
             left = BinaryOp(operator='&&', left=left, right=right, 
-                           line=op_token.line, column=op_token.column)
+                           offset=op_token.offset, lines=op_token.lines)
         return left
     
     def parse_rel_expr(self) -> Optional[ASTNode]:
@@ -359,13 +593,12 @@ class Parser:
     
     def parse_rel_tail(self, left: ASTNode) -> ASTNode:
         """RelTail → RelOp AddExpr | ε"""
-        if self.match(TokenType.EQ, TokenType.NEQ, TokenType.LT, 
-                     TokenType.LTE, TokenType.GT, TokenType.GTE):
+        if self.kind in REL_OPS:
             op_token = self.current_token()
-            self.pos += 1  # Consumir operador relacional
+            self.advance()  # Consumir operador relacional
             right = self.parse_add_expr()
             return BinaryOp(operator=op_token.value, left=left, right=right, 
-                           line=op_token.line, column=op_token.column)
+                           offset=op_token.offset, lines=op_token.lines)
         return left
     
     def parse_add_expr(self) -> Optional[ASTNode]:
@@ -375,12 +608,12 @@ class Parser:
     
     def parse_add_tail(self, left: ASTNode) -> ASTNode:
         """AddTail → ('+' | '-') MulExpr AddTail | ε"""
-        while self.match(TokenType.PLUS, TokenType.MINUS):
+        while self.kind in ADD_OPS:
             op_token = self.current_token()
-            self.pos += 1  # Consumir operador
+            self.advance()  # Consumir operador
             right = self.parse_mul_expr()
             left = BinaryOp(operator=op_token.value, left=left, right=right, 
-                           line=op_token.line, column=op_token.column)
+                           offset=op_token.offset, lines=op_token.lines)
         return left
     
     def parse_mul_expr(self) -> Optional[ASTNode]:
@@ -390,46 +623,608 @@ class Parser:
     
     def parse_mul_tail(self, left: ASTNode) -> ASTNode:
         """MulTail → ('*' | '/' | '%') Unary MulTail | ε"""
-        while self.match(TokenType.MULT, TokenType.DIV, TokenType.MOD):
+        while self.kind in MUL_OPS:
             op_token = self.current_token()
-            self.pos += 1  # Consumir operador
+            self.advance()  # Consumir operador
             right = self.parse_unary()
             left = BinaryOp(operator=op_token.value, left=left, right=right, 
-                           line=op_token.line, column=op_token.column)
+                           offset=op_token.offset, lines=op_token.lines)
         return left
     
     def parse_unary(self) -> Optional[ASTNode]:
         """Unary → '!' Unary | '-' Unary | Primary"""
-        if self.match(TokenType.NOT, TokenType.MINUS):
+        if self.kind in UNARY_OPS:
             op_token = self.current_token()
-            self.pos += 1  # Consumir operador unario
+            self.advance()  # Consumir operador unario
             operand = self.parse_unary()
             return UnaryOp(operator=op_token.value, operand=operand, 
-                          line=op_token.line, column=op_token.column)
+                          offset=op_token.offset, lines=op_token.lines)
         
         return self.parse_primary()
     
+    # ============================================
+    # EXPRESIONES POR PRECEDENCIA (motor "pratt")
+    # ============================================
+    
+    def parse_expr_pratt(self) -> Optional[ASTNode]:
+        """
+        Expr por precedencias: construye el mismo AST que parse_or_expr
+        (binarios asociativos a izquierda, relacionales no asociativos) en
+        un solo marco, con una pila de operadores pendientes en lugar de un
+        nivel de recursión por precedencia.
+        """
+        tokens = self.tokens
+        operands = []
+        operators = []  # (nivel, token) pendientes, con niveles crecientes
+        relational = False  # ya hay un relacional en el RelExpr actual
+        
+        while True:
+            # Operando: identificadores y números sin llamadas adicionales
+            kind = self.kind
+            if kind == K_ID:
+                token = tokens[self.pos]
+                self.advance()
+                operands.append(Identifier(token.offset, token.lines, token.value, token.name_id))
+            elif kind == K_NUM:
+                token = tokens[self.pos]
+                self.advance()
+                operands.append(Literal(token.offset, token.lines, token.value))
+            else:
+                operands.append(self.parse_prefix())
+            
+            level = BINARY_LEVEL[self.kind]
+            if not level:
+                break
+            
+            # RelTail → RelOp AddExpr | ε: un segundo relacional termina la expresión
+            if level == REL_LEVEL:
+                if relational:
+                    break
+                relational = True
+            elif level < REL_LEVEL:
+                relational = False
+            
+            # Reducir los operadores pendientes de igual o mayor precedencia
+            while operators and operators[-1][0] >= level:
+                op_token = operators.pop()[1]
+                right = operands.pop()
+                operands[-1] = BinaryOp(op_token.offset, op_token.lines, op_token.value,
+                                        operands[-1], right)
+            
+            operators.append((level, tokens[self.pos]))
+            self.advance()  # Consumir operador
+        
+        while operators:
+            op_token = operators.pop()[1]
+            right = operands.pop()
+            operands[-1] = BinaryOp(op_token.offset, op_token.lines, op_token.value,
+                                    operands[-1], right)
+        return operands[0]
+    
+    def parse_prefix(self) -> Optional[ASTNode]:
+        """Unary → ('!' | '-')* Primary, sin recursión por operador"""
+        if self.kind not in UNARY_OPS:
+            return self.parse_primary()
+        
+        op_tokens = []
+        while self.kind in UNARY_OPS:
+            op_tokens.append(self.current_token())
+            self.advance()  # Consumir operador unario
+        
+        operand = self.parse_primary()
+        for op_token in reversed(op_tokens):
+            operand = UnaryOp(operator=op_token.value, operand=operand, 
+                             offset=op_token.offset, lines=op_token.lines)
+        return operand
+    
     def parse_primary(self) -> Optional[ASTNode]:
         """Primary → id | NUM | '(' Expr ')'"""
         token = self.current_token()
         
-        if self.match(TokenType.ID):
-            self.pos += 1
-            return Identifier(name=token.value, line=token.line, 
-                            column=token.column)
+        if self.kind == K_ID:
+            self.advance()
+            return Identifier(name=token.value, name_id=token.name_id, 
+                            offset=token.offset, lines=token.lines)
         
-        elif self.match(TokenType.NUM):
-            self.pos += 1
-            return Literal(value=token.value, line=token.line, 
-                          column=token.column)
+        elif self.kind == K_NUM:
+            self.advance()
+            return Literal(value=token.value, offset=token.offset, 
+                          lines=token.lines)
         
-        elif self.match(TokenType.LPAREN):
-            self.pos += 1  # Consumir '('
+        elif self.kind == K_LPAREN:
+            self.advance()  # Consumir '('
             expr = self.parse_expr()
-            self.consume(TokenType.RPAREN)
+            self.consume(K_RPAREN)
             return expr
         
         else:
-            self.error(f"Se esperaba identificador, número o '(', se encontró {token.value}")
+            self.error('S005', token.value)
             return None
+    
+    # ============================================
+    # PILA EXPLÍCITA (motor "stack")
+    # ============================================
+    # Mismas reglas, mismos nodos y mismos errores que el descenso recursivo,
+    # pero las sentencias y los paréntesis anidados se guardan en pilas
+    # propias: la profundidad solo está limitada por la memoria.
+    
+    def parse_stmt_list_stack(self) -> List[ASTNode]:
+        """StmtList → Stmt StmtList | ε, con Block/If/While anidados en una pila"""
+        # [_LIST, sentencias, token '{' (None en el nivel superior)]
+        return self._run_stmt_stack([[_LIST, [], None]], start=False)
+    
+    def parse_stmt_stack(self) -> Optional[ASTNode]:
+        """Stmt, con Block/If/While anidados en una pila"""
+        return self._run_stmt_stack([[_ROOT]], start=True)
+    
+    def _run_stmt_stack(self, stack: list, start: bool):
+        """Ejecuta la pila de sentencias hasta vaciar el marco inicial"""
+        tokens = self.tokens
+        deliver = False  # entregar result al marco del tope
+        result = None
+        
+        while True:
+            if start:
+                start = False
+                if self.reuse is not None:
+                    result = self.reuse_stmt()
+                    if result is not None:
+                        deliver = True
+                        continue
+                kind = self.kind
+                
+                if kind in DECL_TYPES:
+                    result = self.parse_decl()
+                elif kind == K_ID:
+                    result = self.parse_assign()
+                elif kind == K_PRINT:
+                    result = self.parse_print_stmt()
+                elif kind == K_IF or kind == K_WHILE:
+                    # IfStmt / WhileStmt: la sentencia interna se reconoce en la pila
+                    token = tokens[self.pos]
+                    self.advance()  # Consumir 'if' / 'while'
+                    self.consume(K_LPAREN)
+                    condition = self.parse_expr()
+                    self.consume(K_RPAREN)
+                    stack.append([_THEN if kind == K_IF else _BODY, token, condition])
+                    start = True
+                    continue
+                elif kind == K_LBRACE:
+                    stack.append([_LIST, [], tokens[self.pos]])
+                    self.advance()  # Consumir '{'
+                    continue
+                else:
+                    self.error('S004', self.current_token().value)
+                    result = None
+                deliver = True
+                continue
+            
+            frame = stack[-1]
+            tag = frame[0]
+            
+            if deliver:
+                deliver = False
+                if tag == _LIST:
+                    if result:
+                        frame[1].append(result)
+                    else:
+                        # Error recovery
+                        self.synchronize()
+                elif tag == _THEN:
+                    # ElseOpt → else Stmt | ε
+                    if self.kind == K_ELSE:
+                        self.advance()  # Consumir 'else'
+                        stack[-1] = [_ELSE, frame[1], frame[2], result]
+                        start = True
+                    else:
+                        stack.pop()
+                        result = IfStmt(condition=frame[2], then_stmt=result, else_stmt=None, 
+                                        offset=frame[1].offset, lines=frame[1].lines)
+                        deliver = True
+                elif tag == _ROOT:
+                    return result
+                elif tag == _ELSE:
+                    stack.pop()
+                    result = IfStmt(condition=frame[2], then_stmt=frame[3], else_stmt=result, 
+                                    offset=frame[1].offset, lines=frame[1].lines)
+                    deliver = True
+                else:
+                    stack.pop()
+                    result = WhileStmt(condition=frame[2], body=result, 
+                                       offset=frame[1].offset, lines=frame[1].lines)
+                    deliver = True
+                continue
+            
+            # Tope _LIST: seguir mientras haya FIRST(Stmt)
+            if self.kind in FIRST_STMT:
+                start = True
+                continue
+            
+            stack.pop()
+            lbrace_token = frame[2]
+            if lbrace_token is None:
+                return frame[1]
+            
+            # Block → '{' StmtList '}'
+            self.consume(K_RBRACE)
+            result = Block(statements=frame[1], offset=lbrace_token.offset, 
+                           lines=lbrace_token.lines)
+            deliver = True
+    
+    def parse_expr_stack(self) -> Optional[ASTNode]:
+        """
+        Expr por precedencias (como parse_expr_pratt) con los paréntesis en
+        una pila: '(' guarda el estado de la expresión exterior y ')' lo
+        restaura con el resultado como operando.
+        """
+        tokens = self.tokens
+        saved = []  # (operandos, operadores, relacional, prefijos) de cada '(' abierto
+        operands = []
+        operators = []
+        relational = False
+        
+        while True:
+            # Unary → ('!' | '-')* Primary
+            prefixes = ()
+            if self.kind in UNARY_OPS:
+                prefixes = []
+                while self.kind in UNARY_OPS:
+                    prefixes.append(tokens[self.pos])
+                    self.advance()  # Consumir operador unario
+            
+            kind = self.kind
+            if kind == K_LPAREN:
+                self.advance()  # Consumir '('
+                saved.append((operands, operators, relational, prefixes))
+                operands = []
+                operators = []
+                relational = False
+                continue
+            
+            token = tokens[self.pos]
+            if kind == K_ID:
+                self.advance()
+                operand = Identifier(token.offset, token.lines, token.value, token.name_id)
+            elif kind == K_NUM:
+                self.advance()
+                operand = Literal(token.offset, token.lines, token.value)
+            else:
+                self.error('S005', token.value)
+                operand = None
+            
+            # Cerrar el operando; al terminar una subexpresión entre
+            # paréntesis, su resultado es el operando de la exterior
+            while True:
+                if prefixes:
+                    for op_token in reversed(prefixes):
+                        operand = UnaryOp(op_token.offset, op_token.lines, op_token.value, operand)
+                operands.append(operand)
+                
+                level = BINARY_LEVEL[self.kind]
+                if level and not (level == REL_LEVEL and relational):
+                    break
+                
+                while operators:
+                    op_token = operators.pop()[1]
+                    right = operands.pop()
+                    operands[-1] = BinaryOp(op_token.offset, op_token.lines, op_token.value,
+                                            operands[-1], right)
+                if not saved:
+                    return operands[0]
+                
+                operand = operands[0]
+                self.consume(K_RPAREN)
+                operands, operators, relational, prefixes = saved.pop()
+            
+            if level == REL_LEVEL:
+                relational = True
+            elif level < REL_LEVEL:
+                relational = False
+            
+            # Reducir los operadores pendientes de igual o mayor precedencia
+            while operators and operators[-1][0] >= level:
+                op_token = operators.pop()[1]
+                right = operands.pop()
+                operands[-1] = BinaryOp(op_token.offset, op_token.lines, op_token.value,
+                                        operands[-1], right)
+            
+            operators.append((level, tokens[self.pos]))
+            self.advance()  # Consumir operador
+
+# ============================================
+# PARSEO INCREMENTAL
+# ============================================
+
+# Campos con nodos hijos de cada clase del AST
+CHILD_FIELDS = {
+    Program: ('statements',),
+    DeclStmt: ('init_value',),
+    AssignStmt: ('value',),
+    IfStmt: ('condition', 'then_stmt', 'else_stmt'),
+    WhileStmt: ('condition', 'body'),
+    PrintStmt: ('arguments',),
+    Block: ('statements',),
+    BinaryOp: ('left', 'right'),
+    UnaryOp: ('operand',),
+    Identifier: (),
+    Literal: (),
+}
+
+def shift_positions(node: ASTNode, delta: int, lines: Optional[LineIndex]):
+    """Desplaza en delta el offset de node y de todo su subárbol (sin recursión)"""
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        node.offset += delta
+        node.lines = lines
+        for name in CHILD_FIELDS[type(node)]:
+            child = getattr(node, name)
+            if isinstance(child, list):
+                pending.extend(child)
+            elif child is not None:
+                pending.append(child)
+
+def first_moved(old_offsets: List[int], offsets: List[int], end: int) -> int:
+    """Primera posición antes de end cuyo offset cambió (los tokens corridos van juntos al final)"""
+    low, high = 0, end
+    while low < high:
+        middle = (low + high) // 2
+        if offsets[middle] == old_offsets[middle]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def common_prefix(old: list, new: list, is_different=ne) -> int:
+    """Longitud del prefijo común de dos secuencias"""
+    return next(compress(count(), map(is_different, old, new)), min(len(old), len(new)))
+
+def common_suffix(old: list, new: list, is_different=ne) -> int:
+    """Longitud del sufijo común de dos secuencias"""
+    return next(compress(count(), map(is_different, reversed(old), reversed(new))),
+                min(len(old), len(new)))
+
+class IncrementalParser:
+    """
+    Parser para flujos de edición (editor, modo watch).
+    
+    Guarda el árbol del último parseo sin errores y, al parsear los tokens
+    editados, reutiliza por identidad cada sentencia (del nivel superior,
+    de un bloque o cuerpo de un if/while) cuyos tokens, incluido el
+    siguiente, quedan fuera del tramo cambiado: solo se desplazan sus
+    offsets. El tramo cambiado es lo que queda entre el prefijo y el sufijo
+    comunes con los tokens anteriores: mismo texto e id de nombre, y mismo
+    offset (el prefijo) o el offset corrido tanto como el fin del archivo
+    (el sufijo). Los tokens que relex conserva se reconocen por identidad
+    sin mirarlos uno a uno; el resto se compara por valor, así que también
+    sirve una tokenización completa nueva. El Program anterior deja de ser
+    válido: sus nodos pasan al nuevo.
+    """
+    
+    def __init__(self, engine: str = "rd"):
+        if engine not in Parser.engines:
+            raise ValueError(f"Motor sintáctico desconocido: '{engine}'")
+        self.engine = engine
+        self.program: Optional[Program] = None
+        # Copia de los tokens del último parseo, con sus tipos y offsets
+        self.tokens: List[Token] = []
+        self.kinds = array('B')
+        self.offsets: List[int] = []
+        # Posición del primer token de cada sentencia → (sentencia, posición del token que la sigue)
+        self.spans: Dict[int, Tuple[ASTNode, int]] = {}
+        self.reused = 0  # sentencias reutilizadas en el último parseo
+    
+    def parse(self, tokens: List[Token]) -> Optional[Program]:
+        """Parsea tokens (la tokenización completa del fuente editado) reutilizando el árbol anterior"""
+        old, old_offsets = self.tokens, self.offsets
+        offsets = [token.offset for token in tokens]
+        n = min(len(old), len(tokens))
+        moved = offsets[-1] - old_offsets[-1] if old else 0  # corrimiento del fin del archivo
+        
+        # Tokens conservados por relex (el mismo objeto): mismo texto y tipo
+        same_prefix = common_prefix(old, tokens, is_not)
+        same_suffix = min(common_suffix(old, tokens, is_not), n - same_prefix)
+        kinds = (self.kinds[:same_prefix]
+                 + array('B', [KIND[token.type] for token in tokens[same_prefix:len(tokens) - same_suffix]])
+                 + self.kinds[len(old) - same_suffix:])
+        
+        # relex corre juntos, tanto como el fin del archivo, todos los tokens
+        # desde un punto: si ese punto cae dentro del prefijo idéntico (una
+        # edición que no cambió ningún token), ahí empieza el sufijo
+        prefix = first_moved(old_offsets, offsets, same_prefix)
+        if prefix < same_prefix:
+            suffix = n - prefix
+        else:
+            # El tramo intermedio se compara por texto, id de nombre y offset
+            # (el del sufijo, descontando el corrimiento)
+            suffix = same_suffix
+            old_middle = range(same_prefix, len(old) - same_suffix)
+            new_middle = range(same_prefix, len(tokens) - same_suffix)
+            if old_middle and new_middle:
+                old_keys = [(old[i].value, old[i].name_id, old_offsets[i]) for i in old_middle]
+                new_keys = [(tokens[i].value, tokens[i].name_id, offsets[i]) for i in new_middle]
+                extra = common_prefix(old_keys, new_keys)
+                prefix += extra
+                old_keys = [(value, name_id, offset + moved) for value, name_id, offset in old_keys]
+                suffix += min(common_suffix(old_keys, new_keys), len(old_keys) - extra, len(new_keys) - extra)
+        
+        # Sentencias que siguen valiendo: las del prefijo (con su token
+        # siguiente) y las del sufijo, con la posición corrida
+        shift = len(tokens) - len(old)
+        old_suffix = len(old) - suffix
+        spans = {start: span for start, span in self.spans.items() if span[1] < prefix}
+        spans.update({start + shift: (stmt, end + shift)
+                      for start, (stmt, end) in self.spans.items() if start >= old_suffix})
+        
+        starts = {}  # offset → posición de cada sentencia que empezó a parsearse
+        self.reused = 0
+        
+        def reuse(pos: int) -> Optional[Tuple[ASTNode, int]]:
+            token = tokens[pos]
+            starts[token.offset] = pos
+            found = spans.get(pos)
+            if found is None:
+                return None
+            stmt = found[0]
+            if stmt.offset != token.offset or stmt.lines is not token.lines:
+                shift_positions(stmt, token.offset - stmt.offset, token.lines)
+            self.reused += 1
+            return found
+        
+        parser = Parser(tokens, self.engine, kinds)
+        parser.reuse = reuse
+        program = parser.parse()
+        
+        self.program = program
+        self.tokens = list(tokens)
+        self.kinds = kinds
+        self.offsets = offsets
+        self.spans = self._record_spans(program, spans, starts, len(tokens) - 1) if program else {}
+        return program
+    
+    @staticmethod
+    def _record_spans(program: Program, spans: Dict[int, Tuple[ASTNode, int]],
+                      starts: Dict[int, int], eof: int) -> Dict[int, Tuple[ASTNode, int]]:
+        """Agrega a spans las sentencias parseadas de nuevo (las reutilizadas ya están)"""
+        # Listas de sentencias con la posición del token que las sigue
+        pending = [(program.statements, eof)]
+        while pending:
+            statements, end = pending.pop()
+            for stmt in reversed(statements):
+                start = starts[stmt.offset]
+                found = spans.get(start)
+                if found is None or found[0] is not stmt:
+                    spans[start] = (stmt, end)
+                    cls = type(stmt)
+                    if cls is Block:
+                        pending.append((stmt.statements, end - 1))  # hasta la '}'
+                    elif cls is IfStmt:
+                        if stmt.else_stmt is None:
+                            pending.append(((stmt.then_stmt,), end))
+                        else:
+                            else_start = starts[stmt.else_stmt.offset]
+                            pending.append(((stmt.then_stmt,), else_start - 1))  # hasta el 'else'
+                            pending.append(((stmt.else_stmt,), end))
+                    elif cls is WhileStmt:
+                        pending.append(((stmt.body,), end))
+                end = start
+        return spans
+
+# ============================================
+# EXPRESIONES COMPARTIDAS (hash-consing)
+# ============================================
+
+# Campos de cada sentencia que contienen expresiones, en el orden en que se analizan
+STMT_EXPR_FIELDS = {
+    DeclStmt: ('init_value',),
+    AssignStmt: ('value',),
+    IfStmt: ('condition',),
+    WhileStmt: ('condition',),
+    PrintStmt: ('arguments',),
+}
 
+class ExprTable:
+    """
+    Tabla de hash-consing de expresiones.
+    
+    Cada expresión (BinaryOp, UnaryOp, Identifier, Literal) estructuralmente
+    igual a otra ya vista se reemplaza por la misma instancia: el AST pasa a
+    ser un DAG y los resultados por nodo (tipos, constantes) se pueden
+    calcular una vez por expresión distinta. El offset de un nodo compartido
+    es el de su primera aparición; el de cada aparición queda en offsets,
+    en el orden en que se recorren: sentencias en preorden (como las visita
+    el analizador semántico) y, dentro de cada una, sus expresiones en
+    preorden. starts da, por número de sentencia, su primer índice en offsets.
+    """
+    
+    def __init__(self):
+        self.nodes: Dict[tuple, ASTNode] = {}
+        self.offsets = array('I')
+        self.starts = array('I')
+        self.occurrences = 0  # nodos de expresión vistos
+        self.shared = 0       # apariciones reemplazadas por un nodo ya existente
+    
+    def release(self):
+        """Descarta el índice de hash-consing (no se agregarán más sentencias); las posiciones se conservan"""
+        self.nodes = {}
+    
+    def share_stmt(self, root: Optional[ASTNode]):
+        """Comparte las expresiones de root y de todas las sentencias anidadas"""
+        pending = [root]
+        while pending:
+            stmt = pending.pop()
+            self.starts.append(len(self.offsets))
+            for name in STMT_EXPR_FIELDS.get(type(stmt), ()):
+                value = getattr(stmt, name)
+                if isinstance(value, list):
+                    value[:] = [self.share(arg) for arg in value]
+                else:
+                    setattr(stmt, name, self.share(value))
+            
+            # Mismo orden (y mismos hijos ausentes) que visit_stmt del analizador
+            if isinstance(stmt, Block):
+                pending.extend(reversed(stmt.statements))
+            elif isinstance(stmt, IfStmt):
+                if stmt.else_stmt:
+                    pending.append(stmt.else_stmt)
+                pending.append(stmt.then_stmt)
+            elif isinstance(stmt, WhileStmt):
+                pending.append(stmt.body)
+    
+    def share(self, root: Optional[ASTNode]) -> Optional[ASTNode]:
+        """
+        Retorna la instancia compartida de la expresión root (sin recursión),
+        registrando el offset de cada nodo en preorden (0 para hijos ausentes)
+        """
+        nodes = self.nodes
+        offsets = self.offsets
+        results: List[Optional[ASTNode]] = []
+        pending: List[Tuple[Optional[ASTNode], bool]] = [(root, False)]
+        while pending:
+            node, children_done = pending.pop()
+            if node is None:
+                offsets.append(0)
+                results.append(None)
+                continue
+            
+            cls = type(node)
+            if not children_done:
+                offsets.append(node.offset)
+                self.occurrences += 1
+                if cls is BinaryOp:
+                    pending.append((node, True))
+                    pending.append((node.right, False))
+                    pending.append((node.left, False))
+                    continue
+                if cls is UnaryOp:
+                    pending.append((node, True))
+                    pending.append((node.operand, False))
+                    continue
+            
+            # Los hijos ya son compartidos: basta su identidad en la clave
+            if cls is BinaryOp:
+                right = results.pop()
+                left = results.pop()
+                key = (cls, node.operator, id(left), id(right))
+            elif cls is UnaryOp:
+                operand = results.pop()
+                key = (cls, node.operator, id(operand))
+            elif cls is Identifier:
+                key = (cls, node.name, node.name_id)
+            elif cls is Literal:
+                key = (cls, node.value)
+            else:
+                results.append(node)
+                continue
+            
+            shared = nodes.get(key)
+            if shared is None:
+                if cls is BinaryOp:
+                    node.left, node.right = left, right
+                elif cls is UnaryOp:
+                    node.operand = operand
+                shared = nodes[key] = node
+            else:
+                self.shared += 1
+            results.append(shared)
+        return results[0]
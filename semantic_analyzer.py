@@ -9,8 +9,13 @@ Validaciones implementadas:
 """
 
 from parser_rd import *
-from typing import Dict, List, Optional, Set
+from diagnostics import Diagnostics, TooManyErrors, SEMANTIC_ERROR, SEMANTIC_WARNING
+from ast_visitor import Visitor, handles
+from type_system import (TYPE_NAMES, BINARY_OPS, UNARY_OPS, BINARY_RESULT, UNARY_RESULT, COMPATIBLE,
+                         CONDITION_TYPES, ARITHMETIC_OPS, INVALID, TYPE_MASK, UNKNOWN, INT, FLOAT, type_id)
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
+from operator import attrgetter
 
 # ============================================
 # TABLA DE SÍMBOLOS
@@ -24,70 +29,114 @@ class Symbol:
     line: int
     column: int
     initialized: bool = False
+    type_id: int = UNKNOWN  # id de type_system, resuelto al declarar
+
+# Clave de un símbolo: el id de nombre del lexer, o el nombre si el nodo no trae id
+SymbolKey = Union[int, str]
+
+def symbol_key(name: str, name_id: int) -> SymbolKey:
+    """Clave con la que se busca un nombre en la tabla de símbolos"""
+    return name_id if name_id >= 0 else name
 
 class SymbolTable:
-    """Tabla de símbolos con soporte para ámbitos anidados"""
+    """
+    Tabla de símbolos con soporte para ámbitos anidados (estilo LeBlanc-Cook).
     
-    def __init__(self):
-        self.scopes: List[Dict[str, Symbol]] = [{}]  # Stack de ámbitos
+    Cada nombre tiene su pila de declaraciones visibles (la del tope es la
+    del ámbito más interno), así que buscar, declarar, entrar y salir de un
+    ámbito no dependen de la profundidad del anidamiento. Cada ámbito guarda
+    sus propios símbolos, que al salir se quitan de las pilas; con
+    keep_exited, los ámbitos cerrados se conservan para reportarlos.
+    """
+    
+    def __init__(self, keep_exited: bool = True):
+        self.scopes: List[Dict[SymbolKey, Symbol]] = [{}]  # Stack de ámbitos vivos
         self.current_scope = 0
+        self.bindings: Dict[SymbolKey, List[Symbol]] = {}  # nombre → declaraciones visibles
+        # Todos los ámbitos creados, en orden de apertura: (nivel, símbolos, vivo)
+        self.keep_exited = keep_exited
+        self.history: List[List] = [[0, self.scopes[0], True]]
+        self.open_entries: List[List] = [self.history[0]]  # entrada de history de cada ámbito vivo
     
     def enter_scope(self):
         """Entra a un nuevo ámbito (bloque)"""
-        self.scopes.append({})
+        scope: Dict[SymbolKey, Symbol] = {}
+        self.scopes.append(scope)
         self.current_scope += 1
+        if self.keep_exited:
+            entry = [self.current_scope, scope, True]
+            self.history.append(entry)
+            self.open_entries.append(entry)
     
     def exit_scope(self):
-        """Sale del ámbito actual"""
+        """Sale del ámbito actual, retirando sus declaraciones de las pilas"""
         if self.current_scope > 0:
-            self.scopes.pop()
+            scope = self.scopes.pop()
             self.current_scope -= 1
-    
-    def declare(self, name: str, symbol_type: str, line: int, column: int, initialized: bool = False) -> bool:
+            bindings = self.bindings
+            for key in scope:
+                stack = bindings[key]
+                stack.pop()
+                if not stack:
+                    del bindings[key]
+            if self.keep_exited:
+                self.open_entries.pop()[2] = False
+    
+    def declare(self, name: str, symbol_type: str, line: int, column: int, initialized: bool = False,
+                key: Optional[SymbolKey] = None) -> bool:
         """
-        Declara una variable en el ámbito actual
+        Declara una variable en el ámbito actual (bajo key, o el nombre si no se da)
         Retorna True si fue exitoso, False si ya existe
         """
         current = self.scopes[self.current_scope]
+        if key is None:
+            key = name
         
-        if name in current:
+        if key in current:
             return False  # Ya existe en este ámbito
         
-        current[name] = Symbol(name, symbol_type, line, column, initialized)
+        symbol = current[key] = Symbol(name, symbol_type, line, column, initialized, type_id(symbol_type))
+        stack = self.bindings.get(key)
+        if stack is None:
+            self.bindings[key] = [symbol]
+        else:
+            stack.append(symbol)
         return True
     
-    def lookup(self, name: str) -> Optional[Symbol]:
-        """Busca una variable en todos los ámbitos (del más interno al más externo)"""
-        for scope in reversed(self.scopes):
-            if name in scope:
-                return scope[name]
-        return None
+    def lookup(self, key: SymbolKey) -> Optional[Symbol]:
+        """Busca la declaración visible de una variable (la del ámbito más interno)"""
+        stack = self.bindings.get(key)
+        return stack[-1] if stack else None
     
-    def update_initialized(self, name: str):
+    def update_initialized(self, key: SymbolKey):
         """Marca una variable como inicializada"""
-        for scope in reversed(self.scopes):
-            if name in scope:
-                scope[name].initialized = True
-                return
+        symbol = self.lookup(key)
+        if symbol is not None:
+            symbol.initialized = True
     
     def get_all_symbols(self) -> List[Symbol]:
-        """Retorna todos los símbolos de todos los ámbitos"""
+        """Retorna todos los símbolos de los ámbitos vivos"""
         all_symbols = []
         for scope in self.scopes:
             all_symbols.extend(scope.values())
         return all_symbols
     
-    def print_table(self):
-        """Imprime la tabla de símbolos"""
+    def print_table(self, include_exited: bool = False):
+        """Imprime la tabla de símbolos (los ámbitos vivos, o todos con include_exited)"""
         print("\n" + "=" * 80)
         print("TABLA DE SÍMBOLOS")
         print("=" * 80)
         print(f"{'Variable':<15} {'Tipo':<10} {'Inicializada':<15} {'Ubicación':<20}")
         print("-" * 80)
         
-        for i, scope in enumerate(self.scopes):
+        if include_exited:
+            scopes = [(level, scope, "" if alive else " (cerrado)") for level, scope, alive in self.history]
+        else:
+            scopes = [(level, scope, "") for level, scope in enumerate(self.scopes)]
+        
+        for level, scope, state in scopes:
             if scope:
-                print(f"\n--- Ámbito {i} ---")
+                print(f"\n--- Ámbito {level}{state} ---")
                 for symbol in scope.values():
                     init_str = "Sí" if symbol.initialized else "No"
                     loc = f"[{symbol.line}:{symbol.column}]"
@@ -95,39 +144,185 @@ class SymbolTable:
         print()
 
 # ============================================
-# ANALIZADOR SEMÁNTICO
+# ANOTACIONES DE TIPOS
 # ============================================
 
-class SemanticAnalyzer:
-    """Analizador semántico con validaciones"""
+# Dependencias de una expresión: (clave, id de tipo) de cada variable que usa
+Deps = Tuple[Tuple[SymbolKey, int], ...]
+
+# Más variables distintas que esto y la expresión no se reutiliza (acota la memoria)
+MAX_DEPS = 8
+
+# Clave → Symbol de las variables de una expresión, compartido por sus anotaciones:
+# todas sus apariciones están en el mismo ámbito
+Bindings = Dict[SymbolKey, Symbol]
+
+class Annotation(NamedTuple):
+    """Resultado de inferir una expresión"""
+    node: ASTNode
+    type_id: int
+    key: Optional[SymbolKey]  # variable resuelta (solo Identifier)
+    size: int  # nodos de la subexpresión, en preorden
+    deps: Optional[Deps]  # None: emitió diagnósticos o usa demasiadas variables
+    bindings: Bindings  # las declaraciones vigentes de la expresión
+    
+    @property
+    def symbol(self) -> Optional[Symbol]:
+        """Declaración a la que resuelve la variable (None si no es un Identifier resuelto)"""
+        return self.bindings.get(self.key) if self.key is not None else None
+
+# Construye una Annotation sin pasar por el __new__ generado de NamedTuple
+_new_annotation = tuple.__new__
+
+class TypeAnnotations:
+    """
+    Tipo inferido y símbolo resuelto de cada nodo de expresión, por nodo.
+    
+    Pasada a SemanticAnalyzer, se completa durante el análisis y permite
+    saltear la inferencia de una subexpresión ya anotada (p. ej. una
+    sentencia que IncrementalParser reutilizó, o una expresión compartida
+    por share_exprs) si sigue siendo válida: no emitió diagnósticos y cada
+    variable que usa resuelve a una declaración del mismo tipo, ya
+    inicializada. El symbol de cada variable se lee de los bindings de su
+    expresión: al saltear una expresión entera se actualizan solo sus
+    bindings; una subexpresión salteada dentro de otra que se vuelve a
+    inferir se recorre para pasarla a los bindings nuevos (rebind). Con
+    share_exprs, un nodo compartido da la declaración de la última
+    expresión que lo anotó.
+    
+    Cada anotación mantiene vivo su nodo: tras reemplazar el árbol (una
+    edición), prune descarta las de los nodos que ya no se usan.
+    """
     
     def __init__(self):
-        self.symbol_table = SymbolTable()
-        self.errors: List[str] = []
-        self.warnings: List[str] = []
-    
-    def error(self, message: str, line: int, column: int):
-        """Registra un error semántico"""
-        error_msg = f"Error semántico [{line}:{column}]: {message}"
-        self.errors.append(error_msg)
-        print(f"❌ {error_msg}")
+        self.entries: Dict[int, Annotation] = {}  # id(nodo) → anotación (que mantiene vivo al nodo)
+        self.reused = 0  # subexpresiones salteadas en el último análisis
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, node: ASTNode) -> Optional[Annotation]:
+        """Anotación de node, si la tiene"""
+        entry = self.entries.get(id(node))
+        return entry if entry is not None and entry.node is node else None
+    
+    def type_of(self, node: ASTNode) -> Optional[str]:
+        """Nombre del tipo inferido para node"""
+        entry = self.get(node)
+        return TYPE_NAMES[entry.type_id] if entry is not None else None
+    
+    def symbol_of(self, node: ASTNode) -> Optional[Symbol]:
+        """Símbolo al que resolvió node (un Identifier)"""
+        entry = self.get(node)
+        return entry.symbol if entry is not None else None
+    
+    def rebind(self, root: ASTNode, bindings: Bindings):
+        """Pasa las anotaciones de la subexpresión root a bindings (los de la expresión que la contiene)"""
+        entries = self.entries
+        operand_getter = EXPR_OPERAND_GETTERS.get
+        pending: List[ASTNode] = [root]
+        while pending:
+            node = pending.pop()
+            entry = entries.get(id(node))
+            if entry is not None and entry.node is node and entry.bindings is not bindings:
+                entries[id(node)] = entry._replace(bindings=bindings)
+            operands = operand_getter(type(node))
+            if operands is not None:
+                getter, arity = operands
+                if arity == 1:
+                    pending.append(getter(node))
+                else:
+                    pending.extend(getter(node))
+    
+    def prune(self, program: Program):
+        """Descarta las anotaciones de los nodos que ya no están en program (p. ej. tras una edición)"""
+        entries = self.entries
+        kept: Dict[int, Annotation] = {}
+        pending: List[ASTNode] = [program]
+        while pending:
+            node = pending.pop()
+            entry = entries.get(id(node))
+            if entry is not None and entry.node is node:
+                kept[id(node)] = entry
+            for name in CHILD_FIELDS[type(node)]:
+                child = getattr(node, name)
+                if isinstance(child, list):
+                    pending.extend(child)
+                elif child is not None:
+                    pending.append(child)
+        self.entries = kept
+
+# ============================================
+# ANALIZADOR SEMÁNTICO
+# ============================================
+
+# Operandos de las expresiones con hijos (el resto son hojas)
+EXPR_OPERANDS = {node_class: CHILD_FIELDS[node_class] for node_class in (BinaryOp, UnaryOp)}
+# Clase → (attrgetter de los operandos en orden inverso, para apilarlos; cantidad)
+EXPR_OPERAND_GETTERS = {node_class: (attrgetter(*reversed(names)), len(names))
+                        for node_class, names in EXPR_OPERANDS.items()}
+
+# Marca en la pila de sentencias pendientes: cierre del ámbito de un bloque
+EXIT_SCOPE = object()
+
+class SemanticAnalyzer(Visitor):
+    """Analizador semántico con validaciones (un Visitor: despacho por clase de nodo)"""
     
-    def warning(self, message: str, line: int, column: int):
-        """Registra una advertencia"""
-        warn_msg = f"Advertencia [{line}:{column}]: {message}"
-        self.warnings.append(warn_msg)
-        print(f"⚠️  {warn_msg}")
+    def __init__(self, diagnostics: Optional[Diagnostics] = None, exprs: Optional[ExprTable] = None,
+                 annotations: Optional[TypeAnnotations] = None):
+        self.symbol_table = SymbolTable()
+        # Vistas de los errores y advertencias del colector (formateados al leerlos)
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        self.errors = self.diagnostics.messages(SEMANTIC_ERROR)
+        self.warnings = self.diagnostics.messages(SEMANTIC_WARNING)
+        # AST con expresiones compartidas (Parser(share_exprs=True)): cada
+        # aparición se ubica por su índice de recorrido en exprs.offsets
+        self.exprs = exprs
+        self.stmt_number = 0
+        self.expr_index = 0
+        # Sentencias por visitar: el recorrido usa esta pila en lugar de la recursión
+        self.pending: List[object] = []
+        # Con annotations, cada expresión se anota (y las ya anotadas y válidas se saltean)
+        self.annotations = annotations
+        self.resolved: Optional[Tuple[SymbolKey, Symbol]] = None  # la última variable resuelta
+    
+    def error(self, code: str, node: ASTNode, *args, key: Hashable = None, offset: Optional[int] = None):
+        """Registra un error semántico (código de diagnostics.MESSAGES) en la posición del nodo (u offset)"""
+        self.diagnostics.report(code, node.offset if offset is None else offset, node.lines, *args, key=key)
+    
+    def warning(self, code: str, node: ASTNode, *args, key: Hashable = None, offset: Optional[int] = None):
+        """Registra una advertencia en la posición del nodo (u offset)"""
+        self.diagnostics.report(code, node.offset if offset is None else offset, node.lines, *args, key=key)
+    
+    def occurrence(self, node: ASTNode, index: int) -> int:
+        """Offset de la aparición de node con índice de recorrido index"""
+        return self.exprs.offsets[index] if self.exprs is not None else node.offset
     
     def analyze(self, ast: Program) -> bool:
         """
         Punto de entrada del análisis semántico
         Retorna True si no hubo errores
         """
+        return self.analyze_stream(ast.statements)
+    
+    def analyze_stream(self, statements: Iterable[ASTNode]) -> bool:
+        """
+        Analiza las sentencias del nivel superior a medida que llegan (p. ej.
+        desde Parser.iter_statements); cada una se puede liberar apenas se
+        visita. Retorna True si no hubo errores
+        """
         print("\n" + "=" * 80)
         print("FASE 3: ANÁLISIS SEMÁNTICO")
         print("=" * 80)
         
-        self.visit_program(ast)
+        if self.annotations is not None:
+            self.annotations.reused = 0
+        
+        try:
+            for stmt in statements:
+                self.visit_stmt(stmt)
+        except TooManyErrors:
+            print(f"\n❌ Límite de {self.diagnostics.max_errors} errores alcanzado: análisis abortado")
         
         # Mostrar tabla de símbolos
         self.symbol_table.print_table()
@@ -150,26 +345,37 @@ class SemanticAnalyzer:
     # VISITADORES DEL AST
     # ============================================
     
+    @handles(Program)
     def visit_program(self, node: Program):
         """Visita el nodo Program"""
         for stmt in node.statements:
             self.visit_stmt(stmt)
     
     def visit_stmt(self, node: ASTNode):
-        """Despacha al visitador apropiado según el tipo de sentencia"""
-        if isinstance(node, DeclStmt):
-            self.visit_decl(node)
-        elif isinstance(node, AssignStmt):
-            self.visit_assign(node)
-        elif isinstance(node, IfStmt):
-            self.visit_if(node)
-        elif isinstance(node, WhileStmt):
-            self.visit_while(node)
-        elif isinstance(node, PrintStmt):
-            self.visit_print(node)
-        elif isinstance(node, Block):
-            self.visit_block(node)
+        """
+        Visita una sentencia y las anidadas sin recursión: los visitadores
+        apilan en self.pending las sentencias hijas (en orden inverso) y el
+        bucle las despacha, así que la profundidad no está limitada por la pila
+        """
+        dispatch = self.dispatch
+        pending = self.pending
+        base = len(pending)
+        pending.append(node)
+        
+        while len(pending) > base:
+            node = pending.pop()
+            if node is EXIT_SCOPE:
+                self.symbol_table.exit_scope()
+                continue
+            
+            if self.exprs is not None:
+                # Las sentencias se numeran en el orden de visita, como en ExprTable
+                self.expr_index = self.exprs.starts[self.stmt_number]
+                self.stmt_number += 1
+            
+            dispatch[type(node)](self, node)
     
+    @handles(DeclStmt)
     def visit_decl(self, node: DeclStmt):
         """
         Validación 1: No redeclaración en el mismo ámbito
@@ -180,212 +386,299 @@ class SemanticAnalyzer:
             node.type_name, 
             node.line, 
             node.column,
-            initialized=(node.init_value is not None)
+            initialized=(node.init_value is not None),
+            key=symbol_key(node.var_name, node.var_id)
         )
         
         if not success:
-            self.error(
-                f"La variable '{node.var_name}' ya fue declarada en este ámbito",
-                node.line, node.column
-            )
+            self.error('E001', node, node.var_name)
         
         # Si tiene valor inicial, verificar compatibilidad de tipos
         if node.init_value:
             expr_type = self.get_expr_type(node.init_value)
-            if not self.are_types_compatible(node.type_name, expr_type):
-                self.error(
-                    f"Tipo incompatible en inicialización: se esperaba '{node.type_name}', se encontró '{expr_type}'",
-                    node.line, node.column
-                )
+            if not COMPATIBLE[type_id(node.type_name)] >> expr_type & 1:
+                self.error('E002', node, node.type_name, TYPE_NAMES[expr_type])
     
+    @handles(AssignStmt)
     def visit_assign(self, node: AssignStmt):
         """
         Validación 2: La variable debe estar declarada antes de usarse
         Validación 3: Los tipos deben ser compatibles
         """
         # Verificar que la variable existe
-        symbol = self.symbol_table.lookup(node.var_name)
+        key = symbol_key(node.var_name, node.var_id)
+        symbol = self.symbol_table.lookup(key)
         
         if not symbol:
-            self.error(
-                f"La variable '{node.var_name}' no ha sido declarada",
-                node.line, node.column
-            )
+            self.error('E003', node, node.var_name, key=key)
             return
         
         # Marcar como inicializada
-        self.symbol_table.update_initialized(node.var_name)
+        symbol.initialized = True
         
         # Verificar compatibilidad de tipos
         expr_type = self.get_expr_type(node.value)
-        if not self.are_types_compatible(symbol.type, expr_type):
-            self.error(
-                f"Tipo incompatible en asignación: se esperaba '{symbol.type}', se encontró '{expr_type}'",
-                node.line, node.column
-            )
+        if not COMPATIBLE[symbol.type_id] >> expr_type & 1:
+            self.error('E004', node, symbol.type, TYPE_NAMES[expr_type])
     
+    @handles(IfStmt)
     def visit_if(self, node: IfStmt):
         """
         Validación 4: La condición debe ser de tipo booleano (o numérico)
         """
         cond_type = self.get_expr_type(node.condition)
         
-        # La condición debe ser booleana o numérica
-        if cond_type not in ['bool', 'int', 'float', 'unknown']:
-            self.error(
-                f"La condición del 'if' debe ser de tipo booleano o numérico, se encontró '{cond_type}'",
-                node.line, node.column
-            )
+        # La condición debe ser booleana o numérica (o de tipo desconocido)
+        if not CONDITION_TYPES >> cond_type & 1:
+            self.error('E005', node, 'if', TYPE_NAMES[cond_type])
         
-        # Visitar ramas
-        self.visit_stmt(node.then_stmt)
+        # Visitar ramas: primero then (se apila al final)
         if node.else_stmt:
-            self.visit_stmt(node.else_stmt)
+            self.pending.append(node.else_stmt)
+        self.pending.append(node.then_stmt)
     
+    @handles(WhileStmt)
     def visit_while(self, node: WhileStmt):
         """
         Validación 5: La condición debe ser de tipo booleano (o numérico)
         """
         cond_type = self.get_expr_type(node.condition)
         
-        if cond_type not in ['bool', 'int', 'float', 'unknown']:
-            self.error(
-                f"La condición del 'while' debe ser de tipo booleano o numérico, se encontró '{cond_type}'",
-                node.line, node.column
-            )
+        if not CONDITION_TYPES >> cond_type & 1:
+            self.error('E005', node, 'while', TYPE_NAMES[cond_type])
         
         # Visitar cuerpo
-        self.visit_stmt(node.body)
+        self.pending.append(node.body)
     
+    @handles(PrintStmt)
     def visit_print(self, node: PrintStmt):
         """Visita la sentencia print y verifica los argumentos"""
         for arg in node.arguments:
             # Verificar que las variables usadas estén declaradas
             self.get_expr_type(arg)
     
+    @handles(Block)
     def visit_block(self, node: Block):
-        """Visita un bloque y crea un nuevo ámbito"""
+        """Visita un bloque y crea un nuevo ámbito (se cierra al desapilar EXIT_SCOPE)"""
         self.symbol_table.enter_scope()
         
-        for stmt in node.statements:
-            self.visit_stmt(stmt)
-        
-        self.symbol_table.exit_scope()
+        self.pending.append(EXIT_SCOPE)
+        self.pending.extend(reversed(node.statements))
     
     # ============================================
     # INFERENCIA Y VALIDACIÓN DE TIPOS
     # ============================================
     
-    def get_expr_type(self, node: ASTNode) -> str:
-        """Infiere el tipo de una expresión"""
-        if isinstance(node, Literal):
-            # Detectar si es entero o decimal
-            if '.' in node.value:
-                return 'float'
-            else:
-                return 'int'
-        
-        elif isinstance(node, Identifier):
-            # Buscar el tipo en la tabla de símbolos
-            symbol = self.symbol_table.lookup(node.name)
+    def get_expr_type(self, root: ASTNode) -> int:
+        """
+        Infiere el tipo de una expresión (id de type_system) en postorden con
+        una pila explícita. Los índices de recorrido se asignan en preorden, al
+        apilar cada nodo; el manejador de un operador recibe, tras node e
+        index, los tipos de sus operandos (en el orden de EXPR_OPERANDS)
+        """
+        if self.annotations is not None:
+            return self.annotate_expr(root)
+        
+        dispatch = self.dispatch
+        operand_getter = EXPR_OPERAND_GETTERS.get
+        types: List[int] = []
+        pending: List[object] = [root]  # nodos por visitar y (operador, índice, aridad) por resolver
+        pop, push, extend = pending.pop, pending.append, pending.extend
+        index = self.expr_index
+        
+        while pending:
+            node = pop()
+            if type(node) is tuple:
+                # Operandos ya inferidos: están al tope de types
+                node, operator_index, arity = node
+                if arity == 2:
+                    right_type = types.pop()
+                    types[-1] = dispatch[type(node)](self, node, operator_index, types[-1], right_type)
+                elif arity == 1:
+                    types[-1] = dispatch[type(node)](self, node, operator_index, types[-1])
+                else:
+                    operand_types = types[-arity:]
+                    del types[-arity:]
+                    types.append(dispatch[type(node)](self, node, operator_index, *operand_types))
+                continue
             
-            if not symbol:
-                self.error(
-                    f"La variable '{node.name}' no ha sido declarada",
-                    node.line, node.column
-                )
-                return 'unknown'
+            operands = operand_getter(type(node))
+            if operands is None:
+                types.append(dispatch[type(node)](self, node, index))
+            else:
+                getter, arity = operands
+                push((node, index, arity))
+                if arity == 1:
+                    push(getter(node))
+                else:
+                    extend(getter(node))
+            index += 1
+        
+        self.expr_index = index
+        return types[0]
+    
+    def annotate_expr(self, root: ASTNode) -> int:
+        """
+        get_expr_type con anotaciones: el mismo recorrido, que además anota
+        cada nodo en self.annotations y saltea las subexpresiones cuya
+        anotación sigue siendo válida (avanzando el índice de recorrido)
+        """
+        dispatch = self.dispatch
+        operand_getter = EXPR_OPERAND_GETTERS.get
+        annotations = self.annotations
+        entries = annotations.entries
+        diagnostics = self.diagnostics
+        records = diagnostics.records
+        lookup = self.symbol_table.lookup
+        # Anotaciones de las subexpresiones ya inferidas que esperan a su operador
+        results: List[Annotation] = []
+        # Declaraciones de la expresión: las de su anotación anterior, si la raíz la tiene
+        entry = entries.get(id(root))
+        bindings: Bindings = entry.bindings if entry is not None and entry.node is root else {}
+        pending: List[object] = [root]
+        pop, push, extend = pending.pop, pending.append, pending.extend
+        index = self.expr_index
+        
+        while pending:
+            node = pop()
+            if type(node) is tuple:
+                node, operator_index, arity = node
+                reported = len(records) + diagnostics.suppressed
+                if arity == 2:
+                    right = results.pop()
+                    left = results.pop()
+                    type_id = dispatch[type(node)](self, node, operator_index, left.type_id, right.type_id)
+                    size = 1 + left.size + right.size
+                    deps = None
+                    if left.deps is not None and right.deps is not None:
+                        deps = left.deps if not right.deps or right.deps == left.deps else \
+                            tuple({**dict(left.deps), **dict(right.deps)}.items())
+                elif arity == 1:
+                    operand = results.pop()
+                    type_id = dispatch[type(node)](self, node, operator_index, operand.type_id)
+                    size = 1 + operand.size
+                    deps = operand.deps
+                else:
+                    operands = results[-arity:]
+                    del results[-arity:]
+                    type_id = dispatch[type(node)](self, node, operator_index, *[entry.type_id for entry in operands])
+                    size = 1 + sum(entry.size for entry in operands)
+                    deps = None
+                    if all(entry.deps is not None for entry in operands):
+                        deps = tuple({key: dep for entry in operands for key, dep in entry.deps}.items())
+                if deps is not None and (len(deps) > MAX_DEPS or len(records) + diagnostics.suppressed != reported):
+                    deps = None
+                entry = entries[id(node)] = _new_annotation(Annotation, (node, type_id, None, size, deps, bindings))
+                results.append(entry)
+                continue
             
-            if not symbol.initialized:
-                self.warning(
-                    f"La variable '{node.name}' podría no estar inicializada",
-                    node.line, node.column
-                )
+            node_id = id(node)
+            entry = entries.get(node_id)
+            if entry is not None and entry.deps is not None and entry.node is node:
+                symbols = {}
+                for key, type_id in entry.deps:
+                    symbol = lookup(key)
+                    if symbol is None or symbol.type_id != type_id or not symbol.initialized:
+                        break
+                    symbols[key] = symbol
+                else:
+                    # Sigue siendo válida: mismo tipo y ningún diagnóstico que emitir;
+                    # sus variables pasan a las declaraciones vigentes
+                    bindings.update(symbols)
+                    if entry.bindings is not bindings:
+                        annotations.rebind(node, bindings)
+                        entry = entries[node_id]
+                    annotations.reused += 1
+                    results.append(entry)
+                    index += entry.size
+                    continue
             
-            return symbol.type
-        
-        elif isinstance(node, BinaryOp):
-            return self.get_binary_op_type(node)
-        
-        elif isinstance(node, UnaryOp):
-            return self.get_unary_op_type(node)
-        
-        return 'unknown'
-    
-    def get_binary_op_type(self, node: BinaryOp) -> str:
-        """Determina el tipo resultado de una operación binaria"""
-        left_type = self.get_expr_type(node.left)
-        right_type = self.get_expr_type(node.right)
-        
-        # Operadores lógicos: retornan bool
-        if node.operator in ['||', '&&']:
-            return 'bool'
-        
-        # Operadores relacionales: retornan bool
-        if node.operator in ['==', '!=', '<', '<=', '>', '>=']:
-            # Verificar que los operandos sean comparables
-            if left_type in ['int', 'float'] and right_type in ['int', 'float']:
-                return 'bool'
-            elif left_type == right_type:
-                return 'bool'
-            else:
-                self.error(
-                    f"Tipos incompatibles en comparación: '{left_type}' y '{right_type}'",
-                    node.line, node.column
-                )
-                return 'bool'
-        
-        # Operadores aritméticos
-        if node.operator in ['+', '-', '*', '/', '%']:
-            # Si uno es float, el resultado es float
-            if left_type == 'float' or right_type == 'float':
-                return 'float'
-            elif left_type == 'int' and right_type == 'int':
-                return 'int'
+            operands = operand_getter(type(node))
+            if operands is None:
+                reported = len(records) + diagnostics.suppressed
+                self.resolved = None
+                type_id = dispatch[type(node)](self, node, index)
+                key = None
+                deps = () if len(records) + diagnostics.suppressed == reported else None
+                if self.resolved is not None:
+                    key, bindings[key] = self.resolved
+                    if deps is not None:
+                        deps = ((key, type_id),)
+                entry = entries[node_id] = _new_annotation(Annotation, (node, type_id, key, 1, deps, bindings))
+                results.append(entry)
             else:
-                self.error(
-                    f"Tipos incompatibles en operación aritmética: '{left_type}' {node.operator} '{right_type}'",
-                    node.line, node.column
-                )
-                return 'unknown'
+                getter, arity = operands
+                push((node, index, arity))
+                if arity == 1:
+                    push(getter(node))
+                else:
+                    extend(getter(node))
+            index += 1
+        
+        self.expr_index = index
+        return results[0].type_id
+    
+    def generic_visit(self, node: ASTNode, *args) -> int:
+        """Nodos sin manejador: tipo desconocido"""
+        return UNKNOWN
+    
+    @handles(Literal)
+    def get_literal_type(self, node: Literal, index: int) -> int:
+        """Tipo de un literal: entero o decimal"""
+        return FLOAT if '.' in node.value else INT
+    
+    @handles(Identifier)
+    def get_identifier_type(self, node: Identifier, index: int) -> int:
+        """Tipo de una variable, buscado en la tabla de símbolos"""
+        key = symbol_key(node.name, node.name_id)
+        symbol = self.symbol_table.lookup(key)
         
-        return 'unknown'
-    
-    def get_unary_op_type(self, node: UnaryOp) -> str:
-        """Determina el tipo resultado de una operación unaria"""
-        operand_type = self.get_expr_type(node.operand)
-        
-        if node.operator == '!':
-            # NOT lógico retorna bool
-            return 'bool'
-        
-        elif node.operator == '-':
-            # Negación numérica preserva el tipo
-            if operand_type in ['int', 'float']:
-                return operand_type
+        if not symbol:
+            self.error('E003', node, node.name, key=key, offset=self.occurrence(node, index))
+            return UNKNOWN
+        
+        self.resolved = (key, symbol)
+        if not symbol.initialized:
+            # Una declaración por (nombre, ubicación): clave para dedup
+            self.warning('W001', node, node.name, key=(symbol.name, symbol.line, symbol.column),
+                         offset=self.occurrence(node, index))
+        
+        return symbol.type_id
+    
+    @handles(BinaryOp)
+    def get_binary_op_type(self, node: BinaryOp, index: int, left_type: int, right_type: int) -> int:
+        """Determina el tipo resultado de una operación binaria (type_system.BINARY_RESULT)"""
+        op = BINARY_OPS.get(node.operator)
+        if op is None:
+            return UNKNOWN
+        
+        result = BINARY_RESULT[op][left_type][right_type]
+        if result & INVALID:
+            if op in ARITHMETIC_OPS:
+                self.error('E007', node, TYPE_NAMES[left_type], node.operator, TYPE_NAMES[right_type],
+                           offset=self.occurrence(node, index))
             else:
-                self.error(
-                    f"El operador '-' requiere un operando numérico, se encontró '{operand_type}'",
-                    node.line, node.column
-                )
-                return 'unknown'
-        
-        return 'unknown'
+                self.error('E006', node, TYPE_NAMES[left_type], TYPE_NAMES[right_type],
+                           offset=self.occurrence(node, index))
+            return result & TYPE_MASK
+        return result
+    
+    @handles(UnaryOp)
+    def get_unary_op_type(self, node: UnaryOp, index: int, operand_type: int) -> int:
+        """Determina el tipo resultado de una operación unaria (type_system.UNARY_RESULT)"""
+        op = UNARY_OPS.get(node.operator)
+        if op is None:
+            return UNKNOWN
+        
+        result = UNARY_RESULT[op][operand_type]
+        if result & INVALID:
+            self.error('E008', node, node.operator, TYPE_NAMES[operand_type], offset=self.occurrence(node, index))
+            return result & TYPE_MASK
+        return result
     
     def are_types_compatible(self, target_type: str, source_type: str) -> bool:
-        """Verifica si dos tipos son compatibles para asignación"""
-        if target_type == source_type:
-            return True
-        
-        # Conversión implícita: int -> float
-        if target_type == 'float' and source_type == 'int':
-            return True
-        
-        # Unknown puede ser compatible (errores ya reportados)
-        if source_type == 'unknown':
-            return True
-        
-        return False
+        """Verifica si dos tipos (por nombre) son compatibles para asignación"""
+        return bool(COMPATIBLE[type_id(target_type)] >> type_id(source_type) & 1)
 
 
 # ============================================
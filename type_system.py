@@ -0,0 +1,131 @@
+"""
+Sistema de tipos del compilador
+Los tipos y los operadores se identifican con enteros pequeños; las reglas
+se evalúan una sola vez, al importar el módulo, y quedan en tablas que el
+analizador indexa directamente:
+
+  BINARY_RESULT[op][izq][der]  tipo resultado (con INVALID si es un error)
+  UNARY_RESULT[op][operando]   ídem para los operadores unarios
+  COMPATIBLE[destino]          máscara de bits de los tipos asignables
+  CONDITION_TYPES              máscara de los tipos válidos en if/while
+
+Para agregar un tipo basta con sumarlo a TYPE_NAMES (y, si corresponde, a
+NUMERIC_TYPES) y ajustar las funciones de reglas.
+"""
+
+from typing import Dict, List, Tuple
+
+# ============================================
+# TIPOS
+# ============================================
+
+# 'unknown' es el tipo de una expresión con errores ya reportados
+TYPE_NAMES: List[str] = ['unknown', 'int', 'float', 'string', 'bool']
+TYPE_IDS: Dict[str, int] = {name: type_id for type_id, name in enumerate(TYPE_NAMES)}
+UNKNOWN, INT, FLOAT, STRING, BOOL = (TYPE_IDS[name] for name in ('unknown', 'int', 'float', 'string', 'bool'))
+
+NUMERIC_TYPES = {INT, FLOAT}
+
+def type_id(name: str) -> int:
+    """Id del tipo de nombre name ('unknown' si no existe)"""
+    return TYPE_IDS.get(name, UNKNOWN)
+
+def mask(types) -> int:
+    """Máscara de bits de un conjunto de ids de tipo"""
+    bits = 0
+    for t in types:
+        bits |= 1 << t
+    return bits
+
+# ============================================
+# OPERADORES
+# ============================================
+
+# Binarios
+OR, AND, EQ, NE, LT, LE, GT, GE, ADD, SUB, MUL, DIV, MOD = range(13)
+BINARY_OPS: Dict[str, int] = {
+    '||': OR, '&&': AND,
+    '==': EQ, '!=': NE, '<': LT, '<=': LE, '>': GT, '>=': GE,
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD,
+}
+LOGICAL_OPS = {OR, AND}
+RELATIONAL_OPS = {EQ, NE, LT, LE, GT, GE}
+ARITHMETIC_OPS = {ADD, SUB, MUL, DIV, MOD}
+
+# Unarios
+NOT, NEG = range(2)
+UNARY_OPS: Dict[str, int] = {'!': NOT, '-': NEG}
+
+# Bit que marca en las tablas una combinación inválida; TYPE_MASK recupera el tipo
+INVALID = 0x100
+TYPE_MASK = 0xFF
+
+# ============================================
+# REGLAS
+# ============================================
+
+def binary_rule(op: int, left: int, right: int) -> Tuple[int, bool]:
+    """(tipo resultado, es válida) de left op right"""
+    if op in LOGICAL_OPS:
+        return BOOL, True
+    
+    if op in RELATIONAL_OPS:
+        # Comparables: dos numéricos o dos del mismo tipo
+        return BOOL, (left in NUMERIC_TYPES and right in NUMERIC_TYPES) or left == right
+    
+    if op in ARITHMETIC_OPS:
+        # Si uno es float, el resultado es float
+        if left == FLOAT or right == FLOAT:
+            return FLOAT, True
+        if left == INT and right == INT:
+            return INT, True
+        return UNKNOWN, False
+    
+    return UNKNOWN, True
+
+def unary_rule(op: int, operand: int) -> Tuple[int, bool]:
+    """(tipo resultado, es válida) de op operand"""
+    if op == NOT:
+        return BOOL, True
+    if op == NEG:
+        # La negación numérica preserva el tipo
+        if operand in NUMERIC_TYPES:
+            return operand, True
+        return UNKNOWN, False
+    return UNKNOWN, True
+
+def compatible_rule(target: int, source: int) -> bool:
+    """Se puede asignar un valor de tipo source a una variable de tipo target"""
+    # Conversión implícita int -> float; unknown es compatible (errores ya reportados)
+    return target == source or (target == FLOAT and source == INT) or source == UNKNOWN
+
+# ============================================
+# TABLAS
+# ============================================
+
+def _entry(result: int, valid: bool) -> int:
+    """Entrada de una tabla: el tipo, con INVALID si la combinación es un error"""
+    return result if valid else result | INVALID
+
+TYPE_RANGE = range(len(TYPE_NAMES))
+
+BINARY_RESULT: List[List[List[int]]] = [
+    [[_entry(*binary_rule(op, left, right)) for right in TYPE_RANGE] for left in TYPE_RANGE]
+    for op in range(len(BINARY_OPS))
+]
+
+UNARY_RESULT: List[List[int]] = [
+    [_entry(*unary_rule(op, operand)) for operand in TYPE_RANGE]
+    for op in range(len(UNARY_OPS))
+]
+
+COMPATIBLE: List[int] = [
+    mask(source for source in TYPE_RANGE if compatible_rule(target, source))
+    for target in TYPE_RANGE
+]
+
+CONDITION_TYPES: int = mask([BOOL, INT, FLOAT, UNKNOWN])
+
+def is_compatible(target: int, source: int) -> bool:
+    """Consulta de COMPATIBLE (el analizador la indexa directamente)"""
+    return bool(COMPATIBLE[target] >> source & 1)